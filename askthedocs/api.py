@@ -0,0 +1,311 @@
+"""
+API HTTP do AskTheDocs
+
+Este módulo implementa um serviço HTTP assíncrono (FastAPI), independente da
+interface Streamlit, para carregar coleções, fazer perguntas (com ou sem
+streaming) e iniciar ingestões. Os índices são compartilhados entre as
+requisições pelo registro do processo e as etapas que usam CPU rodam em um
+pool limitado de threads, permitindo escalar o atendimento de perguntas
+separadamente da interface. As rotas que só consultam o catálogo ou a fila
+de jobs (SQLite) são síncronas: o FastAPI as executa em threads, e uma
+trava de escrita no banco não atrasa as demais requisições.
+
+Uso:
+    python askthedocs/api.py
+"""
+
+import asyncio
+import os
+import sys
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import List, Optional
+
+from dotenv import load_dotenv
+from fastapi import FastAPI, HTTPException
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from pydantic import BaseModel
+
+# Adiciona o diretório raiz ao path para importar módulos
+root_dir = Path(__file__).parent.parent
+sys.path.insert(0, str(root_dir))
+
+# Carrega variáveis de ambiente do arquivo .env (antes dos serviços lerem as configurações)
+load_dotenv()
+
+from service.catalog import SORT_COLUMNS, get_catalog
+from service.collection_store import (
+    VERSION_SEPARATOR, VersionedCollection, collect_pages, open_collection, split_version, store_lock
+)
+from service.jobs import get_job_queue
+from service.metrics import get_metrics
+from service.rag import RAGService
+
+# Endereço do servidor HTTP
+API_HOST = os.getenv("API_HOST", "0.0.0.0")
+API_PORT = int(os.getenv("API_PORT", "8000"))
+
+# Threads para etapas de CPU (embedding, busca, carregamento de índices) (padrão: 4)
+API_WORKERS = int(os.getenv("API_WORKERS", "4"))
+
+# Conjuntos de coleções mantidos carregados; os menos usados são descartados
+# e seus índices voltam ao limite de memória do registro (padrão: 8)
+API_MAX_SERVICES = int(os.getenv("API_MAX_SERVICES", "8"))
+
+class LoadRequest(BaseModel):
+    collections: List[str]
+    index_type: Optional[str] = None
+
+class AskRequest(BaseModel):
+    question: str
+    collections: List[str]
+    stream: bool = False
+
+class IngestRequest(BaseModel):
+    url: str
+    version: str
+
+class ServicePool:
+    """
+    Serviços RAG compartilhados pelas requisições, um por conjunto de coleções.
+
+    Funcionalidades:
+    - Cria e carrega cada conjunto de coleções uma única vez, mesmo com requisições simultâneas
+    - Passa a usar a versão mais recente dos índices (ex.: coleção sendo indexada)
+    - Executa os carregamentos e atualizações no pool limitado de threads
+    - Mantém no máximo max_services conjuntos, descartando os usados há mais tempo
+    """
+
+    def __init__(self, executor, max_services=API_MAX_SERVICES):
+        self.executor = executor
+        self.max_services = max(1, max_services)
+
+        # Coleções -> serviço RAG carregado (ordem de uso, do menos ao mais recente)
+        self._services = OrderedDict()
+        self._locks = {}
+
+    async def get(self, collections, index_type=None):
+        """
+        Retorna o serviço RAG com as coleções dadas carregadas.
+
+        Args:
+            collections (list): Nomes das coleções
+            index_type (str): Fixa o tipo do índice de busca (opcional)
+
+        Returns:
+            RAGService: Serviço carregado, ou None se alguma coleção não tiver conteúdo
+        """
+        key = tuple(dict.fromkeys(collections))
+        lock = self._locks.setdefault(key, asyncio.Lock())
+        loop = asyncio.get_running_loop()
+
+        async with lock:
+            service = self._services.get(key)
+            if service is not None and not index_type:
+                self._services.move_to_end(key)
+                await loop.run_in_executor(self.executor, service.refresh)
+                return service
+
+            if service is None:
+                service = await loop.run_in_executor(self.executor, RAGService)
+            if not await loop.run_in_executor(self.executor, service.load_collections, list(key), index_type):
+                return None
+            self._services[key] = service
+            self._services.move_to_end(key)
+            self._evict()
+            return service
+
+    def _evict(self):
+        """
+        Descarta os serviços usados há mais tempo além do limite.
+
+        Requisições em andamento mantêm a sua referência ao serviço; os
+        índices ficam livres para o descarte do registro quando terminam.
+        """
+        while len(self._services) > self.max_services:
+            key, _ = self._services.popitem(last=False)
+            lock = self._locks.get(key)
+            if lock is not None and not lock.locked():
+                del self._locks[key]
+
+def _check_collection_names(names, with_version=False):
+    """
+    Rejeita nomes de coleção que escapariam do diretório de dados ou que
+    contêm o separador de versão (seriam confundidos com "coleção@versão").
+
+    Args:
+        names (list): Nomes das coleções
+        with_version (bool): Aceita a versão pesquisada no nome (ex.: "Firecrawl@v2")
+
+    Raises:
+        HTTPException: Se algum nome for inválido
+    """
+    for name in names:
+        collection_name = split_version(name)[0] if with_version else name
+        if (not collection_name or collection_name.startswith(".") or "/" in collection_name
+                or "\\" in collection_name or VERSION_SEPARATOR in collection_name):
+            raise HTTPException(status_code=400, detail=f"Nome de coleção inválido: {name}")
+
+def _remove_version(collection_name, version):
+    """
+    Remove uma versão e o conteúdo que só ela usava (executado no pool de threads).
+
+    A trava do repositório de conteúdo é mantida da remoção até o descarte,
+    para que outro processo não descarte nem reaproveite conteúdo no meio.
+
+    Args:
+        collection_name (str): Nome da coleção
+        version (str): Versão a remover
+
+    Returns:
+        tuple: (status HTTP, mensagem) se a versão não puder ser removida, ou None
+    """
+    with store_lock():
+        collection = open_collection(f"data/collections/{collection_name}")
+        if not isinstance(collection, VersionedCollection) or version not in collection.versions():
+            return 404, "Versão não encontrada"
+        if len(collection.versions()) == 1:
+            return 400, "A única versão da coleção não pode ser removida"
+        if get_job_queue().list(collection_name=collection_name, active=True):
+            return 409, "Há uma ingestão em andamento na coleção"
+
+        collection.delete_version(version)
+        get_catalog().delete_version(collection_name, version)
+        # Descarta o conteúdo que só a versão removida usava
+        collect_pages()
+    return None
+
+executor = ThreadPoolExecutor(max_workers=API_WORKERS, thread_name_prefix="api")
+services = ServicePool(executor)
+
+app = FastAPI(title="AskTheDocs")
+
+@app.on_event("startup")
+def start_job_queue():
+    """
+    Inicia a fila de jobs junto com o servidor, retomando os jobs pendentes
+    sem esperar pela primeira requisição que a use.
+    """
+    get_job_queue()
+
+@app.get("/health")
+async def health():
+    """
+    Indica que o serviço está no ar.
+    """
+    return {"status": "ok"}
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """
+    Expõe os tempos por etapa no formato do Prometheus.
+    """
+    return get_metrics().render_prometheus()
+
+@app.get("/collections")
+def list_collections(offset: int = 0, limit: int = 50, sort_by: str = "inserted_at", descending: bool = True, search: Optional[str] = None):
+    """
+    Lista uma página das coleções do catálogo com seus metadados.
+    """
+    if sort_by not in SORT_COLUMNS:
+        raise HTTPException(status_code=400, detail=f"Coluna de ordenação inválida: {sort_by}")
+    catalog = get_catalog()
+    return {
+        "total": catalog.count(search=search),
+        "collections": catalog.list(offset=offset, limit=limit, sort_by=sort_by, descending=descending, search=search)
+    }
+
+@app.post("/collections/load")
+async def load_collections(request: LoadRequest):
+    """
+    Carrega (ou recarrega com outro tipo de índice) um conjunto de coleções.
+    """
+    _check_collection_names(request.collections, with_version=True)
+    service = await services.get(request.collections, request.index_type)
+    if service is None:
+        raise HTTPException(status_code=404, detail="Coleção não encontrada ou sem conteúdo")
+    return {"collections": list(service.indexes), "version": service.index_version}
+
+@app.post("/ask")
+async def ask(request: AskRequest):
+    """
+    Responde uma pergunta sobre as coleções dadas (carregando-as se necessário).
+    """
+    _check_collection_names(request.collections, with_version=True)
+    service = await services.get(request.collections)
+    if service is None:
+        raise HTTPException(status_code=404, detail="Coleção não encontrada ou sem conteúdo")
+
+    if request.stream:
+        return StreamingResponse(
+            service.astream_question(request.question, executor),
+            media_type="text/plain; charset=utf-8"
+        )
+    answer = await service.aask_question(request.question, executor)
+    return {"answer": answer, "collections": list(service.indexes), "version": service.index_version}
+
+@app.post("/collections/{collection_name}/ingest", status_code=202)
+def ingest(collection_name: str, request: IngestRequest):
+    """
+    Inicia o crawl e a indexação de uma coleção em segundo plano.
+    """
+    _check_collection_names([collection_name])
+    return get_job_queue().submit("scrape", collection_name, url=request.url, version=request.version)
+
+@app.post("/collections/{collection_name}/index", status_code=202)
+def reindex(collection_name: str):
+    """
+    Reindexa em segundo plano as páginas já gravadas de uma coleção.
+    """
+    _check_collection_names([collection_name])
+    if get_catalog().get(collection_name) is None:
+        raise HTTPException(status_code=404, detail="Coleção não encontrada")
+    return get_job_queue().submit("index", collection_name)
+
+@app.get("/collections/{collection_name}/versions")
+def list_versions(collection_name: str):
+    """
+    Lista as versões registradas de uma coleção (a atual é usada sem versão no nome).
+    """
+    _check_collection_names([collection_name])
+    catalog = get_catalog()
+    metadata = catalog.get(collection_name)
+    if metadata is None:
+        raise HTTPException(status_code=404, detail="Coleção não encontrada")
+    return {"current": metadata.get("version"), "versions": catalog.versions(collection_name)}
+
+@app.delete("/collections/{collection_name}/versions/{version}", status_code=202)
+async def delete_version(collection_name: str, version: str):
+    """
+    Remove uma versão de uma coleção versionada e reindexa a coleção em segundo plano.
+    """
+    _check_collection_names([collection_name])
+    error = await asyncio.get_running_loop().run_in_executor(executor, _remove_version, collection_name, version)
+    if error is not None:
+        raise HTTPException(status_code=error[0], detail=error[1])
+    return await asyncio.get_running_loop().run_in_executor(
+        executor, lambda: get_job_queue().submit("index", collection_name)
+    )
+
+@app.get("/jobs")
+def list_jobs(limit: int = 20, collection: Optional[str] = None, active: bool = False):
+    """
+    Lista as ingestões mais recentes e seu progresso.
+    """
+    return get_job_queue().list(limit=limit, collection_name=collection, active=active)
+
+@app.get("/jobs/{job_id}")
+def get_job(job_id: str):
+    """
+    Retorna o estado e o progresso de uma ingestão.
+    """
+    job = get_job_queue().get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Ingestão não encontrada")
+    return job
+
+if __name__ == "__main__":
+    import uvicorn
+
+    uvicorn.run(app, host=API_HOST, port=API_PORT)
@@ -11,14 +11,31 @@ Data: 2025
 """
 
 import streamlit as st
-import os
 from pathlib import Path
 from dotenv import load_dotenv
-from presentation import scraping, chat, docs_list
 
-# Carrega variáveis de ambiente do arquivo .env
+# Carrega variáveis de ambiente do arquivo .env (antes dos serviços lerem as configurações)
 load_dotenv()
 
+from presentation import scraping, chat, docs_list
+from service.catalog import get_catalog
+from service.jobs import get_job_queue
+from service.warmup import start_warm_up
+
+# Coleções exibidas na barra lateral (as demais são encontradas pelo filtro)
+SIDEBAR_COLLECTIONS = 20
+
+@st.cache_resource(show_spinner=False)
+def _warm_up():
+    """
+    Aquece o modelo de embeddings e o índice das últimas coleções usadas e
+    inicia a fila de jobs, uma única vez por processo, sem bloquear a
+    renderização da página.
+    """
+    # Os workers retomam os jobs pendentes sem esperar que alguém abra a página de ingestão
+    get_job_queue()
+    return start_warm_up()
+
 # Configuração da página principal
 st.set_page_config(
     page_title="AskTheDocs", 
@@ -27,6 +44,9 @@ st.set_page_config(
 )
 st.title("AskTheDocs")
 
+# Inicia o aquecimento em segundo plano (apenas na primeira execução do processo)
+_warm_up()
+
 # Sidebar com navegação e seleção de coleções
 with st.sidebar:
     # Sistema de logo adaptativo ao tema (claro/escuro)
@@ -52,21 +72,24 @@ with st.sidebar:
     st.divider()
     st.subheader("Documentações disponíveis")
 
-    # Lista coleções de documentação disponíveis
-    collections_path = "data/collections"
-    if os.path.exists(collections_path):
-        collections = [d for d in os.listdir(collections_path)
-                        if os.path.isdir(os.path.join(collections_path, d))]
-
-        # Exibe cada coleção com botão para selecionar
-        for collection in collections:
-            col1, col2 = st.columns([3, 2])
-            with col1:
-                st.write(f"📁 {collection}")
-            with col2:
-                if st.button("Usar", key=f"use_{collection}"):
-                    st.session_state.collection = collection
-                    st.rerun()
+    # Lista coleções de documentação disponíveis (consulta ao catálogo, em cache)
+    catalog = get_catalog()
+    search = st.text_input("Filtrar", key="sidebar_search", placeholder="Nome da documentação")
+    collections = catalog.names(search=search, limit=SIDEBAR_COLLECTIONS)
+
+    # Exibe cada coleção com botão para selecionar
+    for collection in collections:
+        col1, col2 = st.columns([3, 2])
+        with col1:
+            st.write(f"📁 {collection}")
+        with col2:
+            if st.button("Usar", key=f"use_{collection}"):
+                st.session_state.collection = collection
+                st.rerun()
+
+    total = catalog.count(search=search)
+    if total > len(collections):
+        st.caption(f"Mostrando {len(collections)} de {total}. Use o filtro ou a Lista de docs.")
 
 # Inicializa estado da sessão
 if "messages" not in st.session_state:
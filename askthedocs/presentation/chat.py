@@ -14,7 +14,11 @@ from pathlib import Path
 root_dir = Path(__file__).parent.parent.parent
 sys.path.insert(0, str(root_dir))
 
-from service.rag import RAGService
+from service.catalog import get_catalog
+from service.warmup import remember_collections
+
+# Coleções oferecidas em "Pesquisar também em" (as demais são encontradas pelo filtro)
+EXTRA_COLLECTIONS = 20
 
 def show():
     """
@@ -22,8 +26,11 @@ def show():
     
     Funcionalidades:
     - Carrega automaticamente a coleção selecionada
+    - Permite pesquisar em outras coleções junto com a selecionada
     - Mantém histórico de conversa na sessão
     - Usa RAG para responder perguntas baseadas na documentação
+    - Exibe a resposta em streaming, token a token
+    - Painel de depuração opcional com o tempo de cada etapa da última resposta
     """
     st.header("💬 Pergunte sobre a documentação")
 
@@ -34,20 +41,43 @@ def show():
     
     st.success(f"Documentação selecionada: {st.session_state.collection}")
 
-    # Inicializa o serviço RAG se não existir
+    # Outras coleções pesquisadas junto com a selecionada (ex.: plugins de um framework);
+    # oferece só uma página do catálogo, mais as já escolhidas
+    catalog = get_catalog()
+    search = st.text_input("Filtrar outras documentações", key="extra_search", placeholder="Nome da documentação")
+    chosen = [name for name in st.session_state.get("extra_collections", []) if name != st.session_state.collection]
+    if "extra_collections" in st.session_state:
+        st.session_state.extra_collections = chosen
+    page = catalog.names(search=search, limit=EXTRA_COLLECTIONS + 1)
+    others = chosen + [name for name in page if name != st.session_state.collection and name not in chosen]
+    extra = st.multiselect("Pesquisar também em", others, key="extra_collections")
+    total = catalog.count(search=search)
+    if total > len(page):
+        st.caption(f"Mostrando {len(page)} de {total}. Use o filtro para encontrar as demais.")
+    selected = [st.session_state.collection] + extra
+
+    # Inicializa o serviço RAG se não existir (importado aqui para não atrasar
+    # a abertura das outras páginas; o aquecimento já carregou o modelo)
     if "rag_service" not in st.session_state:
-        st.session_state.rag_service = RAGService()
+        from service.rag import RAGService
 
-    # Carrega a coleção se for diferente da atual
-    if "current_collection" not in st.session_state or st.session_state.current_collection != st.session_state.collection:
+        with st.spinner("Carregando modelos..."):
+            st.session_state.rag_service = RAGService()
+
+    # Carrega as coleções se forem diferentes das atuais
+    if "current_collection" not in st.session_state or st.session_state.current_collection != selected:
         with st.spinner("Carregando documentação..."):
-            success = st.session_state.rag_service.load_collection(st.session_state.collection)
+            success = st.session_state.rag_service.load_collections(selected)
             if success:
-                st.session_state.current_collection = st.session_state.collection
+                st.session_state.current_collection = selected
+                remember_collections(selected)
                 st.success("Documentação carregada com sucesso!")
             else:
                 st.error("Erro ao carregar documentação")
                 return
+    else:
+        # Usa a versão mais recente do índice (ex.: coleção sendo indexada)
+        st.session_state.rag_service.refresh()
 
     # Exibe histórico de mensagens
     for message in st.session_state.messages:
@@ -60,12 +90,21 @@ def show():
         st.chat_message("user").write(prompt)
         st.session_state.messages.append({"role": "user", "content": prompt})
 
-        # Gera resposta usando RAG
+        # Gera resposta usando RAG, exibindo os tokens à medida que chegam
         with st.chat_message("assistant"):
-            with st.spinner("Pensando..."):
-                response = st.session_state.rag_service.ask_question(prompt)
-                st.write(response)
-                st.session_state.messages.append({"role": "assistant", "content": response})
+            response = st.write_stream(st.session_state.rag_service.stream_question(prompt))
+            st.session_state.messages.append({"role": "assistant", "content": response})
+
+    # Painel de depuração: onde foi gasto o tempo da última resposta
+    if st.checkbox("Mostrar tempos da última resposta", key="debug_timings"):
+        timings = st.session_state.rag_service.last_timings
+        if timings:
+            st.table([
+                {"Etapa": t["stage"], "Tempo (ms)": f"{t['ms']:.1f}", "Chamadas": t["count"]}
+                for t in timings
+            ])
+        else:
+            st.caption("Nenhuma resposta gerada nesta sessão")
 
     # Botão para limpar conversa
     if st.button("Limpar conversa"):
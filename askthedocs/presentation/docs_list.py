@@ -7,8 +7,6 @@ Permite selecionar documentações para uso no chat.
 """
 
 import streamlit as st
-import json
-import os
 import sys
 from pathlib import Path
 from datetime import datetime
@@ -17,77 +15,81 @@ from datetime import datetime
 root_dir = Path(__file__).parent.parent.parent
 sys.path.insert(0, str(root_dir))
 
+from service.catalog import get_catalog
+from service.collection_store import VERSION_SEPARATOR
+from service.jobs import get_job_queue
+
+# Documentações por página da lista
+PAGE_SIZE = 50
+
+# Opções de ordenação: rótulo -> (coluna do catálogo, ordem decrescente)
+SORT_OPTIONS = {
+    "Data da inserção (mais recente)": ("inserted_at", True),
+    "Data da inserção (mais antiga)": ("inserted_at", False),
+    "Nome": ("name", False),
+    "Arquivos": ("files_count", True),
+}
+
 def show():
     """
     Exibe a lista de documentações em formato de tabela.
     
     Funcionalidades:
-    - Carrega metadados do índice global ou varre diretórios
+    - Consulta o catálogo de coleções página a página
+    - Permite filtrar por nome e escolher a ordenação
     - Exibe tabela com Nome, URL, Versão, Data da inserção
-    - Permite selecionar documentação para uso no chat
+    - Permite selecionar documentação para uso no chat (em qualquer versão guardada)
+    - Permite agendar a reindexação de uma documentação em segundo plano
     """
     st.header("📚 Lista de Documentações")
-    
-    # Carrega dados das documentações
-    collections_data = _load_collections_data()
-    
-    if not collections_data:
+
+    catalog = get_catalog()
+    col1, col2 = st.columns([3, 2])
+    with col1:
+        search = st.text_input("Filtrar por nome", key="docs_search")
+    with col2:
+        sort_label = st.selectbox("Ordenar por", list(SORT_OPTIONS), key="docs_sort")
+
+    total = catalog.count(search=search)
+    if not total:
         st.info("Nenhuma documentação encontrada. Use 'Add doc' para adicionar uma nova documentação.")
         return
     
     # Exibe estatísticas
-    st.metric("Total de documentações", len(collections_data))
+    st.metric("Total de documentações", total)
+
+    # Carrega apenas a página exibida
+    pages = (total + PAGE_SIZE - 1) // PAGE_SIZE
+    page = st.number_input("Página", min_value=1, max_value=pages, value=1, key="docs_page") if pages > 1 else 1
+    sort_by, descending = SORT_OPTIONS[sort_label]
+    collections_data = _load_collections_data(catalog, page, sort_by, descending, search)
     
     # Cria tabela com os dados
     _display_collections_table(collections_data)
 
-def _load_collections_data():
+def _load_collections_data(catalog, page, sort_by, descending, search):
     """
-    Carrega dados das coleções do índice global ou varre diretórios.
+    Carrega uma página de coleções do catálogo.
     
+    Args:
+        catalog (CollectionCatalog): Catálogo de coleções
+        page (int): Página (a partir de 1)
+        sort_by (str): Coluna de ordenação
+        descending (bool): Ordem decrescente
+        search (str): Trecho do nome (opcional)
+
     Returns:
         list: Lista de dicionários com metadados das coleções
     """
     try:
-        # Tenta carregar do índice global primeiro
-        index_file = Path("data/collections/index.json")
-        if index_file.exists():
-            with open(index_file, "r", encoding="utf-8") as f:
-                return json.load(f)
-        
-        # Se não existe índice, varre diretórios
-        return _scan_collections_directories()
-        
+        return catalog.list(
+            offset=(page - 1) * PAGE_SIZE, limit=PAGE_SIZE,
+            sort_by=sort_by, descending=descending, search=search
+        )
     except Exception as e:
         st.error(f"Erro ao carregar dados das coleções: {str(e)}")
         return []
 
-def _scan_collections_directories():
-    """
-    Varre diretórios de coleções para encontrar metadados.
-    
-    Returns:
-        list: Lista de dicionários com metadados das coleções
-    """
-    collections = []
-    collections_path = Path("data/collections")
-    
-    if not collections_path.exists():
-        return collections
-    
-    for item in collections_path.iterdir():
-        if item.is_dir():
-            metadata_file = item / "metadata.json"
-            if metadata_file.exists():
-                try:
-                    with open(metadata_file, "r", encoding="utf-8") as f:
-                        metadata = json.load(f)
-                        collections.append(metadata)
-                except Exception as e:
-                    print(f"Erro ao carregar metadados de {item.name}: {str(e)}")
-    
-    return collections
-
 def _display_collections_table(collections_data):
     """
     Exibe tabela com as coleções de documentação.
@@ -95,6 +97,8 @@ def _display_collections_table(collections_data):
     Args:
         collections_data (list): Lista de metadados das coleções
     """
+    catalog = get_catalog()
+
     # Prepara dados para exibição
     table_data = []
     for collection in collections_data:
@@ -111,20 +115,17 @@ def _display_collections_table(collections_data):
         
         table_data.append({
             "Nome": collection.get("name", "N/A"),
-            "URL": collection.get("url", "N/A"),
-            "Versão": collection.get("version", "N/A"),
+            "URL": collection.get("url") or "N/A",
+            "Versão": collection.get("version") or "N/A",
             "Data da inserção": formatted_date,
             "Arquivos": collection.get("files_count", 0)
         })
     
-    # Ordena por data de inserção (mais recente primeiro)
-    table_data.sort(key=lambda x: x["Data da inserção"], reverse=True)
-    
     # Exibe tabela
     if table_data:
         # Cria colunas para tabela e botões
         for i, row in enumerate(table_data):
-            col1, col2, col3, col4, col5, col6 = st.columns([3, 4, 2, 3, 1, 2])
+            col1, col2, col3, col4, col5, col6, col7 = st.columns([3, 4, 2, 3, 1, 2, 2])
             
             with col1:
                 st.write(f"**{row['Nome']}**")
@@ -135,16 +136,34 @@ def _display_collections_table(collections_data):
                     url = url[:47] + "..."
                 st.write(url)
             with col3:
-                st.write(row['Versão'])
+                # Coleções com várias versões guardadas permitem escolher a versão usada no chat
+                versions = [item["version"] for item in catalog.versions(row['Nome'])]
+                if len(versions) > 1:
+                    version = st.selectbox(
+                        "Versão", versions, key=f"version_{row['Nome']}_{i}", label_visibility="collapsed"
+                    )
+                else:
+                    version = None
+                    st.write(row['Versão'])
             with col4:
                 st.write(row['Data da inserção'])
             with col5:
                 st.write(f"{row['Arquivos']}")
             with col6:
                 if st.button("Usar", key=f"use_{row['Nome']}_{i}"):
-                    st.session_state.collection = row['Nome']
-                    st.success(f"Documentação '{row['Nome']}' selecionada!")
+                    # A versão atual é usada pelo nome da coleção; as demais, por "nome@versão"
+                    selected = row['Nome'] if version in (None, row['Versão']) else f"{row['Nome']}{VERSION_SEPARATOR}{version}"
+                    st.session_state.collection = selected
+                    st.success(f"Documentação '{selected}' selecionada!")
                     st.rerun()
+            with col7:
+                if st.button("Reindexar", key=f"reindex_{row['Nome']}_{i}"):
+                    # A reindexação roda na fila de ingestões (progresso em "Add doc")
+                    job = get_job_queue().submit("index", row['Nome'])
+                    if job["created"]:
+                        st.success("Reindexação agendada.")
+                    else:
+                        st.info("Já há uma ingestão em andamento.")
             
             st.divider()
     else:
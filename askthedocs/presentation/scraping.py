@@ -14,7 +14,22 @@ from pathlib import Path
 root_dir = Path(__file__).parent.parent.parent
 sys.path.insert(0, str(root_dir))
 
-from service.scraping import ScrapingService
+from service.jobs import get_job_queue
+from service.collection_store import VERSION_SEPARATOR
+
+# Intervalo de atualização do progresso das ingestões, em segundos
+JOBS_REFRESH_SECONDS = 2
+
+# Ingestões exibidas (as mais recentes)
+JOBS_SHOWN = 5
+
+# Rótulos dos estados das ingestões
+JOB_STATUS_LABELS = {
+    "queued": "na fila",
+    "running": "em andamento",
+    "done": "concluída",
+    "failed": "falhou",
+}
 
 def show():
     """
@@ -22,8 +37,8 @@ def show():
     
     Funcionalidades:
     - Formulário para inserir URL e nome da coleção
-    - Execução do scraping usando Firecrawl API
-    - Feedback visual do progresso e resultados
+    - Agenda o scraping (Firecrawl API) na fila de ingestões em segundo plano
+    - Exibe o progresso das ingestões recentes (páginas, chunks, tempo restante)
     """
     st.header("🔍 Web Scraping")
 
@@ -34,24 +49,75 @@ def show():
         version = st.text_input("Versão da documentação:", placeholder="ex: v1.0, 2024.1, etc.")
         submitted = st.form_submit_button("Iniciar scraping")
 
-    # Processa o scraping quando o formulário é submetido
+    # Agenda o scraping quando o formulário é submetido
     if submitted:
         # Validação dos campos obrigatórios
         if not url or not collection_name or not version:
             st.warning("Preencha a URL, nome e versão da documentação.")
-            return
-            
-        # Execução do scraping com feedback visual
-        with st.spinner("Iniciando scraping..."):
+        elif VERSION_SEPARATOR in collection_name:
+            # O separador identifica a versão pesquisada (ex.: "Firecrawl@v2")
+            st.warning(f"O nome da documentação não pode conter '{VERSION_SEPARATOR}'.")
+        else:
             try:
-                scraper = ScrapingService()
-                result = scraper.scrape_website(url, collection_name, version)
-                
-                # Exibe resultado do scraping
-                if result.get("success"):
-                    st.success(f"Scraping concluído com sucesso! Salvos {result['files']} arquivos.")
-                    st.info("A documentação foi adicionada à lista de documentações disponíveis.")
+                # O crawl e a indexação rodam em segundo plano e sobrevivem a recarregamentos
+                job = get_job_queue().submit("scrape", collection_name, url=url, version=version)
+                if job["created"]:
+                    st.success("Scraping agendado. Acompanhe o progresso abaixo.")
                 else:
-                    st.error(f"Erro ao iniciar scraping: {result.get('error', 'desconhecido')}")
+                    st.info(f"A documentação '{collection_name}' já tem uma ingestão em andamento.")
             except Exception as e:
-                st.error(f"Falha inesperada: {e}")
\ No newline at end of file
+                st.error(f"Erro ao agendar scraping: {e}")
+
+    _show_jobs()
+
+@st.fragment(run_every=JOBS_REFRESH_SECONDS)
+def _show_jobs():
+    """
+    Exibe as ingestões recentes e seu progresso, atualizados periodicamente.
+
+    Apenas este trecho da página é executado novamente a cada atualização,
+    com uma única consulta ao banco de jobs.
+    """
+    jobs = get_job_queue().list(limit=JOBS_SHOWN)
+    if not jobs:
+        return
+
+    st.subheader("Ingestões")
+    for job in jobs:
+        progress = job["progress"]
+        label = "Scraping" if job["kind"] == "scrape" else "Reindexação"
+        st.write(f"**{job['collection']}** · {label} · {JOB_STATUS_LABELS.get(job['status'], job['status'])}")
+
+        details = (
+            f"Páginas recebidas: {progress.get('pages_fetched', 0)} · "
+            f"indexadas: {progress.get('pages_indexed', 0)} · "
+            f"chunks: {progress.get('chunks_indexed', 0)}"
+        )
+        if job["status"] == "running" and progress.get("eta_seconds") is not None:
+            details += f" · restante: {_format_seconds(progress['eta_seconds'])}"
+        st.caption(details)
+
+        total = progress.get("pages_total")
+        if job["status"] == "running" and total:
+            st.progress(min(progress.get("pages_indexed", 0) / total, 1.0))
+
+        result = job["result"] or {}
+        if job["status"] == "failed":
+            st.error(f"Erro: {result.get('error', 'desconhecido')}")
+        elif job["status"] == "done":
+            st.success(
+                f"Concluído: {result.get('files', 0)} arquivos e {result.get('chunks', 0)} novos chunks indexados."
+            )
+
+def _format_seconds(seconds):
+    """
+    Formata uma duração em minutos e segundos.
+
+    Args:
+        seconds (float): Duração em segundos
+
+    Returns:
+        str: Duração formatada (ex.: "2 min 05 s")
+    """
+    minutes, seconds = divmod(int(seconds), 60)
+    return f"{minutes} min {seconds:02d} s" if minutes else f"{seconds} s"
@@ -0,0 +1,197 @@
+"""
+Cache Semântico de Respostas
+
+Este módulo implementa um cache de respostas por coleção. Uma pergunta nova
+reaproveita a resposta de uma pergunta anterior quando os embeddings das duas
+são suficientemente parecidos (similaridade de cosseno acima do limiar).
+As entradas são vinculadas à versão do índice da coleção, expiram após um
+tempo de vida e são descartadas por LRU; tudo fica salvo em SQLite.
+"""
+
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+import numpy as np
+
+# Similaridade mínima entre perguntas para reaproveitar a resposta (padrão: 0.95)
+ANSWER_CACHE_THRESHOLD = float(os.getenv("ANSWER_CACHE_THRESHOLD", "0.95"))
+
+# Tempo de vida de uma resposta em cache, em segundos (padrão: 7 dias)
+ANSWER_CACHE_TTL_SECONDS = float(os.getenv("ANSWER_CACHE_TTL_SECONDS", str(7 * 24 * 3600)))
+
+# Número máximo de respostas em cache por coleção (padrão: 1000)
+ANSWER_CACHE_MAX_ENTRIES = int(os.getenv("ANSWER_CACHE_MAX_ENTRIES", "1000"))
+
+class AnswerCache:
+    """
+    Cache semântico de respostas por coleção, persistido em SQLite.
+
+    Funcionalidades:
+    - Busca respostas por similaridade entre embeddings de perguntas
+    - Invalida as respostas quando o índice da coleção muda de versão
+    - Descarta respostas expiradas (TTL) e as menos usadas (LRU)
+    """
+
+    def __init__(
+        self,
+        db_path="data/cache/answers.sqlite",
+        threshold=ANSWER_CACHE_THRESHOLD,
+        ttl_seconds=ANSWER_CACHE_TTL_SECONDS,
+        max_entries=ANSWER_CACHE_MAX_ENTRIES
+    ):
+        self.threshold = threshold
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+
+        Path(db_path).parent.mkdir(parents=True, exist_ok=True)
+
+        # Conexão única protegida por trava (compartilhada entre threads)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS answers (
+                id INTEGER PRIMARY KEY,
+                collection TEXT NOT NULL,
+                index_version TEXT NOT NULL,
+                question TEXT NOT NULL,
+                embedding BLOB NOT NULL,
+                answer TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                last_used REAL NOT NULL
+            )
+            """
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_answers_collection ON answers (collection, index_version)")
+        self._conn.commit()
+
+        # Matrizes de embeddings em memória por (coleção, versão do índice)
+        self._matrices = {}
+
+    def lookup(self, collection_name, index_version, embedding):
+        """
+        Busca a resposta de uma pergunta parecida já respondida.
+
+        Args:
+            collection_name (str): Nome da coleção
+            index_version (str): Versão (impressão digital) do índice da coleção
+            embedding (list): Embedding da pergunta
+
+        Returns:
+            str: Resposta em cache, ou None se não houver pergunta parecida
+        """
+        query = self._normalize(embedding)
+        with self._lock:
+            ids, matrix = self._matrix(collection_name, index_version)
+            if not ids:
+                self.misses += 1
+                return None
+
+            # Percorre as perguntas da mais parecida para a menos parecida
+            scores = matrix @ query
+            now = time.time()
+            for position in np.argsort(-scores):
+                if scores[position] < self.threshold:
+                    break
+                row = self._conn.execute(
+                    "SELECT answer, created_at FROM answers WHERE id = ?", (ids[position],)
+                ).fetchone()
+                if row and now - row[1] <= self.ttl_seconds:
+                    self._conn.execute("UPDATE answers SET last_used = ? WHERE id = ?", (now, ids[position]))
+                    self._conn.commit()
+                    self.hits += 1
+                    return row[0]
+
+            self.misses += 1
+            return None
+
+    def store(self, collection_name, index_version, question, embedding, answer):
+        """
+        Guarda a resposta de uma pergunta.
+
+        Também remove respostas de versões anteriores do índice da coleção,
+        respostas expiradas e, se necessário, as menos usadas.
+
+        Args:
+            collection_name (str): Nome da coleção
+            index_version (str): Versão (impressão digital) do índice da coleção
+            question (str): Pergunta original
+            embedding (list): Embedding da pergunta
+            answer (str): Resposta gerada
+        """
+        vector = self._normalize(embedding)
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "DELETE FROM answers WHERE collection = ? AND (index_version != ? OR created_at < ?)",
+                (collection_name, index_version, now - self.ttl_seconds)
+            )
+            self._conn.execute(
+                "INSERT INTO answers (collection, index_version, question, embedding, answer, created_at, last_used) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (collection_name, index_version, question, vector.tobytes(), answer, now, now)
+            )
+            self._conn.execute(
+                "DELETE FROM answers WHERE collection = ? AND id NOT IN "
+                "(SELECT id FROM answers WHERE collection = ? ORDER BY last_used DESC LIMIT ?)",
+                (collection_name, collection_name, self.max_entries)
+            )
+            self._conn.commit()
+
+            # A matriz em memória será recarregada na próxima busca
+            for key in [k for k in self._matrices if k[0] == collection_name]:
+                del self._matrices[key]
+
+    def stats(self):
+        """
+        Retorna estatísticas do cache.
+
+        Returns:
+            dict: Acertos, falhas e número de respostas guardadas
+        """
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM answers").fetchone()[0]
+            return {"hits": self.hits, "misses": self.misses, "entries": entries}
+
+    def _matrix(self, collection_name, index_version):
+        """
+        Retorna a matriz de embeddings das perguntas de uma coleção (a trava deve estar adquirida).
+
+        Args:
+            collection_name (str): Nome da coleção
+            index_version (str): Versão do índice da coleção
+
+        Returns:
+            tuple: (ids das respostas, matriz float32 com um embedding por linha)
+        """
+        key = (collection_name, index_version)
+        if key not in self._matrices:
+            rows = self._conn.execute(
+                "SELECT id, embedding FROM answers WHERE collection = ? AND index_version = ?",
+                key
+            ).fetchall()
+            ids = [row[0] for row in rows]
+            matrix = np.stack([np.frombuffer(row[1], dtype=np.float32) for row in rows]) if rows else None
+            self._matrices[key] = (ids, matrix)
+        return self._matrices[key]
+
+    @staticmethod
+    def _normalize(embedding):
+        """
+        Normaliza um embedding para comparar por similaridade de cosseno.
+
+        Args:
+            embedding (list): Embedding original
+
+        Returns:
+            np.ndarray: Vetor float32 com norma 1
+        """
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
@@ -0,0 +1,198 @@
+"""
+Perguntas em Lote
+
+Este módulo responde conjuntos grandes de perguntas (ex.: avaliações com
+milhares de perguntas) sobre as coleções carregadas em um RAGService. As
+perguntas são processadas em blocos: cada bloco é embedado de uma vez e
+pesquisado com uma única busca k-NN vetorizada por índice; as chamadas ao
+LLM são feitas em paralelo, limitadas por concorrência e pelas cotas de
+requisições e tokens por minuto. Cada resultado é entregue assim que fica
+pronto, com o tempo de cada etapa.
+"""
+
+import asyncio
+import os
+import time
+
+from service.llm_scheduler import LLM_REQUESTS_PER_MINUTE, LLM_TOKENS_PER_MINUTE, LLMScheduler
+from service.metrics import get_metrics
+
+# Chamadas simultâneas ao LLM (padrão: 8)
+BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", "8"))
+
+# Perguntas embedadas e pesquisadas de uma vez (padrão: 256)
+BATCH_BLOCK_SIZE = int(os.getenv("BATCH_BLOCK_SIZE", "256"))
+
+class BatchQuestionAnswering:
+    """
+    Respostas em lote sobre as coleções de um RAGService.
+
+    Funcionalidades:
+    - Embeda as perguntas em blocos e as pesquisa com busca k-NN vetorizada
+    - Reaproveita respostas do cache semântico
+    - Chama o LLM em paralelo, respeitando concorrência e cotas por minuto, com novas tentativas
+    - Entrega cada resultado assim que fica pronto, com os tempos por etapa
+    """
+
+    def __init__(
+        self,
+        rag_service,
+        concurrency=BATCH_CONCURRENCY,
+        requests_per_minute=LLM_REQUESTS_PER_MINUTE,
+        tokens_per_minute=LLM_TOKENS_PER_MINUTE,
+        block_size=BATCH_BLOCK_SIZE,
+        use_cache=True
+    ):
+        self.rag = rag_service
+        self.concurrency = max(1, concurrency)
+        self.block_size = max(1, block_size)
+        self.use_cache = use_cache
+
+        # Chamadas ao LLM: cotas por minuto, novas tentativas e perguntas
+        # repetidas no lote unidas em uma única chamada
+        self.scheduler = LLMScheduler(requests_per_minute, tokens_per_minute, max_concurrency=self.concurrency)
+
+        self.metrics = get_metrics()
+
+    def run(self, questions, on_result):
+        """
+        Responde as perguntas, bloqueando até terminar.
+
+        Args:
+            questions (list): Perguntas
+            on_result (callable): Chamada com o resultado de cada pergunta, na ordem de conclusão
+
+        Returns:
+            dict: Totais (perguntas, respostas do cache, erros, duração)
+        """
+        return asyncio.run(self.arun(questions, on_result))
+
+    async def arun(self, questions, on_result):
+        """
+        Versão assíncrona de run.
+
+        Args:
+            questions (list): Perguntas
+            on_result (callable): Chamada com o resultado de cada pergunta
+
+        Returns:
+            dict: Totais (perguntas, respostas do cache, erros, duração)
+        """
+        started = time.perf_counter()
+        loop = asyncio.get_running_loop()
+        # Fila curta: os blocos seguintes são preparados enquanto o LLM responde
+        pending = asyncio.Queue(maxsize=self.concurrency * 2)
+        totals = {"questions": len(questions), "cached": 0, "errors": 0}
+
+        def finish(item):
+            if item.get("cached"):
+                totals["cached"] += 1
+            if "error" in item:
+                totals["errors"] += 1
+            item["timings"]["total_ms"] = round((time.perf_counter() - item.pop("_started")) * 1000, 2)
+            on_result(item)
+
+        async def produce():
+            try:
+                for start in range(0, len(questions), self.block_size):
+                    block = questions[start:start + self.block_size]
+                    for item in await loop.run_in_executor(None, self._prepare_block, start, block):
+                        if "prompt" in item:
+                            await pending.put(item)
+                        else:
+                            finish(item)
+            finally:
+                for _ in range(self.concurrency):
+                    await pending.put(None)
+
+        async def answer():
+            while (item := await pending.get()) is not None:
+                await self._answer(item)
+                finish(item)
+
+        await asyncio.gather(produce(), *(answer() for _ in range(self.concurrency)))
+        totals["seconds"] = round(time.perf_counter() - started, 2)
+        return totals
+
+    def _prepare_block(self, start, questions):
+        """
+        Embeda, consulta o cache e busca o contexto de um bloco de perguntas.
+
+        Os tempos do embedding e da busca, feitos para o bloco inteiro, são
+        divididos igualmente entre as perguntas.
+
+        Args:
+            start (int): Posição da primeira pergunta do bloco
+            questions (list): Perguntas do bloco
+
+        Returns:
+            list: Um item por pergunta, com o prompt a enviar ou a resposta do cache
+        """
+        rag = self.rag
+        block_started = time.perf_counter()
+        items = [
+            {"index": start + i, "question": question, "timings": {}, "_started": block_started}
+            for i, question in enumerate(questions)
+        ]
+
+        with self.metrics.span("batch.embed"):
+            embeddings = rag.embeddings.embed_documents(questions)
+        embed_ms = (time.perf_counter() - block_started) * 1000 / len(items)
+
+        pending = []
+        for item, embedding in zip(items, embeddings):
+            item["timings"]["embed_ms"] = round(embed_ms, 2)
+            item["_embedding"] = embedding
+            if self.use_cache:
+                started = time.perf_counter()
+                cached = rag.answer_cache.lookup(rag.collection_name, rag.index_version, embedding)
+                item["timings"]["cache_ms"] = round((time.perf_counter() - started) * 1000, 2)
+                if cached is not None:
+                    item.update(answer=cached, cached=True, sources=[])
+                    del item["_embedding"]
+                    continue
+            pending.append(item)
+
+        if pending:
+            started = time.perf_counter()
+            with self.metrics.span("batch.retrieval"):
+                results = rag.retrieve_batch(
+                    [item["question"] for item in pending], [item["_embedding"] for item in pending]
+                )
+            retrieval_ms = (time.perf_counter() - started) * 1000 / len(pending)
+
+            for item, scored in zip(pending, results):
+                started = time.perf_counter()
+                docs = rag.context_packer.pack(scored)
+                item["prompt"] = rag._build_prompt(item["question"], docs)
+                item["sources"] = [doc.metadata.get("source") for doc in docs]
+                item["cached"] = False
+                item["timings"]["retrieval_ms"] = round(retrieval_ms, 2)
+                item["timings"]["prompt_ms"] = round((time.perf_counter() - started) * 1000, 2)
+        return items
+
+    async def _answer(self, item):
+        """
+        Chama o LLM para um item, aguardando as cotas da API.
+
+        Args:
+            item (dict): Item preparado por _prepare_block (recebe a resposta ou o erro)
+        """
+        rag = self.rag
+        prompt = item.pop("prompt")
+        embedding = item.pop("_embedding")
+
+        timings = {}
+        try:
+            with self.metrics.span("batch.llm"):
+                item["answer"] = await self.scheduler.ainvoke(rag.llm, prompt, timings)
+            if self.use_cache:
+                await asyncio.get_running_loop().run_in_executor(
+                    None, rag.answer_cache.store,
+                    rag.collection_name, rag.index_version, item["question"], embedding, item["answer"]
+                )
+        except Exception as e:
+            item["answer"] = None
+            item["error"] = str(e)
+        item["timings"]["wait_ms"] = timings.get("wait_ms", 0.0)
+        item["timings"]["llm_ms"] = timings.get("llm_ms", 0.0)
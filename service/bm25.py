@@ -0,0 +1,233 @@
+"""
+Índice Lexical BM25
+
+Este módulo implementa um índice invertido com ranqueamento BM25, usado em
+conjunto com a busca vetorial para encontrar termos exatos (nomes de APIs,
+códigos de erro, parâmetros) que os embeddings costumam perder. As listas
+de postings ficam em arrays numpy contíguos, já com o peso BM25 de cada
+ocorrência calculado, salvos em disco e carregados via memory-map: cada
+consulta apenas soma as postings dos termos da pergunta.
+"""
+
+import json
+import math
+import re
+from collections import Counter
+from pathlib import Path
+
+import numpy as np
+
+# Parâmetros clássicos do BM25
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+# Termos presentes em quase todos os chunks (IDF abaixo disto) são ignorados na consulta
+BM25_MIN_IDF = 0.1
+
+# Palavras, números e identificadores como scrape_url, v1.2.3 ou ERR-429
+_TOKEN_PATTERN = re.compile(r"\w(?:[\w.\-]*\w)?")
+
+def tokenize(text):
+    """
+    Divide um texto em termos para o índice lexical.
+
+    Identificadores compostos (ex.: "app.scrape_url") geram o termo completo
+    e também suas partes, para casar tanto a busca exata quanto a parcial.
+
+    Args:
+        text (str): Texto a ser dividido
+
+    Returns:
+        list: Termos em minúsculas
+    """
+    terms = []
+    for token in _TOKEN_PATTERN.findall(text.lower()):
+        terms.append(token)
+        if "." in token or "-" in token:
+            terms.extend(part for part in re.split(r"[.\-]", token) if part)
+    return terms
+
+class BM25Index:
+    """
+    Índice invertido com ranqueamento BM25.
+
+    Funcionalidades:
+    - Constrói as postings, com os pesos BM25 pré-calculados, a partir dos chunks
+    - Salva e carrega o índice (arrays via memory-map)
+    - Retorna os chunks mais relevantes para uma consulta
+    """
+
+    def __init__(self, ids, vocabulary, offsets, postings_docs, postings_weights):
+        # Identificadores dos chunks (mesmos do índice FAISS)
+        self.ids = ids
+        # Termo -> posição em offsets
+        self.vocabulary = vocabulary
+        # Postings do termo t ficam em [offsets[t], offsets[t + 1])
+        self.offsets = offsets
+        self.postings_docs = postings_docs
+        # Contribuição BM25 (idf * tf normalizado) de cada posting
+        self.postings_weights = postings_weights
+
+    @classmethod
+    def build(cls, ids, texts):
+        """
+        Constrói o índice a partir dos chunks.
+
+        Args:
+            ids (list): Identificadores dos chunks
+            texts (list): Conteúdo de cada chunk
+
+        Returns:
+            BM25Index: Índice construído
+        """
+        vocabulary = {}
+        term_rows = []
+        doc_rows = []
+        tf_rows = []
+        doc_lengths = np.zeros(len(texts), dtype=np.float32)
+
+        for doc, text in enumerate(texts):
+            counts = Counter(tokenize(text))
+            doc_lengths[doc] = sum(counts.values())
+            for term, tf in counts.items():
+                term_rows.append(vocabulary.setdefault(term, len(vocabulary)))
+                doc_rows.append(doc)
+                tf_rows.append(tf)
+
+        # Agrupa as postings por termo (layout CSR)
+        term_rows = np.asarray(term_rows, dtype=np.int64)
+        order = np.argsort(term_rows, kind="stable")
+        df = np.bincount(term_rows, minlength=len(vocabulary))
+        offsets = np.zeros(len(vocabulary) + 1, dtype=np.int64)
+        np.cumsum(df, out=offsets[1:])
+
+        term_rows = term_rows[order]
+        doc_rows = np.asarray(doc_rows, dtype=np.int32)[order]
+        tf = np.asarray(tf_rows, dtype=np.float32)[order]
+
+        # Pesos BM25 calculados uma única vez, na construção
+        total_docs = len(texts)
+        avg_length = doc_lengths.mean() if total_docs else 1.0
+        idf = np.log(1 + (total_docs - df + 0.5) / (df + 0.5)).astype(np.float32)
+        norm = tf + BM25_K1 * (1 - BM25_B + BM25_B * doc_lengths[doc_rows] / avg_length)
+        weights = idf[term_rows] * tf * (BM25_K1 + 1) / norm
+
+        return cls(list(ids), vocabulary, offsets, doc_rows, weights.astype(np.float32))
+
+    @classmethod
+    def from_vectorstore(cls, vectorstore):
+        """
+        Constrói o índice com os mesmos chunks de um índice FAISS.
+
+        Args:
+            vectorstore (FAISS): Índice vetorial da coleção
+
+        Returns:
+            BM25Index: Índice construído
+        """
+        ids = list(vectorstore.index_to_docstore_id.values())
+        texts = [vectorstore.docstore.search(chunk_id).page_content for chunk_id in ids]
+        return cls.build(ids, texts)
+
+    def save(self, path):
+        """
+        Salva o índice em um diretório.
+
+        Args:
+            path (Path): Diretório de destino
+        """
+        path = Path(path)
+        path.mkdir(parents=True, exist_ok=True)
+        np.save(path / "offsets.npy", self.offsets)
+        np.save(path / "postings_docs.npy", self.postings_docs)
+        np.save(path / "postings_weights.npy", self.postings_weights)
+        with open(path / "terms.json", "w", encoding="utf-8") as f:
+            json.dump(list(self.vocabulary), f, ensure_ascii=False)
+        with open(path / "ids.json", "w", encoding="utf-8") as f:
+            json.dump(self.ids, f)
+
+    @classmethod
+    def load(cls, path):
+        """
+        Carrega um índice salvo, mapeando os arrays em memória.
+
+        Args:
+            path (Path): Diretório do índice
+
+        Returns:
+            BM25Index: Índice carregado, ou None se ausente
+        """
+        path = Path(path)
+        if not (path / "ids.json").exists():
+            return None
+        with open(path / "terms.json", "r", encoding="utf-8") as f:
+            vocabulary = {term: position for position, term in enumerate(json.load(f))}
+        with open(path / "ids.json", "r", encoding="utf-8") as f:
+            ids = json.load(f)
+        return cls(
+            ids,
+            vocabulary,
+            np.load(path / "offsets.npy", mmap_mode="r"),
+            np.load(path / "postings_docs.npy", mmap_mode="r"),
+            np.load(path / "postings_weights.npy", mmap_mode="r")
+        )
+
+    def search(self, query, k, allowed=None):
+        """
+        Busca os chunks mais relevantes para uma consulta.
+
+        Args:
+            query (str): Texto da consulta
+            k (int): Número máximo de resultados
+            allowed (np.ndarray): Máscara booleana dos chunks pesquisáveis, na ordem de ids (opcional)
+
+        Returns:
+            list: Pares (id do chunk, pontuação BM25), do mais para o menos relevante
+        """
+        total_docs = len(self.ids)
+        if not total_docs:
+            return []
+
+        doc_parts = []
+        weight_parts = []
+        for term in set(tokenize(query)):
+            position = self.vocabulary.get(term)
+            if position is None:
+                continue
+            start, end = int(self.offsets[position]), int(self.offsets[position + 1])
+
+            # Termos quase onipresentes custam caro e não alteram o ranqueamento
+            df = end - start
+            if math.log(1 + (total_docs - df + 0.5) / (df + 0.5)) < BM25_MIN_IDF:
+                continue
+            doc_parts.append(self.postings_docs[start:end])
+            weight_parts.append(self.postings_weights[start:end])
+
+        if not doc_parts:
+            return []
+
+        # Soma as contribuições por chunk, sem percorrer a coleção inteira
+        docs, positions = np.unique(np.concatenate(doc_parts), return_inverse=True)
+        scores = np.bincount(positions, weights=np.concatenate(weight_parts))
+        if allowed is not None:
+            keep = allowed[docs]
+            docs, scores = docs[keep], scores[keep]
+            if not len(docs):
+                return []
+
+        top = np.arange(len(docs))
+        if len(top) > k:
+            top = np.argpartition(-scores, k)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(self.ids[docs[i]], float(scores[i])) for i in top]
+
+    def memory_size(self):
+        """
+        Estima a memória ocupada pelo índice (arrays em memory-map não são contados).
+
+        Returns:
+            int: Tamanho estimado em bytes
+        """
+        arrays = (self.offsets, self.postings_docs, self.postings_weights)
+        arrays_size = sum(array.nbytes for array in arrays if not isinstance(array, np.memmap))
+        return arrays_size + 64 * (len(self.vocabulary) + len(self.ids))
@@ -0,0 +1,347 @@
+"""
+Catálogo de Coleções
+
+Este módulo mantém o catálogo das coleções de documentação (nome, URL,
+versão, data de inserção, número de arquivos) em um banco SQLite indexado,
+no lugar do antigo data/collections/index.json. Cada coleção guarda também
+o histórico das versões ingeridas; a versão da coleção é a mais recente. As gravações são upserts
+atômicos, seguros entre threads e processos, e as listagens são consultas
+paginadas e ordenadas, com resultados em cache até a próxima alteração.
+"""
+
+import json
+import os
+import sqlite3
+import threading
+from pathlib import Path
+
+from service.registry import get_registry
+
+# Banco do catálogo (padrão: data/catalog.sqlite)
+CATALOG_DB_PATH = os.getenv("CATALOG_DB_PATH", "data/catalog.sqlite")
+
+# Colunas aceitas na ordenação das listagens
+SORT_COLUMNS = ("name", "url", "version", "inserted_at", "files_count")
+
+class CollectionCatalog:
+    """
+    Catálogo das coleções de documentação, persistido em SQLite.
+
+    Funcionalidades:
+    - Registra ou atualiza coleções com upserts atômicos
+    - Lista coleções com paginação, ordenação e filtro por nome
+    - Registra cada versão ingerida de uma coleção
+    - Mantém as leituras em cache, invalidadas por qualquer alteração
+      (inclusive de outros processos)
+    - Importa o index.json e os metadata.json existentes na primeira execução
+    """
+
+    def __init__(self, db_path=CATALOG_DB_PATH, collections_path="data/collections"):
+        self.collections_path = Path(collections_path)
+        Path(db_path).parent.mkdir(parents=True, exist_ok=True)
+
+        # Conexão única protegida por trava (compartilhada entre threads)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False, timeout=30)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS collections (
+                name TEXT PRIMARY KEY,
+                url TEXT,
+                version TEXT,
+                inserted_at TEXT,
+                files_count INTEGER NOT NULL DEFAULT 0
+            )
+            """
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_collections_inserted_at ON collections (inserted_at)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_collections_files_count ON collections (files_count)")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS collection_versions (
+                name TEXT NOT NULL,
+                version TEXT NOT NULL,
+                url TEXT,
+                inserted_at TEXT,
+                files_count INTEGER NOT NULL DEFAULT 0,
+                PRIMARY KEY (name, version)
+            )
+            """
+        )
+        self._conn.execute("CREATE TABLE IF NOT EXISTS catalog_meta (key TEXT PRIMARY KEY, value TEXT)")
+        # Catálogos anteriores às versões: a versão atual de cada coleção vira a primeira do histórico
+        self._conn.execute(
+            """
+            INSERT OR IGNORE INTO collection_versions (name, version, url, inserted_at, files_count)
+            SELECT name, version, url, inserted_at, files_count FROM collections
+            WHERE version IS NOT NULL
+            AND NOT EXISTS (SELECT 1 FROM catalog_meta WHERE key = 'versions_migrated')
+            """
+        )
+        self._conn.execute("INSERT OR IGNORE INTO catalog_meta (key, value) VALUES ('versions_migrated', '1')")
+        self._conn.commit()
+
+        # Consultas em cache e a versão do banco em que foram feitas
+        self._cache = {}
+        self._cache_version = None
+
+        self._migrate()
+
+    def upsert(self, metadata):
+        """
+        Registra uma coleção ou atualiza seus metadados.
+
+        A versão dos metadados passa a ser a versão atual da coleção e é
+        registrada (ou atualizada) no seu histórico.
+
+        Args:
+            metadata (dict): Metadados da coleção (name, url, version, inserted_at, files_count)
+        """
+        with self._lock:
+            self._conn.execute(
+                """
+                INSERT INTO collections (name, url, version, inserted_at, files_count)
+                VALUES (:name, :url, :version, :inserted_at, :files_count)
+                ON CONFLICT (name) DO UPDATE SET
+                    url = excluded.url,
+                    version = excluded.version,
+                    inserted_at = excluded.inserted_at,
+                    files_count = excluded.files_count
+                """,
+                {
+                    "name": metadata["name"],
+                    "url": metadata.get("url"),
+                    "version": metadata.get("version"),
+                    "inserted_at": metadata.get("inserted_at"),
+                    "files_count": metadata.get("files_count") or 0
+                }
+            )
+            if metadata.get("version"):
+                self._conn.execute(
+                    """
+                    INSERT INTO collection_versions (name, version, url, inserted_at, files_count)
+                    VALUES (:name, :version, :url, :inserted_at, :files_count)
+                    ON CONFLICT (name, version) DO UPDATE SET
+                        url = excluded.url,
+                        inserted_at = excluded.inserted_at,
+                        files_count = excluded.files_count
+                    """,
+                    {
+                        "name": metadata["name"],
+                        "url": metadata.get("url"),
+                        "version": metadata["version"],
+                        "inserted_at": metadata.get("inserted_at"),
+                        "files_count": metadata.get("files_count") or 0
+                    }
+                )
+            self._conn.commit()
+            self._cache.clear()
+
+    def delete(self, name):
+        """
+        Remove uma coleção do catálogo.
+
+        Args:
+            name (str): Nome da coleção
+        """
+        with self._lock:
+            self._conn.execute("DELETE FROM collections WHERE name = ?", (name,))
+            self._conn.execute("DELETE FROM collection_versions WHERE name = ?", (name,))
+            self._conn.commit()
+            self._cache.clear()
+
+    def versions(self, name):
+        """
+        Lista as versões registradas de uma coleção.
+
+        Args:
+            name (str): Nome da coleção
+
+        Returns:
+            list: Metadados de cada versão (version, url, inserted_at, files_count), da mais recente para a mais antiga
+        """
+        return self._query(
+            "SELECT * FROM collection_versions WHERE name = ? ORDER BY inserted_at DESC, version",
+            (name,)
+        )
+
+    def delete_version(self, name, version):
+        """
+        Remove uma versão do histórico de uma coleção.
+
+        Se era a versão atual, a coleção passa a apontar para a versão
+        restante mais recente.
+
+        Args:
+            name (str): Nome da coleção
+            version (str): Versão a remover
+        """
+        with self._lock:
+            self._conn.execute("DELETE FROM collection_versions WHERE name = ? AND version = ?", (name, version))
+            latest = self._conn.execute(
+                "SELECT * FROM collection_versions WHERE name = ? ORDER BY inserted_at DESC LIMIT 1", (name,)
+            ).fetchone()
+            if latest is not None:
+                self._conn.execute(
+                    """
+                    UPDATE collections SET version = ?, url = ?, inserted_at = ?, files_count = ?
+                    WHERE name = ? AND version = ?
+                    """,
+                    (latest["version"], latest["url"], latest["inserted_at"], latest["files_count"], name, version)
+                )
+            self._conn.commit()
+            self._cache.clear()
+
+    def get(self, name):
+        """
+        Retorna os metadados de uma coleção.
+
+        Args:
+            name (str): Nome da coleção
+
+        Returns:
+            dict: Metadados, ou None se a coleção não estiver no catálogo
+        """
+        rows = self._query("SELECT * FROM collections WHERE name = ?", (name,))
+        return rows[0] if rows else None
+
+    def list(self, offset=0, limit=50, sort_by="inserted_at", descending=True, search=None):
+        """
+        Lista uma página de coleções.
+
+        Args:
+            offset (int): Coleções a pular
+            limit (int): Tamanho da página (None para todas)
+            sort_by (str): Coluna de ordenação (SORT_COLUMNS)
+            descending (bool): Ordem decrescente
+            search (str): Filtra pelo trecho do nome (opcional)
+
+        Returns:
+            list: Metadados das coleções da página
+        """
+        if sort_by not in SORT_COLUMNS:
+            raise ValueError(f"Coluna de ordenação inválida: {sort_by}")
+        where, params = self._where(search)
+        direction = "DESC" if descending else "ASC"
+        sql = f"SELECT * FROM collections{where} ORDER BY {sort_by} {direction}, name LIMIT ? OFFSET ?"
+        return self._query(sql, params + (-1 if limit is None else limit, offset))
+
+    def count(self, search=None):
+        """
+        Conta as coleções do catálogo.
+
+        Args:
+            search (str): Filtra pelo trecho do nome (opcional)
+
+        Returns:
+            int: Número de coleções
+        """
+        where, params = self._where(search)
+        return self._query(f"SELECT COUNT(*) AS total FROM collections{where}", params)[0]["total"]
+
+    def names(self, search=None, limit=None):
+        """
+        Lista os nomes das coleções em ordem alfabética.
+
+        Args:
+            search (str): Filtra pelo trecho do nome (opcional)
+            limit (int): Número máximo de nomes (None para todos)
+
+        Returns:
+            list: Nomes das coleções
+        """
+        rows = self.list(limit=limit, sort_by="name", descending=False, search=search)
+        return [row["name"] for row in rows]
+
+    @staticmethod
+    def _where(search):
+        """
+        Monta o filtro por nome das consultas.
+
+        Args:
+            search (str): Trecho do nome, ou None
+
+        Returns:
+            tuple: (cláusula WHERE, parâmetros)
+        """
+        if not search:
+            return "", ()
+        escaped = search.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+        return " WHERE name LIKE ? ESCAPE '\\'", (f"%{escaped}%",)
+
+    def _query(self, sql, params):
+        """
+        Executa uma consulta de leitura, usando o cache se o banco não mudou.
+
+        Args:
+            sql (str): Consulta SQL
+            params (tuple): Parâmetros da consulta
+
+        Returns:
+            list: Linhas como dicionários
+        """
+        with self._lock:
+            # data_version muda quando outra conexão (ex.: outro processo) grava no banco
+            version = self._conn.execute("PRAGMA data_version").fetchone()[0]
+            if version != self._cache_version:
+                self._cache.clear()
+                self._cache_version = version
+
+            key = (sql, params)
+            rows = self._cache.get(key)
+            if rows is None:
+                rows = [dict(row) for row in self._conn.execute(sql, params)]
+                self._cache[key] = rows
+            return [dict(row) for row in rows]
+
+    def _migrate(self):
+        """
+        Importa as coleções existentes na primeira execução do catálogo.
+
+        Usa o index.json, se existir, e os metadata.json de cada coleção;
+        diretórios sem metadados entram apenas com o nome.
+        """
+        with self._lock:
+            if self._conn.execute("SELECT 1 FROM catalog_meta WHERE key = 'migrated'").fetchone():
+                return
+
+        collections = {}
+        index_file = self.collections_path / "index.json"
+        try:
+            if index_file.exists():
+                with open(index_file, "r", encoding="utf-8") as f:
+                    for metadata in json.load(f):
+                        if metadata.get("name"):
+                            collections[metadata["name"]] = metadata
+
+            if self.collections_path.exists():
+                for item in self.collections_path.iterdir():
+                    if not item.is_dir() or item.name in collections:
+                        continue
+                    metadata = {"name": item.name}
+                    metadata_file = item / "metadata.json"
+                    if metadata_file.exists():
+                        with open(metadata_file, "r", encoding="utf-8") as f:
+                            metadata.update(json.load(f))
+                    collections[item.name] = metadata
+        except Exception as e:
+            print(f"Erro ao importar coleções existentes: {str(e)}")
+
+        for metadata in collections.values():
+            self.upsert(metadata)
+        with self._lock:
+            self._conn.execute("INSERT OR REPLACE INTO catalog_meta (key, value) VALUES ('migrated', '1')")
+            self._conn.commit()
+        if collections:
+            print(f"Catálogo: {len(collections)} coleções importadas")
+
+def get_catalog():
+    """
+    Retorna o catálogo de coleções do processo.
+
+    Returns:
+        CollectionCatalog: Catálogo compartilhado entre sessões
+    """
+    return get_registry().get_model("catalog", CollectionCatalog)
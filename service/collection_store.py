@@ -0,0 +1,1199 @@
+"""
+Armazenamento das Páginas de uma Coleção
+
+Este módulo abstrai onde ficam as páginas crawleadas de uma coleção. O
+formato tradicional grava um arquivo N.md por página. O formato empacotado
+grava todas as páginas em um único arquivo (pages.pack), com o conteúdo de
+cada página comprimido e uma tabela de posições com o hash e o tamanho de
+cada uma; a leitura é feita via memory-map, com acesso direto a qualquer
+página e descompressão em paralelo durante a indexação. Coleções no formato
+de arquivos são convertidas automaticamente quando o formato empacotado
+está ativo.
+
+O formato versionado guarda várias versões da mesma coleção. Cada versão é
+um manifesto (nome da página -> hash do conteúdo) e o conteúdo fica em um
+repositório endereçado por conteúdo, compartilhado por todas as coleções:
+páginas que não mudaram entre versões são gravadas uma única vez.
+
+Formato do pages.pack:
+    cabeçalho (8 bytes) | páginas comprimidas (zlib) ... | tabela (JSON
+    comprimido) | posição e tamanho da tabela (2 x 8 bytes) | marcador (8 bytes)
+
+Novas páginas e novas tabelas são sempre acrescentadas ao final do arquivo;
+a tabela válida é a última. Conteúdos e tabelas substituídos viram espaço
+livre, recuperado por compactação quando passam da metade do arquivo.
+"""
+
+import hashlib
+import json
+import mmap
+import os
+import re
+import struct
+import threading
+import time
+import zlib
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from pathlib import Path
+
+try:
+    import fcntl
+except ImportError:
+    # Sem fcntl (Windows), as gravações só são coordenadas dentro do processo
+    fcntl = None
+
+# Formato das coleções novas: files (um .md por página), packed ou versioned (padrão: files)
+COLLECTION_FORMAT = os.getenv("COLLECTION_FORMAT", "files")
+
+# Repositório de páginas endereçado por conteúdo do formato versionado (padrão: data/pages)
+PAGE_STORE_PATH = os.getenv("PAGE_STORE_PATH", "data/pages")
+
+# Idade mínima, em segundos, para descartar conteúdos sem referência (gravações
+# em andamento ainda não aparecem nos manifestos) (padrão: 3600)
+PAGE_STORE_GRACE_SECONDS = int(os.getenv("PAGE_STORE_GRACE_SECONDS", "3600"))
+
+# Nível de compressão zlib das páginas (1 = mais rápido, 9 = menor) (padrão: 6)
+PACK_COMPRESSION_LEVEL = int(os.getenv("PACK_COMPRESSION_LEVEL", "6"))
+
+# Páginas gravadas entre atualizações da tabela no disco (padrão: 100)
+PACK_FLUSH_PAGES = int(os.getenv("PACK_FLUSH_PAGES", "100"))
+
+# Threads que descomprimem páginas em paralelo (zlib libera o GIL)
+PACK_DECODE_WORKERS = int(os.getenv("PACK_DECODE_WORKERS", str(min(8, os.cpu_count() or 1))))
+
+PACK_FILE = "pages.pack"
+# Trava entre processos das gravações no pacote (a compactação troca o arquivo do pacote)
+PACK_LOCK_FILE = "pages.pack.lock"
+PACK_HEADER = b"ATDPACK\x01"
+PACK_TRAILER = b"ATDPEND\x01"
+_TRAILER = struct.Struct("<QQ8s")
+
+# Diretório dos manifestos de versão dentro da coleção
+VERSIONS_DIR = "versions"
+
+# Separador entre o nome da coleção e a versão (ex.: "Firecrawl@v2")
+VERSION_SEPARATOR = "@"
+
+# Versão atribuída às páginas de coleções convertidas sem versão conhecida
+DEFAULT_VERSION = "1"
+
+# Trava do repositório de conteúdo, dentro de PAGE_STORE_PATH
+STORE_LOCK_FILE = ".lock"
+
+# Páginas lidas por rodada de leitura paralela
+_READ_WINDOW = 64
+
+_decode_pool = ThreadPoolExecutor(max_workers=max(1, PACK_DECODE_WORKERS), thread_name_prefix="pack-decode")
+
+class PageCollection(ABC):
+    """
+    Interface comum dos formatos de armazenamento de páginas.
+
+    Funcionalidades:
+    - Lista, lê, grava e remove páginas pelo nome (ex.: "12.md")
+    - Informa hash e tamanho de cada página sem reprocessar as inalteradas
+    - Lê várias páginas em paralelo, na ordem pedida
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+
+    def source(self, name):
+        """
+        Retorna o caminho usado como fonte dos chunks de uma página.
+
+        Args:
+            name (str): Nome da página
+
+        Returns:
+            str: Caminho da página (no formato empacotado, um caminho virtual)
+        """
+        return str(self.path / name)
+
+    @abstractmethod
+    def names(self):
+        """
+        Lista as páginas da coleção.
+
+        Returns:
+            list: Nomes das páginas, em ordem
+        """
+
+    @abstractmethod
+    def read(self, name):
+        """
+        Lê o conteúdo de uma página.
+
+        Args:
+            name (str): Nome da página
+
+        Returns:
+            str: Conteúdo markdown
+        """
+
+    @abstractmethod
+    def page_info(self, name, previous=None):
+        """
+        Retorna o hash e o tamanho de uma página.
+
+        Args:
+            name (str): Nome da página
+            previous (dict): Informações da página no último manifesto (opcional)
+
+        Returns:
+            dict: {"hash", "size", ...}
+        """
+
+    @abstractmethod
+    def write(self, name, content):
+        """
+        Grava uma página apenas se o conteúdo mudou.
+
+        Args:
+            name (str): Nome da página
+            content (str): Conteúdo markdown
+
+        Returns:
+            bool: True se a página foi criada ou alterada
+        """
+
+    @abstractmethod
+    def remove(self, names):
+        """
+        Remove páginas da coleção.
+
+        Args:
+            names (list): Nomes das páginas
+        """
+
+    def page_name(self, name):
+        """
+        Retorna o nome com que uma página do crawl é gravada.
+
+        Args:
+            name (str): Nome da página no crawl (ex.: "12.md")
+
+        Returns:
+            str: Nome da página na coleção
+        """
+        return name
+
+    def iter_read(self, names):
+        """
+        Lê várias páginas, descomprimindo-as em paralelo.
+
+        Args:
+            names (list): Nomes das páginas
+
+        Yields:
+            tuple: (nome, conteúdo), na ordem dos nomes
+        """
+        names = list(names)
+        for start in range(0, len(names), _READ_WINDOW):
+            window = names[start:start + _READ_WINDOW]
+            yield from zip(window, _decode_pool.map(self.read, window))
+
+    def flush(self):
+        """
+        Persiste as gravações pendentes (sem efeito no formato de arquivos).
+        """
+
+class FileCollection(PageCollection):
+    """
+    Coleção com um arquivo .md por página.
+    """
+
+    def names(self):
+        return sorted(file.name for file in self.path.glob("*.md"))
+
+    def read(self, name):
+        return (self.path / name).read_text(encoding="utf-8")
+
+    def page_info(self, name, previous=None):
+        """
+        Retorna o hash e o tamanho de uma página.
+
+        Páginas cujo tamanho e data de modificação não mudaram reaproveitam o
+        hash anterior, sem reler o arquivo.
+
+        Args:
+            name (str): Nome da página
+            previous (dict): Informações da página no último manifesto (opcional)
+
+        Returns:
+            dict: {"hash", "size", "mtime_ns"}
+        """
+        file = self.path / name
+        stat = file.stat()
+        if previous and previous.get("size") == stat.st_size and previous.get("mtime_ns") == stat.st_mtime_ns:
+            page_hash = previous["hash"]
+        else:
+            page_hash = hashlib.sha256(file.read_bytes()).hexdigest()
+        return {"hash": page_hash, "size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+    def write(self, name, content):
+        """
+        Grava uma página apenas se o conteúdo mudou.
+
+        Manter intactos os arquivos inalterados preserva a data de modificação,
+        o que permite à reindexação incremental ignorá-los sem reler o conteúdo.
+
+        Args:
+            name (str): Nome da página
+            content (str): Conteúdo markdown
+
+        Returns:
+            bool: True se a página foi criada ou alterada
+        """
+        file = self.path / name
+        if file.exists() and file.read_text(encoding="utf-8") == content:
+            return False
+        self.path.mkdir(parents=True, exist_ok=True)
+        with open(file, "w", encoding="utf-8") as f:
+            f.write(content)
+        return True
+
+    def remove(self, names):
+        for name in names:
+            (self.path / name).unlink(missing_ok=True)
+
+class PackedCollection(PageCollection):
+    """
+    Coleção com todas as páginas em um único arquivo comprimido.
+
+    Funcionalidades:
+    - Acesso direto a qualquer página via memory-map
+    - Gravações apenas acrescentadas ao final do arquivo
+    - Compactação quando o espaço livre passa da metade do arquivo
+    - Uma instância por arquivo no processo, compartilhada entre o crawl e a indexação
+    - Relê a tabela quando outro processo altera o arquivo e serializa as
+      gravações entre processos com uma trava de arquivo
+    """
+
+    def __init__(self, path):
+        super().__init__(path)
+        self.pack_path = self.path / PACK_FILE
+
+        self._lock = threading.Lock()
+        # Nome -> [posição, tamanho comprimido, tamanho original, hash]
+        self._table = {}
+        self._garbage = 0
+        self._pending = 0
+        self._file = None
+        self._map = None
+
+        # Trava entre processos: mantida da primeira gravação pendente até a tabela ser gravada
+        self._lock_fd = None
+        self._writing = False
+        # Trava mantida por exclusive() mesmo após gravar a tabela (ex.: conversão)
+        self._held = False
+
+        # Arquivo (inode, tamanho, modificação) correspondente à tabela carregada
+        self._signature = None
+        # Final incompleto encontrado sem a trava (descartado pelo próximo gravador)
+        self._incomplete = False
+
+        self._reload()
+
+    def names(self):
+        with self._lock:
+            self._refresh()
+            return sorted(self._table)
+
+    def read(self, name):
+        with self._lock:
+            self._refresh()
+            offset, length, _, _ = self._table[name]
+            data = self._mapped(offset + length)
+        return zlib.decompress(data[offset:offset + length]).decode("utf-8")
+
+    def page_info(self, name, previous=None):
+        """
+        Retorna o hash e o tamanho de uma página (guardados na tabela).
+
+        Args:
+            name (str): Nome da página
+            previous (dict): Ignorado (o hash já está na tabela)
+
+        Returns:
+            dict: {"hash", "size"}
+        """
+        with self._lock:
+            self._refresh()
+            _, _, size, page_hash = self._table[name]
+        return {"hash": page_hash, "size": size}
+
+    def write(self, name, content):
+        """
+        Grava uma página apenas se o conteúdo mudou.
+
+        Args:
+            name (str): Nome da página
+            content (str): Conteúdo markdown
+
+        Returns:
+            bool: True se a página foi criada ou alterada
+        """
+        raw = content.encode("utf-8")
+        page_hash = hashlib.sha256(raw).hexdigest()
+        with self._lock:
+            self._begin_write()
+            old = self._table.get(name)
+            if old and old[3] == page_hash:
+                if not self._pending:
+                    self._end_write()
+                return False
+            blob = zlib.compress(raw, PACK_COMPRESSION_LEVEL)
+            offset = self._append(blob)
+            if old:
+                self._garbage += old[1]
+            self._table[name] = [offset, len(blob), len(raw), page_hash]
+            self._pending += 1
+            if self._pending >= PACK_FLUSH_PAGES:
+                self._write_table()
+        return True
+
+    def remove(self, names):
+        if not names:
+            return
+        with self._lock:
+            self._begin_write()
+            for name in names:
+                old = self._table.pop(name, None)
+                if old:
+                    self._garbage += old[1]
+                    self._pending += 1
+            if not self._pending:
+                self._end_write()
+
+    def flush(self):
+        """
+        Grava a tabela no disco e compacta o arquivo se houver muito espaço livre.
+        """
+        with self._lock:
+            if self._pending:
+                self._write_table()
+            self._refresh()
+            size = self.pack_path.stat().st_size if self.pack_path.exists() else 0
+            if size and self._garbage > size / 2:
+                self._begin_write()
+                try:
+                    # Outro processo pode ter compactado enquanto a trava era aguardada
+                    if self._garbage > self.pack_path.stat().st_size / 2:
+                        self._compact()
+                finally:
+                    self._end_write()
+
+    def close(self):
+        """
+        Fecha o arquivo e o memory-map (a instância não deve mais ser usada).
+        """
+        with self._lock:
+            self._held = False
+            if self._writing:
+                self._end_write()
+            if isinstance(self._map, mmap.mmap):
+                self._map.close()
+            self._close_files()
+            if self._lock_fd is not None:
+                os.close(self._lock_fd)
+                self._lock_fd = None
+
+    def _close_files(self):
+        """
+        Fecha o arquivo aberto para gravação e descarta o memory-map (com a trava adquirida).
+
+        O mapeamento antigo não é fechado: leituras em andamento em outras
+        threads ainda o usam, e ele é liberado quando deixa de ser referenciado.
+        """
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        self._map = None
+
+    def _current_signature(self):
+        """
+        Identifica o estado atual do arquivo no disco.
+
+        Returns:
+            tuple: (inode, tamanho, modificação em ns), ou None se não existir
+        """
+        try:
+            stat = os.stat(self.pack_path)
+        except FileNotFoundError:
+            return None
+        return (stat.st_ino, stat.st_size, stat.st_mtime_ns)
+
+    def _refresh(self):
+        """
+        Relê a tabela se outro processo alterou o arquivo (com a trava adquirida).
+
+        Enquanto esta instância tem gravações pendentes, ela detém a trava
+        entre processos e o arquivo só muda por ela.
+        """
+        if not self._writing and self._current_signature() != self._signature:
+            self._reload()
+
+    def _reload(self):
+        """
+        Descarta a tabela em memória e lê a mais recente do disco (com a trava adquirida).
+        """
+        self._close_files()
+        self._table = {}
+        self._garbage = 0
+        self._incomplete = False
+        if self._current_signature() is not None:
+            self._load()
+        self._signature = self._current_signature()
+
+    def _begin_write(self):
+        """
+        Adquire a trava entre processos antes de alterar o arquivo (com a trava adquirida).
+
+        A tabela é relida se outro processo gravou desde a última leitura,
+        para que a próxima tabela gravada inclua as páginas dele.
+        """
+        if self._writing:
+            return
+        if fcntl is not None:
+            if self._lock_fd is None:
+                self.path.mkdir(parents=True, exist_ok=True)
+                self._lock_fd = os.open(self.path / PACK_LOCK_FILE, os.O_RDWR | os.O_CREAT, 0o644)
+            fcntl.flock(self._lock_fd, fcntl.LOCK_EX)
+        self._writing = True
+        if self._incomplete or self._current_signature() != self._signature:
+            self._reload()
+
+    @contextmanager
+    def exclusive(self):
+        """
+        Mantém a trava entre processos durante um bloco de várias operações.
+
+        A tabela é relida ao adquirir a trava; gravações e flush dentro do
+        bloco não a liberam.
+        """
+        with self._lock:
+            self._begin_write()
+            self._held = True
+        try:
+            yield self
+        finally:
+            with self._lock:
+                self._held = False
+                if self._pending:
+                    self._write_table()
+                else:
+                    self._end_write()
+
+    def _end_write(self):
+        """
+        Libera a trava entre processos (com a trava adquirida).
+        """
+        if self._held:
+            self._signature = self._current_signature()
+            return
+        # O arquivo aberto para gravação pode ser trocado por uma compactação de outro processo
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        self._signature = self._current_signature()
+        self._writing = False
+        if fcntl is not None and self._lock_fd is not None:
+            fcntl.flock(self._lock_fd, fcntl.LOCK_UN)
+
+    def _append(self, data):
+        """
+        Acrescenta bytes ao final do arquivo (com a trava adquirida).
+
+        Args:
+            data (bytes): Bytes a gravar
+
+        Returns:
+            int: Posição dos bytes no arquivo
+        """
+        if self._file is None:
+            self.path.mkdir(parents=True, exist_ok=True)
+            self._file = open(self.pack_path, "ab")
+            if self._file.tell() == 0:
+                self._file.write(PACK_HEADER)
+        offset = self._file.tell()
+        self._file.write(data)
+        return offset
+
+    def _write_table(self):
+        """
+        Acrescenta a tabela atual e o marcador final (com a trava adquirida).
+        """
+        table = zlib.compress(json.dumps({"pages": self._table, "garbage": self._garbage}).encode("utf-8"))
+        offset = self._append(table)
+        self._file.write(_TRAILER.pack(offset, len(table), PACK_TRAILER))
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        # A tabela vale até a próxima gravação: já conta como espaço livre
+        self._garbage += len(table) + _TRAILER.size
+        self._pending = 0
+        self._end_write()
+
+    def _mapped(self, end):
+        """
+        Retorna o memory-map do arquivo, refazendo-o se não cobrir a posição dada.
+
+        Args:
+            end (int): Posição final que precisa estar mapeada
+
+        Returns:
+            mmap.mmap: Mapeamento somente leitura (bytes vazios se o arquivo estiver vazio)
+        """
+        if self._map is None or len(self._map) < end:
+            if self._file is not None:
+                self._file.flush()
+            with open(self.pack_path, "rb") as f:
+                # mmap não mapeia arquivos vazios (coleção recém-criada)
+                if os.fstat(f.fileno()).st_size == 0:
+                    self._map = b""
+                else:
+                    self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        return self._map
+
+    def _load(self):
+        """
+        Lê a tabela mais recente do arquivo.
+
+        Se o final do arquivo não tiver um marcador válido (ex.: gravação
+        interrompida), usa a última tabela completa; as páginas gravadas
+        depois dela são descartadas. Sem a trava entre processos, o final
+        pode ser uma gravação em andamento e só é descartado pelo próximo
+        gravador.
+        """
+        data = self._mapped(0)
+        end = len(data)
+        if not end:
+            return
+        while end >= len(PACK_HEADER) + _TRAILER.size:
+            offset, length, marker = _TRAILER.unpack(data[end - _TRAILER.size:end])
+            if marker == PACK_TRAILER and offset + length == end - _TRAILER.size:
+                try:
+                    table = json.loads(zlib.decompress(data[offset:offset + length]))
+                    self._table = table["pages"]
+                    self._garbage = table["garbage"]
+                    if end < len(data):
+                        if not self._writing:
+                            self._incomplete = True
+                            return
+                        print(f"Pacote {self.pack_path}: gravação incompleta descartada")
+                        self._close_files()
+                        with open(self.pack_path, "r+b") as f:
+                            f.truncate(end)
+                    return
+                except (zlib.error, ValueError, KeyError):
+                    pass
+            # Procura o marcador anterior
+            end = data.rfind(PACK_TRAILER, 0, end - 1)
+            if end == -1:
+                break
+            end += len(PACK_TRAILER)
+        print(f"Pacote {self.pack_path}: nenhuma tabela válida encontrada")
+
+    def _compact(self):
+        """
+        Regrava o arquivo apenas com as páginas atuais (com a trava adquirida).
+
+        Leitores com o arquivo antigo mapeado continuam a lê-lo até remapear.
+        """
+        data = self._mapped(0)
+        temp_path = self.pack_path.with_name(f"{PACK_FILE}.tmp")
+        table = {}
+        with open(temp_path, "wb") as f:
+            f.write(PACK_HEADER)
+            for name in sorted(self._table):
+                offset, length, size, page_hash = self._table[name]
+                table[name] = [f.tell(), length, size, page_hash]
+                f.write(data[offset:offset + length])
+            packed = zlib.compress(json.dumps({"pages": table, "garbage": 0}).encode("utf-8"))
+            table_offset = f.tell()
+            f.write(packed)
+            f.write(_TRAILER.pack(table_offset, len(packed), PACK_TRAILER))
+            f.flush()
+            os.fsync(f.fileno())
+
+        self._close_files()
+        os.replace(temp_path, self.pack_path)
+        self._table = table
+        self._garbage = 0
+
+def split_version(collection_name):
+    """
+    Separa o nome da coleção da versão pedida (ex.: "Firecrawl@v2").
+
+    Args:
+        collection_name (str): Nome da coleção, com ou sem versão
+
+    Returns:
+        tuple: (nome da coleção, versão ou None)
+    """
+    name, separator, version = collection_name.partition(VERSION_SEPARATOR)
+    return name, (version or None) if separator else None
+
+class ContentStore:
+    """
+    Repositório de páginas endereçado pelo hash do conteúdo.
+
+    Funcionalidades:
+    - Grava cada conteúdo distinto uma única vez (comprimido), seja qual for a coleção ou versão
+    - Lê o conteúdo pelo hash
+    - Descarta conteúdos que nenhum manifesto referencia
+    """
+
+    def __init__(self, path=PAGE_STORE_PATH):
+        self.path = Path(path)
+
+    def object_path(self, page_hash):
+        """
+        Retorna o arquivo de um conteúdo (subdiretórios pelos 2 primeiros caracteres do hash).
+
+        Args:
+            page_hash (str): Hash SHA-256 do conteúdo
+
+        Returns:
+            Path: Arquivo do conteúdo
+        """
+        return self.path / page_hash[:2] / page_hash
+
+    def put(self, content):
+        """
+        Grava um conteúdo, se ainda não estiver no repositório.
+
+        Args:
+            content (str): Conteúdo markdown
+
+        Returns:
+            tuple: (hash do conteúdo, tamanho em bytes)
+        """
+        raw = content.encode("utf-8")
+        page_hash = hashlib.sha256(raw).hexdigest()
+        file = self.object_path(page_hash)
+        try:
+            age = time.time() - file.stat().st_mtime
+        except FileNotFoundError:
+            age = None
+
+        if age is None:
+            self._write(file, raw)
+        elif age > PAGE_STORE_GRACE_SECONDS / 2:
+            # Conteúdo antigo reaproveitado: renova a data sob a trava, para que
+            # collect não o descarte antes de o manifesto da versão ser gravado
+            with store_lock(self.path):
+                try:
+                    os.utime(file)
+                except FileNotFoundError:
+                    self._write(file, raw)
+        return page_hash, len(raw)
+
+    @staticmethod
+    def _write(file, raw):
+        """
+        Grava um conteúdo comprimido de forma atômica.
+
+        Args:
+            file (Path): Arquivo do conteúdo
+            raw (bytes): Conteúdo original
+        """
+        file.parent.mkdir(parents=True, exist_ok=True)
+        temp_file = file.with_name(f"{file.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        temp_file.write_bytes(zlib.compress(raw, PACK_COMPRESSION_LEVEL))
+        os.replace(temp_file, file)
+
+    def get(self, page_hash):
+        """
+        Lê um conteúdo pelo hash.
+
+        Args:
+            page_hash (str): Hash SHA-256 do conteúdo
+
+        Returns:
+            str: Conteúdo markdown
+        """
+        return zlib.decompress(self.object_path(page_hash).read_bytes()).decode("utf-8")
+
+    def collect(self, referenced):
+        """
+        Remove os conteúdos sem referência gravados há mais de PAGE_STORE_GRACE_SECONDS.
+
+        Deve ser chamado com store_lock adquirido (como em collect_pages).
+
+        Args:
+            referenced (set): Hashes ainda referenciados por algum manifesto
+
+        Returns:
+            tuple: (conteúdos removidos, bytes liberados)
+        """
+        removed = freed = 0
+        limit = time.time() - PAGE_STORE_GRACE_SECONDS
+        for file in self.path.glob("*/*"):
+            if file.name in referenced or file.name.endswith(".tmp"):
+                continue
+            stat = file.stat()
+            if stat.st_mtime > limit:
+                continue
+            file.unlink(missing_ok=True)
+            removed += 1
+            freed += stat.st_size
+        return removed, freed
+
+class VersionedCollection(PageCollection):
+    """
+    Coleção com várias versões sobre o repositório de conteúdo compartilhado.
+
+    As páginas são nomeadas "versão/página" (ex.: "v2/12.md"), então todas as
+    versões podem ser indexadas juntas, compartilhando os chunks iguais.
+
+    Funcionalidades:
+    - Um manifesto por versão, com o hash e o tamanho de cada página
+    - Conteúdo gravado uma única vez no repositório, mesmo repetido entre versões
+    - Visão de uma única versão para o crawl (CollectionVersion)
+    - Uma instância por coleção no processo, compartilhada entre o crawl e a indexação
+    - Relê os manifestos quando outro processo (ex.: um job de ingestão) os altera
+    """
+
+    def __init__(self, path, store=None):
+        super().__init__(path)
+        self.store = store or ContentStore()
+        self.versions_path = self.path / VERSIONS_DIR
+
+        self._lock = threading.Lock()
+        # Versão -> {"version", "created_at", "pages": {página: [hash, tamanho]}}
+        self._versions = {}
+        self._dirty = set()
+
+        # Data de modificação do diretório de manifestos lidos (None se ainda não lido)
+        self._signature = None
+
+        with self._lock:
+            self._refresh()
+
+    def versions(self):
+        """
+        Lista as versões da coleção, da mais antiga para a mais recente.
+
+        Returns:
+            list: Nomes das versões
+        """
+        with self._lock:
+            self._refresh()
+            manifests = sorted(self._versions.values(), key=lambda manifest: manifest.get("created_at") or "")
+            return [manifest["version"] for manifest in manifests]
+
+    def version(self, version):
+        """
+        Retorna a visão de uma versão, criando-a se não existir.
+
+        Args:
+            version (str): Versão da documentação
+
+        Returns:
+            CollectionVersion: Páginas da versão
+        """
+        with self._lock:
+            self._refresh()
+            self._manifest(version)
+        return CollectionVersion(self, version)
+
+    def names(self, version=None):
+        with self._lock:
+            self._refresh()
+            versions = [version] if version is not None else list(self._versions)
+            return [
+                f"{name}/{page}"
+                for name in versions
+                for page in sorted(self._versions.get(name, {}).get("pages", {}))
+            ]
+
+    def read(self, name):
+        version, page = _split_page(name)
+        with self._lock:
+            page_hash = self._page(version, page)[0]
+        return self.store.get(page_hash)
+
+    def page_info(self, name, previous=None):
+        """
+        Retorna o hash e o tamanho de uma página (guardados no manifesto da versão).
+
+        Args:
+            name (str): Nome da página ("versão/página")
+            previous (dict): Ignorado (o hash já está no manifesto)
+
+        Returns:
+            dict: {"hash", "size"}
+        """
+        version, page = _split_page(name)
+        with self._lock:
+            page_hash, size = self._page(version, page)
+        return {"hash": page_hash, "size": size}
+
+    def write(self, name, content):
+        """
+        Grava uma página em uma versão, guardando o conteúdo no repositório compartilhado.
+
+        Args:
+            name (str): Nome da página ("versão/página")
+            content (str): Conteúdo markdown
+
+        Returns:
+            bool: True se a página foi criada ou alterada na versão
+        """
+        version, page = _split_page(name)
+        page_hash, size = self.store.put(content)
+        with self._lock:
+            if version not in self._dirty:
+                self._refresh()
+            pages = self._manifest(version)["pages"]
+            old = pages.get(page)
+            if old and old[0] == page_hash:
+                return False
+            pages[page] = [page_hash, size]
+            self._dirty.add(version)
+        return True
+
+    def remove(self, names):
+        with self._lock:
+            self._refresh()
+            for name in names:
+                version, page = _split_page(name)
+                if self._versions.get(version, {}).get("pages", {}).pop(page, None):
+                    self._dirty.add(version)
+
+    def flush(self):
+        """
+        Grava no disco os manifestos das versões alteradas.
+        """
+        with self._lock:
+            self.versions_path.mkdir(parents=True, exist_ok=True)
+            for version in self._dirty:
+                manifest_file = self.versions_path / _version_file(version)
+                temp_file = manifest_file.with_name(f"{manifest_file.name}.tmp")
+                with open(temp_file, "w", encoding="utf-8") as f:
+                    json.dump(self._versions[version], f, ensure_ascii=False)
+                os.replace(temp_file, manifest_file)
+            self._dirty.clear()
+
+    def delete_version(self, version):
+        """
+        Remove uma versão da coleção (o conteúdo sem outras referências é
+        descartado depois, por collect_pages; chame os dois com store_lock
+        adquirido).
+
+        Args:
+            version (str): Versão da documentação
+
+        Returns:
+            bool: True se a versão existia
+        """
+        with self._lock:
+            self._refresh()
+            if self._versions.pop(version, None) is None:
+                return False
+            self._dirty.discard(version)
+            (self.versions_path / _version_file(version)).unlink(missing_ok=True)
+        return True
+
+    def referenced(self):
+        """
+        Retorna os hashes de conteúdo referenciados por alguma versão.
+
+        Returns:
+            set: Hashes SHA-256
+        """
+        with self._lock:
+            self._refresh()
+            return {
+                page_hash
+                for manifest in self._versions.values()
+                for page_hash, _ in manifest["pages"].values()
+            }
+
+    def _refresh(self):
+        """
+        Relê os manifestos se o diretório de versões mudou (com a trava adquirida).
+
+        Criar, substituir ou apagar um manifesto altera a data de modificação
+        do diretório. Manifestos com gravações ainda não salvas por esta
+        instância são mantidos como estão em memória.
+        """
+        try:
+            signature = self.versions_path.stat().st_mtime_ns
+        except FileNotFoundError:
+            signature = None
+        if signature == self._signature:
+            return
+
+        versions = {}
+        for file in sorted(self.versions_path.glob("*.json")):
+            try:
+                with open(file, "r", encoding="utf-8") as f:
+                    manifest = json.load(f)
+                versions[manifest["version"]] = manifest
+            except (OSError, ValueError, KeyError) as e:
+                print(f"Manifesto de versão inválido {file}: {str(e)}")
+        for version in self._dirty:
+            versions[version] = self._versions[version]
+        self._versions = versions
+        self._signature = signature
+
+    def _page(self, version, page):
+        """
+        Retorna o hash e o tamanho de uma página, relendo os manifestos se
+        ela não for conhecida (com a trava adquirida).
+
+        Args:
+            version (str): Versão da documentação
+            page (str): Nome da página na versão
+
+        Returns:
+            list: [hash, tamanho]
+        """
+        try:
+            return self._versions[version]["pages"][page]
+        except KeyError:
+            self._refresh()
+            return self._versions[version]["pages"][page]
+
+    def _manifest(self, version):
+        """
+        Retorna o manifesto de uma versão, criando-o se necessário (com a trava adquirida).
+
+        Args:
+            version (str): Versão da documentação
+
+        Returns:
+            dict: Manifesto da versão
+        """
+        manifest = self._versions.get(version)
+        if manifest is None:
+            manifest = self._versions[version] = {
+                "version": version,
+                "created_at": datetime.now(timezone.utc).isoformat(),
+                "pages": {}
+            }
+            self._dirty.add(version)
+        return manifest
+
+class CollectionVersion(PageCollection):
+    """
+    Visão de uma única versão de uma coleção versionada.
+
+    Lista apenas as páginas da versão e grava as páginas do crawl nela; os
+    nomes continuam no formato "versão/página" da coleção.
+    """
+
+    def __init__(self, collection, version):
+        super().__init__(collection.path)
+        self.collection = collection
+        self.version = version
+
+    def page_name(self, name):
+        return f"{self.version}/{name}"
+
+    def names(self):
+        return self.collection.names(self.version)
+
+    def read(self, name):
+        return self.collection.read(name)
+
+    def page_info(self, name, previous=None):
+        return self.collection.page_info(name, previous)
+
+    def write(self, name, content):
+        return self.collection.write(name, content)
+
+    def remove(self, names):
+        self.collection.remove(names)
+
+    def flush(self):
+        self.collection.flush()
+
+def _split_page(name):
+    """
+    Separa a versão e a página de um nome "versão/página".
+
+    Args:
+        name (str): Nome da página na coleção versionada
+
+    Returns:
+        tuple: (versão, página)
+    """
+    version, _, page = name.rpartition("/")
+    return version, page
+
+def _version_file(version):
+    """
+    Retorna o nome do arquivo de manifesto de uma versão.
+
+    Args:
+        version (str): Versão da documentação
+
+    Returns:
+        str: Nome do arquivo (o hash evita colisões entre versões com os mesmos caracteres válidos)
+    """
+    digest = hashlib.sha256(version.encode("utf-8")).hexdigest()[:8]
+    return re.sub(r"[^\w.-]+", "_", version) + f"-{digest}.json"
+
+_packed = {}
+_versioned = {}
+_packed_lock = threading.Lock()
+
+def open_collection(collection_path, collection_format=None, version=None):
+    """
+    Abre as páginas de uma coleção no formato em que estão gravadas.
+
+    Coleções com manifestos de versão são sempre lidas no formato
+    versionado, e coleções com pages.pack no formato empacotado. Com o
+    formato empacotado ativo, coleções de arquivos .md são convertidas (e os
+    arquivos removidos) na primeira abertura; com o formato versionado ativo,
+    coleções de arquivos ou empacotadas viram a versão registrada no seu
+    metadata.json.
+
+    Args:
+        collection_path (str): Diretório da coleção
+        collection_format (str): files, packed ou versioned (padrão: COLLECTION_FORMAT)
+        version (str): Em coleções versionadas, abre apenas esta versão,
+            criando-a se não existir (ignorado nos demais formatos)
+
+    Returns:
+        PageCollection: Páginas da coleção
+    """
+    path = Path(collection_path)
+    collection_format = collection_format or COLLECTION_FORMAT
+    key = str(path.resolve())
+    if collection_format == "versioned" or (path / VERSIONS_DIR).exists():
+        with _packed_lock:
+            collection = _versioned.get(key)
+            if collection is None:
+                collection = VersionedCollection(path)
+                _convert_to_versions(collection, _packed.pop(key, None))
+                _versioned[key] = collection
+        return collection.version(version) if version else collection
+
+    if collection_format != "packed" and not (path / PACK_FILE).exists():
+        return FileCollection(path)
+
+    with _packed_lock:
+        collection = _packed.get(key)
+        if collection is None:
+            collection = PackedCollection(path)
+            _convert_files(collection)
+            _packed[key] = collection
+        return collection
+
+def collect_pages(collections_path="data/collections", store=None):
+    """
+    Descarta do repositório de conteúdo as páginas que nenhuma versão referencia mais.
+
+    Args:
+        collections_path (str): Diretório das coleções
+        store (ContentStore): Repositório (padrão: o de PAGE_STORE_PATH)
+
+    Returns:
+        tuple: (conteúdos removidos, bytes liberados)
+    """
+    store = store or ContentStore()
+    with store_lock(store.path):
+        referenced = set()
+        for versions_path in Path(collections_path).glob(f"*/{VERSIONS_DIR}"):
+            referenced |= open_collection(versions_path.parent, "versioned").referenced()
+        return store.collect(referenced)
+
+_store_locks = {}
+_store_locks_guard = threading.Lock()
+
+@contextmanager
+def store_lock(store_path=PAGE_STORE_PATH):
+    """
+    Trava o repositório de conteúdo entre threads e processos.
+
+    Mantida durante a remoção de versões e o descarte de conteúdos sem
+    referência, para que nenhum processo descarte um conteúdo que acabou de
+    ser reaproveitado. Pode ser adquirida de novo pela mesma thread.
+
+    Args:
+        store_path (str): Diretório do repositório de conteúdo
+    """
+    path = Path(store_path).resolve()
+    with _store_locks_guard:
+        state = _store_locks.setdefault(path, {"lock": threading.RLock(), "depth": 0, "fd": None})
+    with state["lock"]:
+        if state["depth"] == 0 and fcntl is not None:
+            path.mkdir(parents=True, exist_ok=True)
+            state["fd"] = os.open(path / STORE_LOCK_FILE, os.O_RDWR | os.O_CREAT, 0o644)
+            fcntl.flock(state["fd"], fcntl.LOCK_EX)
+        state["depth"] += 1
+        try:
+            yield
+        finally:
+            state["depth"] -= 1
+            if state["depth"] == 0 and state["fd"] is not None:
+                fcntl.flock(state["fd"], fcntl.LOCK_UN)
+                os.close(state["fd"])
+                state["fd"] = None
+
+def _convert_to_versions(collection, packed=None):
+    """
+    Move as páginas de uma coleção de arquivos ou empacotada para uma versão.
+
+    A versão é a registrada no metadata.json da coleção (ou DEFAULT_VERSION).
+
+    Args:
+        collection (VersionedCollection): Coleção versionada (no mesmo diretório)
+        packed (PackedCollection): Instância empacotada já aberta no processo, se houver
+    """
+    if (collection.path / PACK_FILE).exists():
+        legacy = packed or PackedCollection(collection.path)
+    else:
+        legacy = FileCollection(collection.path)
+    names = legacy.names()
+    if not names:
+        return
+
+    version = DEFAULT_VERSION
+    try:
+        with open(collection.path / "metadata.json", "r", encoding="utf-8") as f:
+            version = json.load(f).get("version") or DEFAULT_VERSION
+    except (OSError, ValueError):
+        pass
+
+    target = collection.version(version)
+    for name, content in legacy.iter_read(names):
+        target.write(target.page_name(name), content)
+    collection.flush()
+
+    if isinstance(legacy, PackedCollection):
+        legacy.close()
+        legacy.pack_path.unlink(missing_ok=True)
+        (collection.path / PACK_LOCK_FILE).unlink(missing_ok=True)
+    else:
+        legacy.remove(names)
+    print(f"Coleção {collection.path.name}: {len(names)} páginas convertidas para a versão {version}")
+
+def _convert_files(collection):
+    """
+    Move as páginas .md de uma coleção para o arquivo empacotado.
+
+    Args:
+        collection (PackedCollection): Coleção empacotada (no mesmo diretório)
+    """
+    files = FileCollection(collection.path)
+    if not files.names():
+        return
+
+    # Sob a trava do pacote: outro processo pode estar convertendo a mesma coleção
+    with collection.exclusive():
+        names = files.names()
+        if not names:
+            return
+        for name, content in files.iter_read(names):
+            collection.write(name, content)
+        collection.flush()
+        files.remove(names)
+    print(f"Coleção {collection.path.name}: {len(names)} páginas convertidas para {PACK_FILE}")
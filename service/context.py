@@ -0,0 +1,228 @@
+"""
+Montagem do Contexto
+
+Este módulo prepara o contexto enviado ao LLM a partir dos chunks
+recuperados. Chunks pouco relevantes são descartados, chunks vizinhos ou
+sobrepostos da mesma página são unidos em um único trecho (sem repetir a
+sobreposição do divisor de texto) e os trechos são empacotados, do mais ao
+menos relevante, até o orçamento de tokens. O prompt fica mais curto e cabe
+mais evidência distinta na mesma janela.
+"""
+
+import math
+import os
+
+from langchain_core.documents import Document
+
+# Orçamento de tokens do contexto enviado ao LLM (padrão: 750, o tamanho de 3 chunks de 1000 caracteres)
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "750"))
+
+# Chunks recuperados antes do filtro e do empacotamento (padrão: 8)
+CONTEXT_CANDIDATES = int(os.getenv("CONTEXT_CANDIDATES", "8"))
+
+# Relevância mínima (busca híbrida, de 0 a 1) e mínima em relação ao melhor chunk
+CONTEXT_MIN_SCORE = float(os.getenv("CONTEXT_MIN_SCORE", "0.2"))
+CONTEXT_MIN_RELATIVE_SCORE = float(os.getenv("CONTEXT_MIN_RELATIVE_SCORE", "0.5"))
+
+# Caracteres por token na estimativa do tamanho dos textos
+CHARS_PER_TOKEN = 4
+
+# Menor sobreposição de texto considerada ao unir chunks sem posição conhecida
+MIN_TEXT_OVERLAP = 20
+
+# Distância máxima, em caracteres, para considerar dois chunks vizinhos
+# (o divisor remove o separador "\n\n" entre eles)
+ADJACENT_GAP = 2
+
+def estimate_tokens(text):
+    """
+    Estima o número de tokens de um texto.
+
+    Args:
+        text (str): Texto
+
+    Returns:
+        int: Tokens estimados
+    """
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+class ContextPacker:
+    """
+    Montagem do contexto do LLM com orçamento de tokens.
+
+    Funcionalidades:
+    - Descarta chunks abaixo da relevância mínima (absoluta e relativa ao melhor)
+    - Une chunks sobrepostos ou vizinhos da mesma página
+    - Empacota os trechos mais relevantes até o orçamento de tokens
+    """
+
+    def __init__(self, token_budget=CONTEXT_TOKEN_BUDGET, min_score=CONTEXT_MIN_SCORE,
+                 min_relative_score=CONTEXT_MIN_RELATIVE_SCORE, max_overlap=200):
+        self.token_budget = token_budget
+        self.min_score = min_score
+        self.min_relative_score = min_relative_score
+
+        # Maior sobreposição procurada entre chunks (a do divisor de texto)
+        self.max_overlap = max_overlap
+
+    def pack(self, results):
+        """
+        Monta o contexto a partir dos chunks recuperados.
+
+        Args:
+            results (list): Pares (Document, relevância), do mais para o menos relevante
+
+        Returns:
+            list: Trechos (Document) do mais para o menos relevante, com a
+                relevância e o número de chunks unidos nos metadados
+        """
+        segments = self._merge(self._filter(results))
+        segments.sort(key=lambda segment: segment["score"], reverse=True)
+
+        packed = []
+        used = 0
+        for segment in segments:
+            tokens = estimate_tokens(segment["text"])
+            if used + tokens > self.token_budget:
+                if packed:
+                    # Não cabe: tenta os trechos seguintes, que podem ser menores
+                    continue
+                # O trecho mais relevante sempre entra, cortado no orçamento
+                segment["text"] = segment["text"][:self.token_budget * CHARS_PER_TOKEN]
+                tokens = estimate_tokens(segment["text"])
+            used += tokens
+            packed.append(Document(
+                page_content=segment["text"],
+                metadata={"source": segment["source"], "score": segment["score"], "chunks": segment["chunks"]}
+            ))
+        return packed
+
+    def _filter(self, results):
+        """
+        Descarta os chunks pouco relevantes, mantendo sempre o melhor.
+
+        Args:
+            results (list): Pares (Document, relevância)
+
+        Returns:
+            list: Pares mantidos
+        """
+        if not results:
+            return []
+        best = max(score for _, score in results)
+        threshold = max(self.min_score, best * self.min_relative_score)
+        kept = [(doc, score) for doc, score in results if score >= threshold]
+        return kept or [max(results, key=lambda item: item[1])]
+
+    def _merge(self, results):
+        """
+        Une os chunks sobrepostos ou vizinhos de cada página.
+
+        Com a posição dos chunks na página (start_index), os trechos são
+        unidos pela posição; sem ela (índices antigos), pela sobreposição
+        entre o fim de um chunk e o início de outro.
+
+        Args:
+            results (list): Pares (Document, relevância)
+
+        Returns:
+            list: Trechos (dicionários com text, source, score e chunks)
+        """
+        pages = {}
+        for doc, score in results:
+            source = doc.metadata.get("source")
+            pages.setdefault(source, []).append({
+                "text": doc.page_content,
+                "source": source,
+                "start": doc.metadata.get("start_index"),
+                "score": score,
+                "chunks": 1,
+            })
+
+        segments = []
+        for items in pages.values():
+            if all(item["start"] is not None for item in items):
+                segments.extend(self._merge_by_position(items))
+            else:
+                segments.extend(self._merge_by_text(items))
+        return segments
+
+    @staticmethod
+    def _merge_by_position(items):
+        """
+        Une os trechos de uma página pela posição de cada um no texto.
+
+        Args:
+            items (list): Trechos com posição inicial conhecida
+
+        Returns:
+            list: Trechos unidos
+        """
+        items.sort(key=lambda item: item["start"])
+        merged = [items[0]]
+        for item in items[1:]:
+            current = merged[-1]
+            end = current["start"] + len(current["text"])
+            if item["start"] > end + ADJACENT_GAP:
+                merged.append(item)
+                continue
+            if item["start"] + len(item["text"]) > end:
+                # Acrescenta só a parte nova (a sobreposição já está no trecho)
+                overlap = end - item["start"]
+                current["text"] += item["text"][overlap:] if overlap >= 0 else "\n\n" + item["text"]
+            current["score"] = max(current["score"], item["score"])
+            current["chunks"] += item["chunks"]
+        return merged
+
+    def _merge_by_text(self, items):
+        """
+        Une os trechos de uma página pela sobreposição de texto.
+
+        Args:
+            items (list): Trechos sem posição conhecida
+
+        Returns:
+            list: Trechos unidos
+        """
+        merged = list(items)
+        changed = True
+        while changed:
+            changed = False
+            for i, first in enumerate(merged):
+                for j, second in enumerate(merged):
+                    if i == j:
+                        continue
+                    if second["text"] in first["text"]:
+                        text = first["text"]
+                    else:
+                        overlap = self._overlap(first["text"], second["text"])
+                        if not overlap:
+                            continue
+                        text = first["text"] + second["text"][overlap:]
+                    first.update(
+                        text=text,
+                        score=max(first["score"], second["score"]),
+                        chunks=first["chunks"] + second["chunks"]
+                    )
+                    del merged[j]
+                    changed = True
+                    break
+                if changed:
+                    break
+        return merged
+
+    def _overlap(self, first, second):
+        """
+        Mede a sobreposição entre o fim de um texto e o início de outro.
+
+        Args:
+            first (str): Texto anterior
+            second (str): Texto seguinte
+
+        Returns:
+            int: Caracteres sobrepostos (0 se menos que MIN_TEXT_OVERLAP)
+        """
+        for size in range(min(len(first), len(second), self.max_overlap), MIN_TEXT_OVERLAP - 1, -1):
+            if first.endswith(second[:size]):
+                return size
+        return 0
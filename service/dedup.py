@@ -0,0 +1,238 @@
+"""
+Deduplicação de Chunks
+
+Este módulo elimina chunks repetidos antes do embedding. Páginas de
+documentação repetem menus, rodapés e avisos de cookies; depois da divisão
+em chunks, esses trechos viram cópias idênticas ou quase idênticas que
+ocupam o índice e as posições do top-k. Cópias exatas (após normalizar
+espaços e maiúsculas) são detectadas por hash; cópias aproximadas, por
+MinHash com LSH (locality-sensitive hashing).
+"""
+
+import hashlib
+import json
+import os
+import re
+import zlib
+from pathlib import Path
+
+import numpy as np
+
+# Similaridade de Jaccard estimada a partir da qual um chunk é considerado cópia (padrão: 0.8)
+DEDUP_THRESHOLD = float(os.getenv("DEDUP_THRESHOLD", "0.8"))
+
+# Assinatura MinHash: 64 permutações em 16 faixas de 4 linhas (candidatos a partir de ~0.5)
+MINHASH_PERMUTATIONS = 64
+LSH_BANDS = 16
+LSH_ROWS = MINHASH_PERMUTATIONS // LSH_BANDS
+
+# Palavras por shingle
+SHINGLE_SIZE = 3
+
+# Permutações fixas (as assinaturas são salvas em disco e precisam ser estáveis)
+_PRIME = (1 << 31) - 1
+_rng = np.random.RandomState(1)
+_PERM_A = _rng.randint(1, _PRIME, size=MINHASH_PERMUTATIONS).astype(np.uint64)
+_PERM_B = _rng.randint(0, _PRIME, size=MINHASH_PERMUTATIONS).astype(np.uint64)
+
+_WORD_PATTERN = re.compile(r"\w+")
+
+def normalize(text):
+    """
+    Normaliza um chunk para comparação (minúsculas, espaços colapsados).
+
+    Args:
+        text (str): Conteúdo do chunk
+
+    Returns:
+        str: Texto normalizado
+    """
+    return " ".join(text.lower().split())
+
+class ChunkDeduplicator:
+    """
+    Detector de chunks repetidos em uma coleção.
+
+    Funcionalidades:
+    - Detecta cópias exatas pelo hash do texto normalizado
+    - Detecta cópias aproximadas por MinHash e LSH
+    - Acompanha as inclusões e remoções do índice da coleção
+    - Salva e carrega as assinaturas junto com o índice
+    """
+
+    def __init__(self, threshold=DEDUP_THRESHOLD):
+        self.threshold = threshold
+
+        # Chunk canônico -> (hash exato, assinatura MinHash)
+        self._chunks = {}
+        # Hash exato -> chunk canônico
+        self._exact = {}
+        # (faixa, valores da faixa) -> chunks canônicos
+        self._buckets = {}
+
+    def __len__(self):
+        return len(self._chunks)
+
+    def find(self, text):
+        """
+        Procura um chunk já registrado que seja cópia do texto dado.
+
+        Args:
+            text (str): Conteúdo do chunk
+
+        Returns:
+            tuple: (id do chunk canônico ou None, hash exato, assinatura MinHash)
+        """
+        exact_key = hashlib.sha256(normalize(text).encode("utf-8")).hexdigest()[:32]
+        signature = self.signature(text)
+
+        canonical = self._exact.get(exact_key)
+        if canonical is not None:
+            return canonical, exact_key, signature
+
+        # Candidatos: chunks que coincidem em pelo menos uma faixa da assinatura
+        candidates = set()
+        for band_key in self._band_keys(signature):
+            candidates.update(self._buckets.get(band_key, ()))
+
+        best, best_similarity = None, self.threshold
+        for candidate in candidates:
+            similarity = float(np.mean(self._chunks[candidate][1] == signature))
+            if similarity >= best_similarity:
+                best, best_similarity = candidate, similarity
+        return best, exact_key, signature
+
+    def add(self, chunk_id, exact_key, signature):
+        """
+        Registra um chunk canônico (indexado).
+
+        Args:
+            chunk_id (str): Identificador do chunk
+            exact_key (str): Hash do texto normalizado (retornado por find)
+            signature (np.ndarray): Assinatura MinHash (retornada por find)
+        """
+        if chunk_id in self._chunks:
+            return
+        self._chunks[chunk_id] = (exact_key, signature)
+        self._exact.setdefault(exact_key, chunk_id)
+        for band_key in self._band_keys(signature):
+            self._buckets.setdefault(band_key, set()).add(chunk_id)
+
+    def remove(self, chunk_ids):
+        """
+        Remove chunks que saíram do índice.
+
+        Args:
+            chunk_ids (list): Identificadores dos chunks removidos
+        """
+        for chunk_id in chunk_ids:
+            entry = self._chunks.pop(chunk_id, None)
+            if entry is None:
+                continue
+            exact_key, signature = entry
+            if self._exact.get(exact_key) == chunk_id:
+                del self._exact[exact_key]
+            for band_key in self._band_keys(signature):
+                bucket = self._buckets.get(band_key)
+                if bucket is not None:
+                    bucket.discard(chunk_id)
+                    if not bucket:
+                        del self._buckets[band_key]
+
+    @staticmethod
+    def signature(text):
+        """
+        Calcula a assinatura MinHash de um chunk (shingles de palavras).
+
+        Args:
+            text (str): Conteúdo do chunk
+
+        Returns:
+            np.ndarray: Assinatura com MINHASH_PERMUTATIONS valores uint32
+        """
+        words = _WORD_PATTERN.findall(text.lower())
+        if len(words) <= SHINGLE_SIZE:
+            shingles = {" ".join(words)}
+        else:
+            shingles = {" ".join(words[i:i + SHINGLE_SIZE]) for i in range(len(words) - SHINGLE_SIZE + 1)}
+
+        hashes = np.fromiter(
+            (zlib.crc32(shingle.encode("utf-8")) & _PRIME for shingle in shingles),
+            dtype=np.uint64,
+            count=len(shingles)
+        )
+        permuted = (_PERM_A[:, None] * hashes[None, :] + _PERM_B[:, None]) % _PRIME
+        return permuted.min(axis=1).astype(np.uint32)
+
+    @classmethod
+    def from_vectorstore(cls, vectorstore, threshold=DEDUP_THRESHOLD):
+        """
+        Registra todos os chunks de um índice FAISS existente.
+
+        Args:
+            vectorstore (FAISS): Índice vetorial da coleção
+            threshold (float): Similaridade mínima para considerar cópia
+
+        Returns:
+            ChunkDeduplicator: Detector com os chunks do índice
+        """
+        dedup = cls(threshold)
+        for chunk_id in vectorstore.index_to_docstore_id.values():
+            _, exact_key, signature = dedup.find(vectorstore.docstore.search(chunk_id).page_content)
+            dedup.add(chunk_id, exact_key, signature)
+        return dedup
+
+    def save(self, path):
+        """
+        Salva as assinaturas em um diretório.
+
+        Args:
+            path (Path): Diretório de destino
+        """
+        path = Path(path)
+        path.mkdir(parents=True, exist_ok=True)
+        ids = list(self._chunks)
+        signatures = np.stack([self._chunks[cid][1] for cid in ids]) if ids else np.zeros((0, MINHASH_PERMUTATIONS), dtype=np.uint32)
+        np.save(path / "signatures.npy", signatures)
+        with open(path / "chunks.json", "w", encoding="utf-8") as f:
+            json.dump([[cid, self._chunks[cid][0]] for cid in ids], f)
+
+    @classmethod
+    def load(cls, path, threshold=DEDUP_THRESHOLD):
+        """
+        Carrega as assinaturas salvas.
+
+        Args:
+            path (Path): Diretório das assinaturas
+            threshold (float): Similaridade mínima para considerar cópia
+
+        Returns:
+            ChunkDeduplicator: Detector carregado, ou None se ausente
+        """
+        path = Path(path)
+        if not (path / "chunks.json").exists():
+            return None
+        with open(path / "chunks.json", "r", encoding="utf-8") as f:
+            chunks = json.load(f)
+        signatures = np.load(path / "signatures.npy")
+
+        dedup = cls(threshold)
+        for (chunk_id, exact_key), signature in zip(chunks, signatures):
+            dedup.add(chunk_id, exact_key, signature)
+        return dedup
+
+    @staticmethod
+    def _band_keys(signature):
+        """
+        Divide a assinatura nas faixas usadas pelo LSH.
+
+        Args:
+            signature (np.ndarray): Assinatura MinHash
+
+        Returns:
+            list: Chaves (faixa, bytes da faixa)
+        """
+        return [
+            (band, signature[band * LSH_ROWS:(band + 1) * LSH_ROWS].tobytes())
+            for band in range(LSH_BANDS)
+        ]
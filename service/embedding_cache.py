@@ -0,0 +1,174 @@
+"""
+Cache de Embeddings
+
+Este módulo implementa um cache persistente de embeddings endereçado por
+conteúdo. Cada vetor é identificado pelo modelo e pelo hash do texto do chunk,
+de modo que textos repetidos entre coleções, versões e reindexações são
+embedados uma única vez. Os vetores ficam em um banco SQLite compacto
+(float32) com descarte dos menos usados quando o limite de entradas é atingido.
+"""
+
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+import numpy as np
+
+# Número máximo de vetores armazenados no cache (padrão: 500000)
+EMBEDDING_CACHE_MAX_ENTRIES = int(os.getenv("EMBEDDING_CACHE_MAX_ENTRIES", "500000"))
+
+# Gravações entre recontagens das entradas (outros processos também gravam no banco)
+RECOUNT_INTERVAL = 10000
+
+class EmbeddingCache:
+    """
+    Cache persistente de embeddings em SQLite.
+
+    Funcionalidades:
+    - Busca e grava vetores em lote por (modelo, hash do texto)
+    - Descarta as entradas usadas há mais tempo quando excede o limite
+    - Contabiliza acertos e falhas para acompanhamento
+    """
+
+    def __init__(self, db_path="data/cache/embeddings.sqlite", max_entries=EMBEDDING_CACHE_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+
+        Path(db_path).parent.mkdir(parents=True, exist_ok=True)
+
+        # Conexão única protegida por trava (compartilhada entre threads)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS embeddings (
+                model TEXT NOT NULL,
+                text_hash BLOB NOT NULL,
+                vector BLOB NOT NULL,
+                last_used REAL NOT NULL,
+                PRIMARY KEY (model, text_hash)
+            )
+            """
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_embeddings_last_used ON embeddings (last_used)")
+        self._conn.commit()
+
+        # Estimativa do número de entradas (limite superior, recontada só quando
+        # passa do máximo ou a cada RECOUNT_INTERVAL gravações)
+        self._entries = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+        self._since_count = 0
+
+    @staticmethod
+    def text_hash(text):
+        """
+        Calcula a chave de conteúdo de um texto.
+
+        Args:
+            text (str): Texto do chunk
+
+        Returns:
+            bytes: Hash SHA-256 do texto
+        """
+        return hashlib.sha256(text.encode("utf-8")).digest()
+
+    def get_many(self, model, hashes):
+        """
+        Busca vetores no cache.
+
+        Args:
+            model (str): Identificador do modelo de embeddings
+            hashes (list): Chaves retornadas por text_hash
+
+        Returns:
+            dict: Chave -> vetor (np.ndarray float32) para as chaves encontradas
+        """
+        found = {}
+        unique = list(dict.fromkeys(hashes))
+        with self._lock:
+            # Consulta em blocos para respeitar o limite de parâmetros do SQLite
+            for start in range(0, len(unique), 500):
+                batch = unique[start:start + 500]
+                placeholders = ",".join("?" * len(batch))
+                rows = self._conn.execute(
+                    f"SELECT text_hash, vector FROM embeddings WHERE model = ? AND text_hash IN ({placeholders})",
+                    [model, *batch]
+                ).fetchall()
+                for text_hash, vector in rows:
+                    found[bytes(text_hash)] = np.frombuffer(vector, dtype=np.float32)
+
+            if found:
+                now = time.time()
+                self._conn.executemany(
+                    "UPDATE embeddings SET last_used = ? WHERE model = ? AND text_hash = ?",
+                    [(now, model, text_hash) for text_hash in found]
+                )
+                self._conn.commit()
+
+            self.hits += sum(1 for text_hash in hashes if text_hash in found)
+            self.misses += sum(1 for text_hash in hashes if text_hash not in found)
+        return found
+
+    def put_many(self, model, items):
+        """
+        Grava vetores no cache e aplica o limite de entradas.
+
+        Args:
+            model (str): Identificador do modelo de embeddings
+            items (dict): Chave -> vetor
+        """
+        if not items:
+            return
+        now = time.time()
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (model, text_hash, vector, last_used) VALUES (?, ?, ?, ?)",
+                [
+                    (model, text_hash, np.asarray(vector, dtype=np.float32).tobytes(), now)
+                    for text_hash, vector in items.items()
+                ]
+            )
+
+            # Substituições não aumentam o total: a estimativa só pode sobrar
+            self._entries += len(items)
+            self._since_count += len(items)
+
+            # Descarta as entradas usadas há mais tempo se exceder o limite
+            # (a contagem exata percorre a tabela, por isso não é feita a cada lote)
+            if self._entries > self.max_entries or self._since_count >= RECOUNT_INTERVAL:
+                total = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+                if total > self.max_entries:
+                    # Desce 10% abaixo do limite, para não recontar a cada lote seguinte
+                    keep = self.max_entries - self.max_entries // 10
+                    self._conn.execute(
+                        "DELETE FROM embeddings WHERE rowid IN "
+                        "(SELECT rowid FROM embeddings ORDER BY last_used LIMIT ?)",
+                        (total - keep,)
+                    )
+                    total = keep
+                self._entries = total
+                self._since_count = 0
+            self._conn.commit()
+
+    def stats(self):
+        """
+        Retorna estatísticas do cache, a partir dos contadores em memória
+        (sem percorrer a tabela).
+
+        Returns:
+            dict: Acertos, falhas, taxa de acerto e número estimado de entradas
+                (limite superior, recontado periodicamente em put_many)
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "entries": self._entries
+            }
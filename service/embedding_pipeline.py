@@ -0,0 +1,169 @@
+"""
+Pipeline de Embeddings para Indexação
+
+Este módulo implementa a etapa de embedding usada na indexação das coleções.
+Os textos são ordenados por tamanho e agrupados em lotes de comprimento
+parecido (menos padding), consultados no cache de embeddings e, quando há
+trabalho suficiente, distribuídos entre vários processos na CPU. Os vetores
+são entregues lote a lote, à medida que ficam prontos, para que o índice
+seja alimentado sem esperar o fim de toda a coleção.
+"""
+
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import multiprocessing
+
+import numpy as np
+
+# Tamanho de cada lote enviado ao modelo (padrão: 64)
+EMBEDDING_BATCH_SIZE = int(os.getenv("EMBEDDING_BATCH_SIZE", "64"))
+
+# Número de processos de embedding (padrão: 0 = um por núcleo de CPU)
+EMBEDDING_WORKERS = int(os.getenv("EMBEDDING_WORKERS", "0"))
+
+# Quantidade mínima de textos para usar vários processos (padrão: 2000)
+EMBEDDING_PARALLEL_MIN_TEXTS = int(os.getenv("EMBEDDING_PARALLEL_MIN_TEXTS", "2000"))
+
+# Modelo carregado em cada processo do pool
+_worker_model = None
+
+def _init_worker(model_name, threads, backend="torch"):
+    """
+    Carrega o modelo de embeddings em um processo do pool.
+
+    Args:
+        model_name (str): Nome do modelo sentence-transformers
+        threads (int): Número de threads do PyTorch (ou do ONNX Runtime) neste processo
+        backend (str): "torch" ou "onnx"
+    """
+    global _worker_model
+    if backend == "onnx":
+        from service.onnx_embeddings import OnnxEmbeddings, onnx_model_dir
+
+        _worker_model = OnnxEmbeddings(onnx_model_dir(model_name), threads=threads)
+        return
+
+    import torch
+    from sentence_transformers import SentenceTransformer
+
+    # Evita que os processos disputem os mesmos núcleos
+    torch.set_num_threads(threads)
+    _worker_model = SentenceTransformer(model_name, device="cpu")
+
+def _encode_batch(texts):
+    """
+    Calcula os embeddings de um lote dentro de um processo do pool.
+
+    Args:
+        texts (list): Textos do lote
+
+    Returns:
+        np.ndarray: Matriz float32 com um vetor por texto
+    """
+    # Mesmo pré-processamento do HuggingFaceEmbeddings, para vetores idênticos
+    # (o modelo ONNX faz a mesma substituição)
+    texts = [text.replace("\n", " ") for text in texts]
+    if hasattr(_worker_model, "embed_documents"):
+        return _worker_model.encode(texts)
+    vectors = _worker_model.encode(texts, batch_size=len(texts), show_progress_bar=False)
+    return np.asarray(vectors, dtype=np.float32)
+
+class EmbeddingPipeline:
+    """
+    Pipeline de embeddings em lotes, com cache e múltiplos processos.
+
+    Funcionalidades:
+    - Reaproveita vetores do cache de embeddings
+    - Agrupa os textos em lotes de tamanho parecido
+    - Distribui os lotes entre processos na CPU quando compensa
+    - Entrega os vetores lote a lote, na ordem em que ficam prontos
+    """
+
+    def __init__(self, embeddings, model_name, cache=None, batch_size=EMBEDDING_BATCH_SIZE, workers=EMBEDDING_WORKERS, backend="torch"):
+        # Modelo usado no próprio processo (lotes pequenos e consultas)
+        self.embeddings = embeddings
+        self.model_name = model_name
+        self.backend = backend
+        self.cache = cache
+
+        # Vetores de backends diferentes ficam separados no cache
+        self.cache_key = model_name if backend == "torch" else f"{model_name}:{backend}"
+        self.batch_size = max(1, batch_size)
+        self.workers = workers or os.cpu_count() or 1
+
+    def iter_embeddings(self, texts):
+        """
+        Calcula os embeddings de uma lista de textos, lote a lote.
+
+        Args:
+            texts (list): Textos a serem embedados
+
+        Yields:
+            tuple: (posições dos textos na lista, matriz float32 com os vetores)
+        """
+        if not texts:
+            return
+
+        hashes = [self.cache.text_hash(text) for text in texts] if self.cache else list(range(len(texts)))
+        found = self.cache.get_many(self.cache_key, hashes) if self.cache else {}
+
+        # Vetores já presentes no cache são entregues de imediato
+        hit_positions = [i for i, text_hash in enumerate(hashes) if text_hash in found]
+        if hit_positions:
+            yield hit_positions, np.stack([found[hashes[i]] for i in hit_positions])
+
+        # Agrupa as posições pendentes por texto distinto
+        pending = {}
+        for i, text_hash in enumerate(hashes):
+            if text_hash not in found:
+                pending.setdefault(text_hash, []).append(i)
+        if not pending:
+            return
+
+        keys = list(pending)
+        unique_texts = [texts[pending[key][0]] for key in keys]
+        for batch, vectors in self._encode(unique_texts):
+            if self.cache:
+                self.cache.put_many(self.cache_key, {keys[j]: vectors[row] for row, j in enumerate(batch)})
+
+            positions = []
+            rows = []
+            for row, j in enumerate(batch):
+                for i in pending[keys[j]]:
+                    positions.append(i)
+                    rows.append(row)
+            yield positions, vectors[rows]
+
+    def _encode(self, texts):
+        """
+        Calcula os embeddings em lotes ordenados por tamanho de texto.
+
+        Args:
+            texts (list): Textos distintos a serem embedados
+
+        Yields:
+            tuple: (índices dos textos do lote, matriz float32 com os vetores)
+        """
+        order = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+        batches = [order[start:start + self.batch_size] for start in range(0, len(order), self.batch_size)]
+
+        # Poucos textos não compensam o custo de carregar o modelo em outros processos
+        if self.workers <= 1 or len(batches) < 2 or len(texts) < EMBEDDING_PARALLEL_MIN_TEXTS:
+            for batch in batches:
+                vectors = self.embeddings.embed_documents([texts[i] for i in batch])
+                yield batch, np.asarray(vectors, dtype=np.float32)
+            return
+
+        workers = min(self.workers, len(batches))
+        threads = max(1, (os.cpu_count() or 1) // workers)
+
+        # "spawn" evita herdar o estado do PyTorch/OpenMP (ou do ONNX Runtime) do processo principal
+        with ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(self.model_name, threads, self.backend)
+        ) as pool:
+            futures = {pool.submit(_encode_batch, [texts[i] for i in batch]): batch for batch in batches}
+            for future in as_completed(futures):
+                yield futures[future], future.result()
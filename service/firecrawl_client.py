@@ -0,0 +1,269 @@
+"""
+Cliente Assíncrono do Firecrawl
+
+Este módulo implementa o cliente da API de crawl do Firecrawl sobre asyncio.
+Todas as chamadas rodam em um único event loop em segundo plano, com um pool
+de conexões HTTP reutilizadas, um limite global de crawls simultâneos e um
+limite global de requisições por minuto. O status de cada crawl é consultado
+com intervalo adaptativo: rápido enquanto chegam páginas novas e cada vez
+mais espaçado quando o crawl está parado.
+"""
+
+import asyncio
+import os
+import random
+import threading
+import time
+
+import httpx
+
+from service.rate_limit import RateLimiter
+
+# Crawls executados ao mesmo tempo no processo (padrão: 4)
+FIRECRAWL_MAX_CONCURRENT_CRAWLS = int(os.getenv("FIRECRAWL_MAX_CONCURRENT_CRAWLS", "4"))
+
+# Requisições por minuto à API, somando todos os crawls (padrão: 120)
+FIRECRAWL_REQUESTS_PER_MINUTE = int(os.getenv("FIRECRAWL_REQUESTS_PER_MINUTE", "120"))
+
+# Conexões HTTP mantidas no pool (padrão: 20)
+FIRECRAWL_MAX_CONNECTIONS = int(os.getenv("FIRECRAWL_MAX_CONNECTIONS", "20"))
+
+# Intervalo de polling: mínimo (com progresso) e máximo (sem progresso), em segundos
+FIRECRAWL_POLL_MIN_INTERVAL = float(os.getenv("FIRECRAWL_POLL_MIN_INTERVAL", "0.5"))
+FIRECRAWL_POLL_MAX_INTERVAL = float(os.getenv("FIRECRAWL_POLL_MAX_INTERVAL", "10"))
+
+# Tempo máximo sem páginas novas antes de abandonar o crawl, em segundos (padrão: 600)
+FIRECRAWL_IDLE_TIMEOUT = float(os.getenv("FIRECRAWL_IDLE_TIMEOUT", "600"))
+
+# Tentativas para erros transitórios (429, 5xx, falhas de conexão)
+MAX_RETRIES = 4
+RETRY_STATUS = {429, 500, 502, 503, 504}
+
+# Falhas ocorridas antes do envio da requisição (seguras para repetir qualquer método)
+NOT_SENT_ERRORS = (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout)
+
+# Event loop compartilhado por todos os clientes do processo
+_loop = None
+_loop_lock = threading.Lock()
+
+def _get_loop():
+    """
+    Retorna o event loop de segundo plano, iniciando-o na primeira chamada.
+
+    Returns:
+        asyncio.AbstractEventLoop: Loop executado em uma thread daemon
+    """
+    global _loop
+    with _loop_lock:
+        if _loop is None:
+            _loop = asyncio.new_event_loop()
+            threading.Thread(target=_loop.run_forever, name="firecrawl-loop", daemon=True).start()
+        return _loop
+
+class FirecrawlClient:
+    """
+    Cliente assíncrono da API de crawl do Firecrawl.
+
+    Funcionalidades:
+    - Reutiliza conexões HTTP entre requisições e entre crawls
+    - Limita crawls simultâneos e requisições por minuto no processo todo
+    - Consulta o status com intervalo adaptativo e repete erros transitórios
+    - Expõe os crawls como geradores assíncronos ou síncronos de páginas
+    """
+
+    def __init__(self, api_url, api_key):
+        self.api_url = api_url.rstrip("/")
+        self.api_key = api_key
+        self.loop = _get_loop()
+        self.rate_limiter = RateLimiter(FIRECRAWL_REQUESTS_PER_MINUTE)
+
+        # Criados dentro do event loop na primeira requisição
+        self._http = None
+        self._crawl_slots = None
+
+    async def crawl(self, url):
+        """
+        Inicia o crawl de um website e entrega as páginas à medida que ficam prontas.
+
+        Cada consulta busca apenas as páginas ainda não entregues (parâmetro
+        skip) e segue a paginação ("next") da API.
+
+        Args:
+            url (str): URL do website a ser processado
+
+        Yields:
+            dict: Página retornada pela API Firecrawl
+        """
+        if self._crawl_slots is None:
+            self._crawl_slots = asyncio.Semaphore(FIRECRAWL_MAX_CONCURRENT_CRAWLS)
+
+        async with self._crawl_slots:
+            endpoint = f"{self.api_url}/v1/crawl"
+            body = await self._request("POST", endpoint, json={"url": url})
+
+            # Alguns servidores devolvem os dados imediatamente, sem job assíncrono
+            immediate_data = body.get("data", []) if isinstance(body, dict) else []
+            job_id = body.get("id") if isinstance(body, dict) else None
+            if not immediate_data and not job_id:
+                raise Exception("A API não retornou o job nem as páginas do crawl")
+            if immediate_data:
+                for page in immediate_data:
+                    yield page
+                return
+
+            print(f"Crawl iniciado: {url} (job {job_id})")
+            status_endpoint = f"{endpoint}/{job_id}"
+            delivered = 0
+            interval = FIRECRAWL_POLL_MIN_INTERVAL
+            last_progress = time.monotonic()
+
+            while True:
+                await asyncio.sleep(interval)
+                status, pages = await self._fetch_new_pages(status_endpoint, delivered)
+
+                for page in pages:
+                    yield page
+                delivered += len(pages)
+
+                if status in ("completed", "success", "finished"):
+                    print(f"Crawl concluído: {url} ({delivered} páginas)")
+                    return
+
+                # Sem progresso, espaça as consultas; com progresso, volta ao mínimo
+                if pages:
+                    interval = FIRECRAWL_POLL_MIN_INTERVAL
+                    last_progress = time.monotonic()
+                else:
+                    interval = min(interval * 1.5, FIRECRAWL_POLL_MAX_INTERVAL)
+                    if time.monotonic() - last_progress > FIRECRAWL_IDLE_TIMEOUT:
+                        raise Exception(f"Crawl sem páginas novas há {FIRECRAWL_IDLE_TIMEOUT:.0f} s")
+
+    def iter_pages(self, url):
+        """
+        Versão síncrona de crawl, para uso fora do event loop.
+
+        Cada página é pedida ao event loop apenas quando o consumidor está
+        pronto, o que limita a memória ao que já foi entregue pela API.
+
+        Args:
+            url (str): URL do website a ser processado
+
+        Yields:
+            dict: Página retornada pela API Firecrawl
+        """
+        pages = self.crawl(url)
+        try:
+            while True:
+                future = asyncio.run_coroutine_threadsafe(pages.__anext__(), self.loop)
+                try:
+                    page = future.result()
+                except StopAsyncIteration:
+                    return
+                yield page
+        finally:
+            asyncio.run_coroutine_threadsafe(pages.aclose(), self.loop).result()
+
+    async def _fetch_new_pages(self, status_endpoint, skip):
+        """
+        Busca as páginas de um job de crawl a partir de uma posição.
+
+        Args:
+            status_endpoint (str): URL de status do job
+            skip (int): Número de páginas já entregues
+
+        Returns:
+            tuple: (status do job, lista de páginas novas)
+        """
+        pages = []
+        status = None
+        next_url = f"{status_endpoint}?skip={skip}"
+        while next_url:
+            try:
+                status_body = await self._request("GET", next_url)
+            except httpx.HTTPStatusError as http_err:
+                # Alguns servidores só expõem os resultados em /results
+                if http_err.response.status_code != 404:
+                    raise
+                status_body = await self._request("GET", f"{status_endpoint}/results?skip={skip}")
+            if not isinstance(status_body, dict):
+                break
+
+            status = status or status_body.get("status") or status_body.get("state")
+            if status in ("failed", "error"):
+                raise Exception(status_body.get("error") or "Crawl falhou")
+
+            data = status_body.get("data")
+            if isinstance(data, list):
+                pages.extend(data)
+            next_url = status_body.get("next") if data else None
+        return status, pages
+
+    async def _request(self, method, url, **kwargs):
+        """
+        Executa uma requisição respeitando o limite de taxa, com novas tentativas.
+
+        Erros transitórios são repetidos com backoff exponencial e jitter,
+        respeitando o cabeçalho Retry-After quando presente. Só requisições
+        GET são repetidas após uma resposta ou um erro no meio do envio; as
+        demais (como o POST que inicia um crawl) só são repetidas quando a
+        conexão falhou antes do envio, para não iniciar jobs duplicados.
+
+        Args:
+            method (str): Método HTTP
+            url (str): URL da requisição
+            **kwargs: Argumentos repassados ao httpx
+
+        Returns:
+            dict: Corpo JSON da resposta (vazio se não houver conteúdo)
+        """
+        if self._http is None:
+            self._http = httpx.AsyncClient(
+                headers={
+                    "Authorization": f"Bearer {self.api_key}",
+                    "Content-Type": "application/json",
+                },
+                limits=httpx.Limits(
+                    max_connections=FIRECRAWL_MAX_CONNECTIONS,
+                    max_keepalive_connections=FIRECRAWL_MAX_CONNECTIONS
+                ),
+                timeout=httpx.Timeout(120, connect=10)
+            )
+
+        idempotent = method.upper() == "GET"
+        for attempt in range(MAX_RETRIES + 1):
+            await self.rate_limiter.acquire_async()
+            try:
+                resp = await self._http.request(method, url, **kwargs)
+                if resp.status_code not in RETRY_STATUS or attempt == MAX_RETRIES or not idempotent:
+                    resp.raise_for_status()
+                    return resp.json() if resp.content else {}
+                retry_after = resp.headers.get("Retry-After")
+            except httpx.TransportError as e:
+                if attempt == MAX_RETRIES or not (idempotent or isinstance(e, NOT_SENT_ERRORS)):
+                    raise
+                retry_after = None
+
+            delay = min(30.0, 2 ** attempt) * random.uniform(0.5, 1.5)
+            if retry_after and retry_after.isdigit():
+                delay = max(delay, float(retry_after))
+            await asyncio.sleep(delay)
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+def get_firecrawl_client(api_url, api_key):
+    """
+    Retorna o cliente compartilhado para uma URL e chave de API.
+
+    Args:
+        api_url (str): URL base da API Firecrawl
+        api_key (str): Chave de API
+
+    Returns:
+        FirecrawlClient: Cliente compartilhado pelo processo
+    """
+    with _clients_lock:
+        key = (api_url, api_key)
+        if key not in _clients:
+            _clients[key] = FirecrawlClient(api_url, api_key)
+        return _clients[key]
@@ -0,0 +1,171 @@
+"""
+Tipos de Índice FAISS
+
+Este módulo escolhe e constrói o índice FAISS usado nas buscas de cada
+coleção. O índice plano (exato) continua sendo a referência para as
+atualizações incrementais; a partir dele são gerados índices de busca mais
+rápidos ou mais compactos (HNSW, IVF, quantização de produto, float16),
+escolhidos pelo tamanho da coleção ou fixados por coleção. Os índices de
+busca são lidos via memory-map, sem carregar os vetores na RAM.
+"""
+
+import math
+import os
+
+import faiss
+
+# Tipo de índice de busca: auto, flat, flat_fp16, hnsw, ivf_fp16 ou ivf_pq (padrão: auto)
+FAISS_INDEX_TYPE = os.getenv("FAISS_INDEX_TYPE", "auto")
+
+# Seleção automática: vetores a partir dos quais usar HNSW e IVF-PQ
+FAISS_AUTO_HNSW_MIN_VECTORS = int(os.getenv("FAISS_AUTO_HNSW_MIN_VECTORS", "50000"))
+FAISS_AUTO_IVFPQ_MIN_VECTORS = int(os.getenv("FAISS_AUTO_IVFPQ_MIN_VECTORS", "500000"))
+
+# Parâmetros de busca: vizinhos visitados no HNSW e listas visitadas no IVF
+FAISS_HNSW_EF_SEARCH = int(os.getenv("FAISS_HNSW_EF_SEARCH", "64"))
+FAISS_IVF_NPROBE = int(os.getenv("FAISS_IVF_NPROBE", "16"))
+
+INDEX_TYPES = ("flat", "flat_fp16", "hnsw", "ivf_fp16", "ivf_pq")
+
+# Vetores mínimos para treinar um índice IVF (e os 256 centróides do PQ)
+IVF_MIN_TRAINING_VECTORS = 39 * 256
+
+def select_index_type(requested, total_vectors):
+    """
+    Resolve o tipo de índice de busca de uma coleção.
+
+    Args:
+        requested (str): Tipo pedido ("auto" escolhe pelo tamanho da coleção)
+        total_vectors (int): Número de vetores da coleção
+
+    Returns:
+        str: Tipo concreto do índice
+    """
+    if requested in INDEX_TYPES:
+        # Coleções pequenas demais para o treino do IVF usam o índice plano
+        if requested.startswith("ivf") and total_vectors < IVF_MIN_TRAINING_VECTORS:
+            return "flat"
+        return requested
+    if requested != "auto":
+        print(f"Tipo de índice desconhecido: {requested} (usando seleção automática)")
+
+    if total_vectors >= FAISS_AUTO_IVFPQ_MIN_VECTORS:
+        return "ivf_pq"
+    if total_vectors >= FAISS_AUTO_HNSW_MIN_VECTORS:
+        return "hnsw"
+    return "flat"
+
+def build_search_index(flat_index, index_type):
+    """
+    Constrói um índice de busca a partir do índice plano de referência.
+
+    Os vetores são adicionados na mesma ordem, então as posições continuam
+    correspondendo aos documentos do docstore.
+
+    Args:
+        flat_index (faiss.Index): Índice plano com todos os vetores
+        index_type (str): Tipo concreto do índice de busca
+
+    Returns:
+        faiss.Index: Índice de busca treinado e preenchido
+    """
+    total, dim = flat_index.ntotal, flat_index.d
+    vectors = flat_index.reconstruct_n(0, total)
+
+    # Listas invertidas: ~4 * sqrt(n), com pelo menos 39 vetores de treino por lista
+    nlist = max(1, min(int(4 * math.sqrt(total)), total // 39))
+    # Subquantizadores: ~8 dimensões por byte, respeitando a divisibilidade
+    pq_m = max(m for m in range(1, dim // 8 + 1) if dim % m == 0) if dim >= 8 else dim
+    factory = {
+        "flat": "Flat",
+        "flat_fp16": "SQfp16",
+        "hnsw": "HNSW32",
+        "ivf_fp16": f"IVF{nlist},SQfp16",
+        "ivf_pq": f"IVF{nlist},PQ{pq_m}",
+    }[index_type]
+
+    index = faiss.index_factory(dim, factory, faiss.METRIC_L2)
+    if not index.is_trained:
+        index.train(vectors)
+    index.add(vectors)
+    return index
+
+def write_index(index, path):
+    """
+    Salva um índice FAISS de forma atômica.
+
+    Args:
+        index (faiss.Index): Índice a ser salvo
+        path (Path): Arquivo de destino
+    """
+    temp_path = path.with_name(f"{path.name}.tmp")
+    faiss.write_index(index, str(temp_path))
+    os.replace(temp_path, path)
+
+def read_index(path, index_type):
+    """
+    Lê um índice de busca via memory-map e aplica os parâmetros de busca.
+
+    Args:
+        path (Path): Arquivo do índice
+        index_type (str): Tipo concreto do índice
+
+    Returns:
+        faiss.Index: Índice somente leitura
+    """
+    # Índices IVF mapeiam as listas invertidas; os demais, os códigos dos vetores
+    mmap_flag = faiss.IO_FLAG_MMAP if index_type.startswith("ivf") else faiss.IO_FLAG_MMAP_IFC
+    index = faiss.read_index(str(path), mmap_flag | faiss.IO_FLAG_READ_ONLY)
+
+    parameters = faiss.ParameterSpace()
+    if index_type == "hnsw":
+        parameters.set_index_parameter(index, "efSearch", FAISS_HNSW_EF_SEARCH)
+    elif index_type.startswith("ivf"):
+        parameters.set_index_parameter(index, "nprobe", FAISS_IVF_NPROBE)
+    return index
+
+def search_parameters(index, positions):
+    """
+    Monta os parâmetros de uma busca restrita a algumas posições do índice.
+
+    Os parâmetros de cada tipo (efSearch, nprobe) são copiados do índice,
+    já que os parâmetros da busca substituem os do índice.
+
+    Args:
+        index (faiss.Index): Índice de busca
+        positions (np.ndarray): Posições pesquisáveis (int64)
+
+    Returns:
+        faiss.SearchParameters: Parâmetros com o seletor das posições
+    """
+    selector = faiss.IDSelectorBatch(positions)
+    concrete = faiss.downcast_index(index)
+    if isinstance(concrete, faiss.IndexHNSW):
+        parameters = faiss.SearchParametersHNSW(sel=selector, efSearch=concrete.hnsw.efSearch)
+    elif isinstance(concrete, faiss.IndexIVF):
+        parameters = faiss.SearchParametersIVF(sel=selector, nprobe=concrete.nprobe)
+    else:
+        parameters = faiss.SearchParameters(sel=selector)
+    # O seletor precisa viver enquanto os parâmetros forem usados
+    parameters.selector = selector
+    return parameters
+
+def index_memory_size(index):
+    """
+    Estima a memória residente de um índice lido via memory-map.
+
+    Apenas estruturas auxiliares (grafo HNSW, centróides IVF) ficam na RAM;
+    os vetores são páginas do arquivo, carregadas e descartadas pelo sistema.
+
+    Args:
+        index (faiss.Index): Índice de busca
+
+    Returns:
+        int: Tamanho estimado em bytes
+    """
+    index = faiss.downcast_index(index)
+    if isinstance(index, faiss.IndexHNSW):
+        return index.hnsw.neighbors.size() * 4
+    if isinstance(index, faiss.IndexIVF):
+        return index.nlist * index.d * 4
+    return 0
@@ -0,0 +1,611 @@
+"""
+Armazenamento de Índices Vetoriais
+
+Este módulo implementa a persistência dos índices FAISS de cada coleção,
+evitando recalcular os embeddings a cada carregamento. Cada índice é
+acompanhado de um manifesto com o hash de cada página e os identificadores
+dos chunks gerados a partir dela, o que permite reindexar apenas o que mudou.
+Ao lado do índice vetorial fica o índice lexical BM25 dos mesmos chunks,
+usado na busca híbrida.
+"""
+
+import hashlib
+import json
+import os
+import pickle
+import shutil
+import tempfile
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from pathlib import Path
+
+import faiss
+import numpy as np
+from langchain_core.documents import Document
+from langchain_community.vectorstores import FAISS
+
+try:
+    import fcntl
+except ImportError:
+    # Sem fcntl (Windows), os salvamentos só são coordenados dentro do processo
+    fcntl = None
+
+from service.bm25 import BM25Index
+from service.collection_store import open_collection
+from service.dedup import ChunkDeduplicator
+from service.index_factory import (
+    FAISS_INDEX_TYPE,
+    build_search_index,
+    index_memory_size,
+    read_index,
+    search_parameters,
+    select_index_type,
+    write_index,
+)
+
+class CollectionIndex:
+    """
+    Índice de busca de uma coleção: vetorial (FAISS) e lexical (BM25).
+
+    Funcionalidades:
+    - Combina as duas buscas em uma única pontuação de relevância
+    - Busca várias perguntas de uma vez (uma única busca k-NN vetorizada)
+    - Oferece visões restritas a uma versão da coleção, sem copiar os vetores
+    - Estima a memória ocupada pelos dois índices
+    """
+
+    def __init__(self, vectorstore, bm25):
+        self.vectorstore = vectorstore
+        self.bm25 = bm25
+
+        # Em uma visão restrita: o índice completo, as posições e os chunks
+        # pesquisáveis, a página de cada chunk na visão e o hash de cada página
+        self.base = None
+        self._positions = None
+        self._allowed = None
+        self._sources = None
+        self._hashes = None
+
+        # Visões por (manifesto, versão) criadas a partir deste índice (descartadas junto com ele)
+        self.views = {}
+
+    def restrict(self, pages, source, hashes):
+        """
+        Cria uma visão do índice restrita aos chunks de algumas páginas.
+
+        A visão compartilha os vetores, os documentos e o BM25 do índice
+        completo; guarda apenas as posições pesquisáveis. A fonte de cada
+        chunk passa a ser a página da visão que o contém.
+
+        Args:
+            pages (dict): Páginas da visão (formato do manifesto, com os chunks), em ordem
+            source (callable): Retorna o caminho de uma página pelo nome
+            hashes (dict): Caminho de cada página do índice completo -> hash do conteúdo
+
+        Returns:
+            CollectionIndex: Visão somente leitura
+        """
+        sources = {}
+        for name, page in pages.items():
+            for chunk_id in page["chunks"]:
+                sources.setdefault(chunk_id, (source(name), page["hash"]))
+
+        positions = [
+            position for position, chunk_id in self.vectorstore.index_to_docstore_id.items()
+            if chunk_id in sources
+        ]
+        view = CollectionIndex(self.vectorstore, self.bm25)
+        view.base = self
+        view._positions = np.asarray(sorted(positions), dtype=np.int64)
+        if self.bm25 is not None:
+            view._allowed = np.fromiter((chunk_id in sources for chunk_id in self.bm25.ids), dtype=bool, count=len(self.bm25.ids))
+        view._sources = sources
+        view._hashes = hashes
+        return view
+
+    def search(self, query, embedding, k, fetch_k, alpha):
+        """
+        Busca os chunks mais relevantes combinando as pontuações vetorial e lexical.
+
+        A relevância vetorial é a similaridade de cosseno (embeddings
+        normalizados) e a lexical é a pontuação BM25 dividida pela maior entre
+        os candidatos. A pontuação final é alpha * vetorial + (1 - alpha) * lexical;
+        candidatos encontrados por apenas uma das buscas recebem 0 na outra.
+
+        Args:
+            query (str): Texto da pergunta
+            embedding (list): Embedding da pergunta
+            k (int): Número de chunks retornados
+            fetch_k (int): Candidatos buscados em cada índice
+            alpha (float): Peso da busca vetorial (1 = só vetorial, 0 = só lexical)
+
+        Returns:
+            list: Pares (Document, relevância entre 0 e 1), do mais para o menos relevante
+        """
+        return self.search_batch([query], [embedding], k, fetch_k, alpha)[0]
+
+    def search_batch(self, queries, embeddings, k, fetch_k, alpha):
+        """
+        Busca várias perguntas de uma vez (mesma pontuação de search).
+
+        Os embeddings são consultados no índice vetorial em uma única chamada,
+        que o FAISS paraleliza entre as perguntas.
+
+        Args:
+            queries (list): Textos das perguntas
+            embeddings (list): Embeddings das perguntas, na mesma ordem
+            k (int): Número de chunks retornados por pergunta
+            fetch_k (int): Candidatos buscados em cada índice
+            alpha (float): Peso da busca vetorial (1 = só vetorial, 0 = só lexical)
+
+        Returns:
+            list: Para cada pergunta, pares (Document, relevância) como em search
+        """
+        vectors = np.asarray(embeddings, dtype=np.float32).reshape(len(queries), -1)
+        if getattr(self.vectorstore, "_normalize_L2", False):
+            faiss.normalize_L2(vectors)
+        if self._positions is None:
+            distances, positions = self.vectorstore.index.search(vectors, fetch_k)
+        else:
+            parameters = search_parameters(self.vectorstore.index, self._positions)
+            distances, positions = self.vectorstore.index.search(vectors, fetch_k, params=parameters)
+
+        return [
+            self._combine(query, row_distances, row_positions, k, fetch_k, alpha)
+            for query, row_distances, row_positions in zip(queries, distances, positions)
+        ]
+
+    def _combine(self, query, distances, positions, k, fetch_k, alpha):
+        """
+        Combina os vizinhos vetoriais de uma pergunta com sua busca BM25.
+
+        Args:
+            query (str): Texto da pergunta
+            distances (np.ndarray): Distâncias L2 dos vizinhos
+            positions (np.ndarray): Posições dos vizinhos no índice (-1 se ausentes)
+            k (int): Número de chunks retornados
+            fetch_k (int): Candidatos buscados no índice BM25
+            alpha (float): Peso da busca vetorial
+
+        Returns:
+            list: Pares (Document, relevância), do mais para o menos relevante
+        """
+        candidates = {}
+        dense = {}
+        for distance, position in zip(distances, positions):
+            if position == -1:
+                continue
+            doc = self.vectorstore.docstore.search(self.vectorstore.index_to_docstore_id[int(position)])
+            if not isinstance(doc, Document):
+                continue
+            chunk_id = doc.id or IndexStore.chunk_id(doc.page_content)
+            candidates[chunk_id] = self._document(chunk_id, doc)
+            # Distância L2 ao quadrado entre vetores unitários: cosseno = 1 - d / 2
+            dense[chunk_id] = max(0.0, 1.0 - float(distance) / 2)
+
+        lexical = {}
+        matches = self.bm25.search(query, fetch_k, self._allowed) if self.bm25 is not None else []
+        if matches:
+            top_score = matches[0][1]
+            for chunk_id, score in matches:
+                lexical[chunk_id] = score / top_score
+                if chunk_id not in candidates:
+                    doc = self.vectorstore.docstore.search(chunk_id)
+                    if isinstance(doc, Document):
+                        candidates[chunk_id] = self._document(chunk_id, doc)
+
+        scored = [
+            (doc, alpha * dense.get(chunk_id, 0.0) + (1 - alpha) * lexical.get(chunk_id, 0.0))
+            for chunk_id, doc in candidates.items()
+        ]
+        scored.sort(key=lambda item: item[1], reverse=True)
+        return scored[:k]
+
+    def _document(self, chunk_id, doc):
+        """
+        Ajusta a fonte de um chunk encontrado para a página da visão.
+
+        A posição do chunk só é mantida se a página da visão tiver o mesmo
+        conteúdo daquela em que o chunk foi indexado.
+
+        Args:
+            chunk_id (str): Identificador do chunk
+            doc (Document): Documento do índice completo
+
+        Returns:
+            Document: Documento com a fonte da visão (o próprio documento fora de visões)
+        """
+        if self._sources is None or chunk_id not in self._sources:
+            return doc
+        source, page_hash = self._sources[chunk_id]
+        if doc.metadata.get("source") == source:
+            return doc
+        metadata = dict(doc.metadata, source=source)
+        if self._hashes.get(doc.metadata.get("source")) != page_hash:
+            metadata.pop("start_index", None)
+        return Document(page_content=doc.page_content, metadata=metadata, id=doc.id)
+
+    def memory_size(self):
+        """
+        Estima a memória ocupada pelos índices e pelos documentos.
+
+        Vetores e postings lidos via memory-map não são contados: ficam no
+        cache de páginas do sistema, que os descarta quando falta memória.
+        Uma visão conta apenas as próprias estruturas (os índices são do
+        índice completo).
+
+        Returns:
+            int: Tamanho estimado em bytes
+        """
+        if self.base is not None:
+            allowed_size = self._allowed.nbytes if self._allowed is not None else 0
+            return self._positions.nbytes + allowed_size + 200 * (len(self._sources) + len(self._hashes))
+        vectors_size = index_memory_size(self.vectorstore.index)
+        texts_size = sum(len(doc.page_content) for doc in self.vectorstore.docstore._dict.values())
+        bm25_size = self.bm25.memory_size() if self.bm25 is not None else 0
+        return vectors_size + texts_size + bm25_size
+
+class IndexStore:
+    """
+    Armazenamento em disco dos índices FAISS por coleção.
+
+    Funcionalidades:
+    - Calcula o hash de cada página e a impressão digital da coleção
+    - Salva o índice vetorial junto com um manifesto de páginas e chunks
+    - Carrega o índice salvo para uso direto ou atualização incremental
+    - Constrói e salva o índice lexical BM25 junto com o vetorial
+    - Gera o índice de busca do tipo escolhido (plano, HNSW, IVF...) e o lê via memory-map
+    """
+
+    def __init__(self, base_path="data/indexes"):
+        # Diretório raiz dos índices (um subdiretório por coleção)
+        self.base_path = Path(base_path)
+
+        # Impressão digital do manifesto de cada coleção, pela assinatura do arquivo
+        self._fingerprints = {}
+
+    def index_path(self, collection_name):
+        """
+        Retorna o diretório do índice de uma coleção.
+
+        Args:
+            collection_name (str): Nome da coleção
+
+        Returns:
+            Path: Caminho do diretório do índice
+        """
+        index_path = self.base_path / collection_name
+        old_path = index_path.with_name(f"{index_path.name}.old")
+        if not index_path.exists() and old_path.exists():
+            # Uma troca foi interrompida antes de o novo índice entrar: volta ao anterior
+            try:
+                old_path.rename(index_path)
+            except OSError:
+                pass
+        return index_path
+
+    def scan_pages(self, collection_path, manifest=None, names=None):
+        """
+        Lista as páginas de uma coleção com o hash do conteúdo de cada uma.
+
+        Páginas cujo tamanho e data de modificação não mudaram desde o último
+        manifesto reaproveitam o hash salvo, sem reler o arquivo; no formato
+        empacotado, o hash vem da tabela do pacote.
+
+        Args:
+            collection_path (str): Diretório da coleção
+            manifest (dict): Manifesto do índice salvo, se existir
+            names (list): Restringe a varredura a estas páginas (opcional)
+
+        Returns:
+            dict: Nome da página -> {"hash", "size"} (e "mtime_ns" no formato de arquivos)
+        """
+        previous = (manifest or {}).get("pages", {})
+        collection = open_collection(collection_path)
+        if names is None:
+            names = collection.names()
+        return {name: collection.page_info(name, previous.get(name)) for name in names}
+
+    def compute_fingerprint(self, pages, settings):
+        """
+        Calcula a impressão digital de uma coleção.
+
+        Args:
+            pages (dict): Páginas retornadas por scan_pages
+            settings (dict): Configurações que afetam o índice (modelo, chunks)
+
+        Returns:
+            str: Hash SHA-256 em hexadecimal
+        """
+        digest = hashlib.sha256()
+        digest.update(json.dumps(settings, sort_keys=True).encode("utf-8"))
+        for name in sorted(pages):
+            digest.update(f"{name}\0{pages[name]['hash']}\0".encode("utf-8"))
+        return digest.hexdigest()
+
+    @staticmethod
+    def chunk_id(text):
+        """
+        Gera o identificador de um chunk a partir do seu conteúdo.
+
+        Chunks idênticos recebem o mesmo identificador e são indexados uma única vez.
+
+        Args:
+            text (str): Conteúdo do chunk
+
+        Returns:
+            str: Identificador do chunk
+        """
+        return hashlib.sha256(text.encode("utf-8")).hexdigest()[:32]
+
+    def read_manifest(self, collection_name):
+        """
+        Lê o manifesto do índice salvo de uma coleção.
+
+        Args:
+            collection_name (str): Nome da coleção
+
+        Returns:
+            dict: Conteúdo do manifesto, ou None se inexistente ou inválido
+        """
+        manifest_file = self.index_path(collection_name) / "manifest.json"
+        if not manifest_file.exists():
+            return None
+        try:
+            with open(manifest_file, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except Exception:
+            return None
+
+    def manifest_fingerprint(self, collection_name):
+        """
+        Retorna a impressão digital do índice salvo de uma coleção.
+
+        O manifesto só é relido quando o arquivo muda (inclusive por outro
+        processo), o que permite consultá-la a cada execução da página.
+
+        Args:
+            collection_name (str): Nome da coleção
+
+        Returns:
+            str: Impressão digital, ou None se não houver manifesto válido
+        """
+        manifest_file = self.index_path(collection_name) / "manifest.json"
+        try:
+            stat = manifest_file.stat()
+        except OSError:
+            return None
+        signature = (stat.st_ino, stat.st_size, stat.st_mtime_ns)
+        cached = self._fingerprints.get(collection_name)
+        if cached is None or cached[0] != signature:
+            manifest = self.read_manifest(collection_name) or {}
+            cached = self._fingerprints[collection_name] = (signature, manifest.get("fingerprint"))
+        return cached[1]
+
+    def load(self, collection_name, embeddings):
+        """
+        Carrega o índice salvo de uma coleção.
+
+        Args:
+            collection_name (str): Nome da coleção
+            embeddings: Modelo de embeddings usado nas consultas
+
+        Returns:
+            FAISS: Índice carregado, ou None se ausente ou corrompido
+        """
+        index_path = self.index_path(collection_name)
+        if not (index_path / "index.faiss").exists():
+            return None
+
+        try:
+            # O arquivo .pkl foi gerado por esta própria aplicação
+            return FAISS.load_local(
+                str(index_path),
+                embeddings,
+                allow_dangerous_deserialization=True
+            )
+        except Exception as e:
+            print(f"Erro ao carregar índice da coleção {collection_name}: {str(e)}")
+            return None
+
+    def load_search_index(self, collection_name, embeddings, vectorstore=None, index_type=None):
+        """
+        Carrega o índice de busca (vetorial e lexical) de uma coleção.
+
+        O índice vetorial de busca é gerado a partir do índice plano salvo,
+        com o tipo fixado para a coleção ou escolhido pelo seu tamanho, e
+        lido via memory-map. Índices salvos antes da busca híbrida, ou cujo
+        BM25 não corresponde aos chunks do índice vetorial, têm o BM25
+        reconstruído e salvo.
+
+        Args:
+            collection_name (str): Nome da coleção
+            embeddings: Modelo de embeddings usado nas consultas
+            vectorstore (FAISS): Índice plano recém-salvo, se já estiver em memória
+            index_type (str): Tipo do índice de busca (padrão: o fixado na coleção ou FAISS_INDEX_TYPE)
+
+        Returns:
+            CollectionIndex: Índice de busca, ou None se não houver índice salvo
+        """
+        index_path = self.index_path(collection_name)
+        if not (index_path / "index.faiss").exists():
+            return None
+        manifest = self.read_manifest(collection_name) or {}
+
+        try:
+            flat_index = vectorstore.index if vectorstore is not None else read_index(index_path / "index.faiss", "flat")
+            search_type = select_index_type(
+                index_type or manifest.get("index_type") or FAISS_INDEX_TYPE,
+                flat_index.ntotal
+            )
+
+            # O índice de busca é gerado uma vez por versão salva do índice plano
+            search_file = index_path / ("index.faiss" if search_type == "flat" else f"search_{search_type}.faiss")
+            if not search_file.exists():
+                print(f"Construindo índice {search_type} da coleção {collection_name} ({flat_index.ntotal} vetores)")
+                write_index(build_search_index(flat_index, search_type), search_file)
+
+            if vectorstore is not None:
+                docstore, index_to_docstore_id = vectorstore.docstore, vectorstore.index_to_docstore_id
+            else:
+                # O arquivo .pkl foi gerado por esta própria aplicação
+                with open(index_path / "index.pkl", "rb") as f:
+                    docstore, index_to_docstore_id = pickle.load(f)
+
+            search_store = FAISS(embeddings, read_index(search_file, search_type), docstore, index_to_docstore_id)
+        except Exception as e:
+            print(f"Erro ao carregar índice de busca da coleção {collection_name}: {str(e)}")
+            return None
+
+        bm25_path = index_path / "bm25"
+        try:
+            bm25 = BM25Index.load(bm25_path)
+        except Exception as e:
+            print(f"Erro ao carregar índice BM25 da coleção {collection_name}: {str(e)}")
+            bm25 = None
+
+        if bm25 is None or len(bm25.ids) != search_store.index.ntotal:
+            bm25 = BM25Index.from_vectorstore(search_store)
+            try:
+                bm25.save(bm25_path)
+            except Exception as e:
+                print(f"Erro ao salvar índice BM25 da coleção {collection_name}: {str(e)}")
+        return CollectionIndex(search_store, bm25)
+
+    def set_index_type(self, collection_name, index_type):
+        """
+        Fixa o tipo do índice de busca de uma coleção no seu manifesto.
+
+        Args:
+            collection_name (str): Nome da coleção
+            index_type (str): Tipo do índice ("auto" volta à seleção pelo tamanho)
+
+        Returns:
+            bool: True se o tipo fixado mudou
+        """
+        manifest = self.read_manifest(collection_name)
+        if manifest is None or manifest.get("index_type") == index_type:
+            return False
+
+        manifest["index_type"] = index_type
+        manifest_file = self.index_path(collection_name) / "manifest.json"
+        temp_file = manifest_file.with_name("manifest.json.tmp")
+        with open(temp_file, "w", encoding="utf-8") as f:
+            json.dump(manifest, f, ensure_ascii=False)
+        os.replace(temp_file, manifest_file)
+        return True
+
+    def load_dedup(self, collection_name):
+        """
+        Carrega as assinaturas de deduplicação salvas com o índice de uma coleção.
+
+        Args:
+            collection_name (str): Nome da coleção
+
+        Returns:
+            ChunkDeduplicator: Detector carregado, ou None se ausente ou inválido
+        """
+        try:
+            return ChunkDeduplicator.load(self.index_path(collection_name) / "dedup")
+        except Exception as e:
+            print(f"Erro ao carregar assinaturas da coleção {collection_name}: {str(e)}")
+            return None
+
+    def save(self, collection_name, vectorstore, manifest, dedup=None):
+        """
+        Salva o índice de uma coleção (vetorial e BM25) e o seu manifesto.
+
+        Args:
+            collection_name (str): Nome da coleção
+            vectorstore (FAISS): Índice vetorial a ser salvo
+            manifest (dict): Impressão digital, configurações e páginas indexadas
+            dedup (ChunkDeduplicator): Assinaturas de deduplicação dos chunks (opcional)
+
+        Returns:
+            bool: True se o índice foi salvo
+        """
+        index_path = self.index_path(collection_name)
+        old_path = index_path.with_name(f"{index_path.name}.old")
+        temp_path = None
+
+        # Um salvamento por vez em cada coleção, mesmo entre processos (job e chat/API)
+        with self._save_lock(collection_name):
+            try:
+                self._remove_leftovers(index_path)
+
+                # Escreve em um diretório temporário exclusivo e troca no final (escrita atômica)
+                temp_path = Path(tempfile.mkdtemp(prefix=f"{index_path.name}.tmp-", dir=self.base_path))
+                self._write(collection_name, temp_path, vectorstore, manifest, dedup)
+
+                # Afasta o índice anterior, coloca o novo no lugar e só então apaga o
+                # anterior: sempre há um índice completo em disco
+                if old_path.exists():
+                    shutil.rmtree(old_path)
+                if index_path.exists():
+                    index_path.rename(old_path)
+                temp_path.rename(index_path)
+                shutil.rmtree(old_path, ignore_errors=True)
+                return True
+
+            except Exception as e:
+                print(f"Erro ao salvar índice da coleção {collection_name}: {str(e)}")
+                if temp_path is not None:
+                    shutil.rmtree(temp_path, ignore_errors=True)
+                return False
+
+    def _write(self, collection_name, temp_path, vectorstore, manifest, dedup):
+        """
+        Grava o índice, o BM25, as assinaturas e o manifesto em um diretório temporário.
+
+        Args:
+            collection_name (str): Nome da coleção
+            temp_path (Path): Diretório temporário (já criado)
+            vectorstore (FAISS): Índice vetorial a ser salvo
+            manifest (dict): Impressão digital, configurações e páginas indexadas
+            dedup (ChunkDeduplicator): Assinaturas de deduplicação dos chunks (opcional)
+        """
+        vectorstore.save_local(str(temp_path))
+        BM25Index.from_vectorstore(vectorstore).save(temp_path / "bm25")
+        if dedup is not None:
+            dedup.save(temp_path / "dedup")
+
+        # Mantém o tipo de índice fixado para a coleção
+        previous = self.read_manifest(collection_name) or {}
+        if "index_type" not in manifest and previous.get("index_type"):
+            manifest = dict(manifest, index_type=previous["index_type"])
+
+        manifest = dict(manifest, updated_at=datetime.now(timezone.utc).isoformat())
+        with open(temp_path / "manifest.json", "w", encoding="utf-8") as f:
+            json.dump(manifest, f, ensure_ascii=False)
+
+    def _remove_leftovers(self, index_path):
+        """
+        Remove diretórios temporários deixados por salvamentos interrompidos.
+
+        Deve ser chamado com o lock da coleção: nenhum outro salvamento está em andamento.
+
+        Args:
+            index_path (Path): Diretório do índice da coleção
+        """
+        leftovers = list(self.base_path.glob(f"{index_path.name}.tmp-*"))
+        leftovers.append(index_path.with_name(f"{index_path.name}.tmp"))
+        for leftover in leftovers:
+            shutil.rmtree(leftover, ignore_errors=True)
+
+    @contextmanager
+    def _save_lock(self, collection_name):
+        """
+        Lock exclusivo do salvamento de uma coleção, compartilhado entre processos.
+
+        Args:
+            collection_name (str): Nome da coleção
+        """
+        self.base_path.mkdir(parents=True, exist_ok=True)
+        with open(self.base_path / f"{collection_name}.lock", "a") as lock_file:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
@@ -0,0 +1,246 @@
+"""
+Ingestão em Streaming
+
+Este módulo conecta o scraping à indexação. As páginas são gravadas à medida
+que o crawl as entrega e, em paralelo, uma thread de indexação divide e
+embeda essas páginas em pequenos lotes e publica versões parciais do índice.
+A coleção fica pesquisável progressivamente e o uso de memória não depende
+do tamanho do crawl, já que nenhuma etapa acumula todas as páginas.
+"""
+
+import os
+import queue
+import threading
+import time
+
+from service.catalog import get_catalog
+from service.collection_store import open_collection
+from service.rag import RAGService
+from service.scraping import ScrapingService
+
+# Páginas acumuladas antes de cada rodada de indexação (padrão: 20)
+INGEST_BATCH_PAGES = int(os.getenv("INGEST_BATCH_PAGES", "20"))
+
+# Intervalo mínimo entre publicações do índice parcial, em segundos (padrão: 10)
+INGEST_PUBLISH_SECONDS = float(os.getenv("INGEST_PUBLISH_SECONDS", "10"))
+
+# Páginas aguardando indexação antes de o crawl esperar (padrão: 200)
+INGEST_QUEUE_SIZE = int(os.getenv("INGEST_QUEUE_SIZE", "200"))
+
+class StreamingIngest:
+    """
+    Pipeline de crawl, gravação e indexação simultâneos.
+
+    Funcionalidades:
+    - Grava cada página assim que o crawl a entrega
+    - Indexa as páginas em lotes enquanto o crawl continua
+    - Publica o índice parcial para as sessões de chat periodicamente
+    - Remove do índice páginas que não existem mais ao final do crawl
+    - Reindexa coleções já gravadas, com o mesmo progresso por lote
+    """
+
+    def __init__(self, scraper=None, rag_service=None):
+        self.scraper = scraper or ScrapingService()
+        self.rag_service = rag_service or RAGService()
+
+        # Contadores de progresso (atualizados pela thread de indexação)
+        self.pages_fetched = 0
+        self.pages_indexed = 0
+        self.chunks_indexed = 0
+
+        # Páginas esperadas (do crawl anterior ou da coleção), se conhecidas
+        self.pages_total = None
+
+        # Chamada com o progresso a cada página recebida e a cada lote indexado
+        self._on_progress = None
+
+    def run(self, url, collection_name, version, on_progress=None):
+        """
+        Executa o crawl e a indexação de uma coleção em streaming.
+
+        Args:
+            url (str): URL do website a ser processado
+            collection_name (str): Nome da coleção
+            version (str): Versão da documentação
+            on_progress (callable): Chamada com o dicionário de progresso a cada página e a cada lote indexado
+
+        Returns:
+            dict: Resultado do scraping acrescido do número de chunks indexados
+        """
+        pages_queue = queue.Queue(maxsize=INGEST_QUEUE_SIZE)
+        errors = []
+        self._on_progress = on_progress
+
+        # O crawl anterior da coleção dá uma estimativa do número de páginas
+        previous = get_catalog().get(collection_name)
+        if previous and previous.get("files_count"):
+            self.pages_total = previous["files_count"]
+
+        def on_page(file_name, content):
+            self.pages_fetched += 1
+            pages_queue.put(file_name)
+            self._report()
+
+        with self.rag_service.registry.ingesting(collection_name):
+            worker = threading.Thread(
+                target=self._index_worker,
+                args=(collection_name, pages_queue, errors),
+                daemon=True
+            )
+            worker.start()
+            try:
+                result = self.scraper.scrape_website(url, collection_name, version, on_page=on_page)
+            finally:
+                # Sinaliza o fim do crawl e aguarda a indexação final
+                pages_queue.put(None)
+                worker.join()
+
+        if errors and result.get("success"):
+            result = {"success": False, "error": f"Erro ao indexar: {errors[0]}"}
+        result["chunks"] = self.chunks_indexed
+        if result.get("success"):
+            self.pages_total = result.get("files")
+        self._report()
+        return result
+
+    def reindex(self, collection_name, on_progress=None):
+        """
+        Indexa as páginas já gravadas de uma coleção, em lotes.
+
+        Páginas já indexadas com as configurações atuais são reaproveitadas;
+        se as configurações mudaram, a coleção é reindexada do zero.
+
+        Args:
+            collection_name (str): Nome da coleção
+            on_progress (callable): Chamada com o dicionário de progresso a cada lote
+
+        Returns:
+            dict: Resultado com o número de páginas e de chunks indexados
+        """
+        names = open_collection(f"data/collections/{collection_name}").names()
+        if not names:
+            return {"success": False, "error": "Coleção sem páginas"}
+
+        self._on_progress = on_progress
+        self.pages_total = self.pages_fetched = len(names)
+        pages_queue = queue.Queue()
+        for name in names:
+            pages_queue.put(name)
+        pages_queue.put(None)
+
+        errors = []
+        with self.rag_service.registry.ingesting(collection_name):
+            self._index_worker(collection_name, pages_queue, errors)
+
+        if errors:
+            return {"success": False, "error": f"Erro ao indexar: {errors[0]}", "chunks": self.chunks_indexed}
+        self._report()
+        return {"success": True, "files": len(names), "chunks": self.chunks_indexed}
+
+    def progress(self):
+        """
+        Retorna o progresso atual da ingestão.
+
+        Returns:
+            dict: Páginas recebidas, páginas indexadas, chunks embedados e
+                páginas esperadas (None se desconhecido)
+        """
+        return {
+            "pages_fetched": self.pages_fetched,
+            "pages_indexed": self.pages_indexed,
+            "chunks_indexed": self.chunks_indexed,
+            "pages_total": max(self.pages_total, self.pages_fetched) if self.pages_total else None
+        }
+
+    def _report(self):
+        """
+        Envia o progresso atual ao callback, se houver.
+        """
+        if self._on_progress:
+            self._on_progress(self.progress())
+
+    def _index_worker(self, collection_name, pages_queue, errors):
+        """
+        Consome as páginas gravadas e as indexa em lotes.
+
+        Args:
+            collection_name (str): Nome da coleção
+            pages_queue (queue.Queue): Nomes dos arquivos gravados (None encerra)
+            errors (list): Recebe a exceção, se a indexação falhar
+        """
+        rag = self.rag_service
+        collection_path = f"data/collections/{collection_name}"
+
+        finished = False
+        try:
+            vectorstore, indexed_pages = rag.open_index(collection_name)
+            last_publish = None
+
+            while not finished:
+                # Acumula um lote, sem esperar mais que 1 s por páginas novas
+                batch = []
+                while len(batch) < INGEST_BATCH_PAGES:
+                    try:
+                        file_name = pages_queue.get(timeout=1)
+                    except queue.Empty:
+                        break
+                    if file_name is None:
+                        finished = True
+                        break
+                    batch.append(file_name)
+
+                if batch:
+                    scanned = rag.index_store.scan_pages(collection_path, {"pages": indexed_pages}, names=batch)
+                    vectorstore, indexed_pages, added = rag.index_pages(
+                        collection_name, collection_path, vectorstore, indexed_pages,
+                        dict(indexed_pages, **scanned)
+                    )
+                    self.pages_indexed += len(batch)
+                    self.chunks_indexed += added
+                    self._report()
+
+                # Publica logo o primeiro lote e depois no máximo a cada INGEST_PUBLISH_SECONDS
+                if batch and (last_publish is None or time.monotonic() - last_publish >= INGEST_PUBLISH_SECONDS):
+                    self._publish(collection_name, vectorstore, indexed_pages, partial=True)
+                    last_publish = time.monotonic()
+
+            # Reconcilia com o disco: remove páginas antigas que o crawl não trouxe
+            pages = rag.index_store.scan_pages(collection_path, {"pages": indexed_pages})
+            vectorstore, indexed_pages, added = rag.index_pages(
+                collection_name, collection_path, vectorstore, indexed_pages, pages
+            )
+            self.chunks_indexed += added
+            self._publish(collection_name, vectorstore, indexed_pages)
+
+        except Exception as e:
+            print(f"Erro ao indexar a coleção {collection_name}: {str(e)}")
+            errors.append(e)
+            # Esvazia a fila para não bloquear o crawl
+            while not finished:
+                finished = pages_queue.get() is None
+
+    def _publish(self, collection_name, vectorstore, indexed_pages, partial=False):
+        """
+        Salva o índice em disco e publica uma cópia somente leitura para as sessões.
+
+        Args:
+            collection_name (str): Nome da coleção
+            vectorstore (FAISS): Índice em construção (continua sendo alterado)
+            indexed_pages (dict): Páginas indexadas até agora
+            partial (bool): Publicação intermediária (usa o índice plano, sem
+                gerar HNSW/IVF a cada lote)
+        """
+        if vectorstore is None or vectorstore.index.ntotal == 0:
+            return
+        rag = self.rag_service
+        fingerprint = rag.save_index(collection_name, vectorstore, indexed_pages)
+        if fingerprint is None:
+            # Sem o índice em disco a indexação não pode ser dada como concluída
+            raise RuntimeError(f"Falha ao salvar o índice da coleção {collection_name}")
+
+        # A cópia lida do disco é independente do índice que continua em construção
+        snapshot = rag.index_store.load_search_index(
+            collection_name, rag.embeddings, index_type="flat" if partial else None
+        )
+        if snapshot is not None:
+            rag.registry.publish_index(collection_name, fingerprint, snapshot)
@@ -0,0 +1,420 @@
+"""
+Fila de Ingestões em Segundo Plano
+
+Este módulo executa os crawls e as reindexações fora das requisições da
+interface e da API. Os jobs ficam em um banco SQLite (data/jobs.sqlite) e
+são executados por um pool de threads; o progresso (páginas recebidas,
+páginas indexadas, chunks embedados e tempo estimado) é gravado no banco
+e pode ser consultado a qualquer momento com uma leitura simples. Jobs
+interrompidos por uma reinicialização voltam para a fila e são retomados:
+páginas já gravadas e chunks já indexados são reaproveitados.
+"""
+
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+from pathlib import Path
+
+from service.registry import get_registry
+
+# Banco dos jobs (padrão: data/jobs.sqlite)
+JOBS_DB_PATH = os.getenv("JOBS_DB_PATH", "data/jobs.sqlite")
+
+# Jobs executados ao mesmo tempo pelo processo (padrão: 2)
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))
+
+# Intervalo mínimo entre gravações do progresso de um job, em segundos (padrão: 1)
+JOB_PROGRESS_SECONDS = float(os.getenv("JOB_PROGRESS_SECONDS", "1"))
+
+# Tempo sem sinal de vida após o qual um job em execução é retomado, em segundos (padrão: 60)
+JOB_STALE_SECONDS = float(os.getenv("JOB_STALE_SECONDS", "60"))
+
+# Execuções interrompidas antes de o job ser marcado como falho (padrão: 3)
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "3"))
+
+# Tipos de job aceitos
+JOB_KINDS = ("scrape", "index")
+
+class JobQueue:
+    """
+    Fila persistente de ingestões com pool de execução.
+
+    Funcionalidades:
+    - Agenda crawls (scrape) e reindexações (index) de coleções
+    - Executa os jobs em threads de fundo, um por coleção de cada vez
+    - Grava o progresso e o tempo estimado, com gravações espaçadas
+    - Retoma jobs interrompidos (o sinal de vida deixa de ser atualizado)
+    - Compartilha a fila entre processos (Streamlit e API) pelo banco
+    """
+
+    def __init__(self, db_path=JOBS_DB_PATH, workers=JOB_WORKERS):
+        self.workers = workers
+        Path(db_path).parent.mkdir(parents=True, exist_ok=True)
+
+        # Identifica os jobs em execução neste processo
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}"
+
+        # Conexão única protegida por trava (compartilhada entre threads)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False, timeout=30, isolation_level=None)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS jobs (
+                id TEXT PRIMARY KEY,
+                kind TEXT NOT NULL,
+                collection TEXT NOT NULL,
+                params TEXT NOT NULL,
+                status TEXT NOT NULL,
+                progress TEXT,
+                result TEXT,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                worker TEXT,
+                heartbeat REAL,
+                created_at TEXT NOT NULL,
+                started_at TEXT,
+                finished_at TEXT
+            )
+            """
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs (status, created_at)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_collection ON jobs (collection, created_at)")
+
+        # Jobs em execução neste processo (recebem o sinal de vida)
+        self._running = set()
+
+        # Acorda os workers quando um job é agendado neste processo
+        self._wake = threading.Event()
+        self._threads = []
+
+    def start(self):
+        """
+        Inicia os workers e o sinal de vida dos jobs em execução.
+
+        Returns:
+            JobQueue: A própria fila
+        """
+        if self._threads:
+            return self
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._work, name=f"job-worker-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        thread = threading.Thread(target=self._heartbeat, name="job-heartbeat", daemon=True)
+        thread.start()
+        self._threads.append(thread)
+        return self
+
+    def submit(self, kind, collection_name, **params):
+        """
+        Agenda um job para uma coleção.
+
+        Se a coleção já tem um job na fila ou em execução, ele é retornado
+        no lugar de um novo.
+
+        Args:
+            kind (str): Tipo do job (scrape ou index)
+            collection_name (str): Nome da coleção
+            **params: Parâmetros do job (url e version, no caso de scrape)
+
+        Returns:
+            dict: Estado do job, com "created" indicando se é um job novo
+        """
+        if kind not in JOB_KINDS:
+            raise ValueError(f"Tipo de job inválido: {kind}")
+
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._conn.execute(
+                    "SELECT * FROM jobs WHERE collection = ? AND status IN ('queued', 'running')",
+                    (collection_name,)
+                ).fetchone()
+                created = row is None
+                if created:
+                    job_id = uuid.uuid4().hex
+                    self._conn.execute(
+                        "INSERT INTO jobs (id, kind, collection, params, status, progress, created_at) "
+                        "VALUES (?, ?, ?, ?, 'queued', '{}', ?)",
+                        (job_id, kind, collection_name, json.dumps(params, ensure_ascii=False), _now())
+                    )
+                    row = self._conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+        self._wake.set()
+        return dict(_to_job(row), created=created)
+
+    def get(self, job_id):
+        """
+        Retorna o estado e o progresso de um job.
+
+        Args:
+            job_id (str): Identificador do job
+
+        Returns:
+            dict: Estado do job, ou None se não existir
+        """
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return _to_job(row) if row else None
+
+    def list(self, limit=20, collection_name=None, active=False):
+        """
+        Lista os jobs mais recentes.
+
+        Args:
+            limit (int): Número máximo de jobs
+            collection_name (str): Apenas os jobs desta coleção (opcional)
+            active (bool): Apenas os jobs na fila ou em execução
+
+        Returns:
+            list: Estados dos jobs, do mais recente ao mais antigo
+        """
+        conditions, params = [], []
+        if collection_name:
+            conditions.append("collection = ?")
+            params.append(collection_name)
+        if active:
+            conditions.append("status IN ('queued', 'running')")
+        where = f" WHERE {' AND '.join(conditions)}" if conditions else ""
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT * FROM jobs{where} ORDER BY created_at DESC LIMIT ?", params + [limit]
+            ).fetchall()
+        return [_to_job(row) for row in rows]
+
+    def _work(self):
+        """
+        Laço de um worker: retoma jobs interrompidos e executa os da fila.
+        """
+        while True:
+            try:
+                self._recover()
+                job = self._claim()
+            except Exception as e:
+                print(f"Erro ao consultar a fila de jobs: {str(e)}")
+                job = None
+
+            if job is None:
+                # Sem jobs: espera um agendamento ou o próximo ciclo
+                self._wake.wait(JOB_STALE_SECONDS / 4)
+                self._wake.clear()
+                continue
+            self._run(job)
+
+    def _claim(self):
+        """
+        Reserva o job mais antigo da fila para este processo.
+
+        Coleções com um job já em execução ficam de fora, para que duas
+        ingestões da mesma coleção nunca rodem ao mesmo tempo.
+
+        Returns:
+            dict: Job reservado, ou None se a fila estiver vazia
+        """
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._conn.execute(
+                    """
+                    SELECT * FROM jobs WHERE status = 'queued' AND collection NOT IN (
+                        SELECT collection FROM jobs WHERE status = 'running'
+                    )
+                    ORDER BY created_at LIMIT 1
+                    """
+                ).fetchone()
+                if row is not None:
+                    self._conn.execute(
+                        "UPDATE jobs SET status = 'running', worker = ?, heartbeat = ?, attempts = attempts + 1, "
+                        "started_at = COALESCE(started_at, ?) WHERE id = ?",
+                        (self.worker_id, time.time(), _now(), row["id"])
+                    )
+                    row = self._conn.execute("SELECT * FROM jobs WHERE id = ?", (row["id"],)).fetchone()
+                    self._running.add(row["id"])
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        return _to_job(row) if row else None
+
+    def _recover(self):
+        """
+        Devolve à fila os jobs cujo processo parou de dar sinal de vida.
+
+        Jobs interrompidos JOB_MAX_ATTEMPTS vezes são marcados como falhos.
+        """
+        stale = time.time() - JOB_STALE_SECONDS
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                rows = self._conn.execute(
+                    "SELECT id, collection, attempts FROM jobs WHERE status = 'running' AND heartbeat < ?",
+                    (stale,)
+                ).fetchall()
+                for row in rows:
+                    if row["attempts"] >= JOB_MAX_ATTEMPTS:
+                        result = {"success": False, "error": f"Interrompido {row['attempts']} vezes"}
+                        self._conn.execute(
+                            "UPDATE jobs SET status = 'failed', result = ?, finished_at = ? WHERE id = ?",
+                            (json.dumps(result, ensure_ascii=False), _now(), row["id"])
+                        )
+                    else:
+                        self._conn.execute("UPDATE jobs SET status = 'queued', worker = NULL WHERE id = ?", (row["id"],))
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        for row in rows:
+            print(f"Job interrompido da coleção {row['collection']} devolvido à fila")
+
+    def _heartbeat(self):
+        """
+        Atualiza periodicamente o sinal de vida dos jobs em execução neste processo.
+        """
+        while True:
+            time.sleep(JOB_STALE_SECONDS / 4)
+            running = list(self._running)
+            if not running:
+                continue
+            try:
+                with self._lock:
+                    self._conn.executemany(
+                        "UPDATE jobs SET heartbeat = ? WHERE id = ? AND worker = ?",
+                        [(time.time(), job_id, self.worker_id) for job_id in running]
+                    )
+            except Exception as e:
+                print(f"Erro ao atualizar o sinal de vida dos jobs: {str(e)}")
+
+    def _run(self, job):
+        """
+        Executa um job, gravando o progresso e o resultado.
+
+        Args:
+            job (dict): Job reservado por este processo
+        """
+        started = time.monotonic()
+        last_write = 0.0
+
+        def on_progress(progress):
+            nonlocal last_write
+            # Grava no máximo a cada JOB_PROGRESS_SECONDS (chamado a cada página)
+            if time.monotonic() - last_write < JOB_PROGRESS_SECONDS:
+                return
+            last_write = time.monotonic()
+            self._update(job["id"], progress=_with_eta(progress, time.monotonic() - started))
+
+        try:
+            # Importado aqui: o pipeline carrega langchain, FAISS e o modelo
+            from service.ingest import StreamingIngest
+
+            ingest = StreamingIngest()
+            if job["kind"] == "scrape":
+                params = job["params"]
+                result = ingest.run(params["url"], job["collection"], params["version"], on_progress=on_progress)
+            else:
+                result = ingest.reindex(job["collection"], on_progress=on_progress)
+            progress = _with_eta(ingest.progress(), time.monotonic() - started)
+            status = "done" if result.get("success") else "failed"
+        except Exception as e:
+            print(f"Erro no job da coleção {job['collection']}: {str(e)}")
+            progress = None
+            result = {"success": False, "error": str(e)}
+            status = "failed"
+
+        self._update(job["id"], status=status, progress=progress, result=result, finished_at=_now())
+        self._running.discard(job["id"])
+
+    def _update(self, job_id, progress=None, **fields):
+        """
+        Grava o progresso e outros campos de um job deste processo.
+
+        Args:
+            job_id (str): Identificador do job
+            progress (dict): Progresso atual (opcional)
+            **fields: Demais colunas (status, result, finished_at)
+        """
+        if progress is not None:
+            fields["progress"] = progress
+        if "result" in fields:
+            fields["result"] = json.dumps(fields["result"], ensure_ascii=False)
+        if "progress" in fields:
+            fields["progress"] = json.dumps(fields["progress"], ensure_ascii=False)
+        fields["heartbeat"] = time.time()
+
+        assignments = ", ".join(f"{column} = ?" for column in fields)
+        try:
+            with self._lock:
+                # Um job devolvido à fila por outro processo não é mais deste worker
+                self._conn.execute(
+                    f"UPDATE jobs SET {assignments} WHERE id = ? AND worker = ?",
+                    list(fields.values()) + [job_id, self.worker_id]
+                )
+        except Exception as e:
+            print(f"Erro ao gravar o progresso do job {job_id}: {str(e)}")
+
+def _with_eta(progress, elapsed):
+    """
+    Acrescenta ao progresso o tempo estimado para concluir a indexação.
+
+    A estimativa usa a taxa de páginas indexadas até agora e o número de
+    páginas esperadas; sem essa informação, o tempo fica indefinido.
+
+    Args:
+        progress (dict): Progresso informado pela ingestão
+        elapsed (float): Segundos desde o início do job
+
+    Returns:
+        dict: Progresso com elapsed_seconds e eta_seconds (None se desconhecido)
+    """
+    progress = dict(progress)
+    indexed = progress.get("pages_indexed") or 0
+    total = progress.get("pages_total")
+    eta = None
+    if total and indexed:
+        eta = max(total - indexed, 0) * elapsed / indexed
+    progress["elapsed_seconds"] = round(elapsed, 1)
+    progress["eta_seconds"] = None if eta is None else round(eta, 1)
+    return progress
+
+def _to_job(row):
+    """
+    Converte uma linha da tabela de jobs em dicionário.
+
+    Args:
+        row (sqlite3.Row): Linha da tabela
+
+    Returns:
+        dict: Estado do job
+    """
+    job = dict(row)
+    job["params"] = json.loads(job["params"] or "{}")
+    job["progress"] = json.loads(job["progress"] or "{}")
+    job["result"] = json.loads(job["result"]) if job["result"] else None
+    return job
+
+def _now():
+    """
+    Retorna o instante atual em ISO 8601 (UTC).
+
+    Returns:
+        str: Data e hora atuais
+    """
+    return datetime.now(timezone.utc).isoformat()
+
+def get_job_queue():
+    """
+    Retorna a fila de jobs do processo, com os workers já iniciados.
+
+    Returns:
+        JobQueue: Fila compartilhada entre sessões
+    """
+    return get_registry().get_model("job_queue", lambda: JobQueue().start())
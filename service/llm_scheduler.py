@@ -0,0 +1,405 @@
+"""
+Agendador de Chamadas ao LLM
+
+Este módulo concentra todas as chamadas ao LLM do processo. Prompts
+idênticos em andamento ao mesmo tempo (várias pessoas fazendo a mesma
+pergunta) são atendidos por uma única chamada, cujos trechos são repassados
+a todos os interessados. As chamadas respeitam um limite de concorrência e
+as cotas de requisições e tokens por minuto da API, e erros transitórios
+(limite de taxa, falhas do servidor, conexão) são repetidos com backoff
+exponencial e jitter. As chamadas rodam em um event loop de segundo plano,
+atendendo tanto threads (Streamlit) quanto corrotinas (API HTTP).
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import random
+import threading
+import time
+
+from service.context import estimate_tokens
+from service.metrics import get_metrics
+from service.rate_limit import RateLimiter
+from service.registry import get_registry
+
+# Cotas da API do LLM (0 desativa o limite)
+LLM_REQUESTS_PER_MINUTE = int(os.getenv("LLM_REQUESTS_PER_MINUTE", "30"))
+LLM_TOKENS_PER_MINUTE = int(os.getenv("LLM_TOKENS_PER_MINUTE", "0"))
+
+# Chamadas simultâneas ao LLM no processo (padrão: 8)
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "8"))
+
+# Novas tentativas para erros transitórios e limites do backoff, em segundos
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "4"))
+LLM_RETRY_BASE_SECONDS = float(os.getenv("LLM_RETRY_BASE_SECONDS", "1"))
+LLM_RETRY_MAX_SECONDS = float(os.getenv("LLM_RETRY_MAX_SECONDS", "30"))
+
+# Status HTTP considerados transitórios
+RETRY_STATUS = {408, 409, 429, 500, 502, 503, 504}
+
+class LLMUnavailableError(Exception):
+    """
+    O LLM continuou indisponível (limite de taxa ou falha do servidor) após as novas tentativas.
+    """
+
+class _Flight:
+    """
+    Uma chamada ao LLM em andamento, compartilhada pelos pedidos do mesmo prompt.
+    """
+
+    def __init__(self):
+        self.chunks = []
+        self.done = False
+        self.error = None
+        self.subscribers = 1
+        self.wait_seconds = 0.0
+        self.llm_seconds = 0.0
+        self.task = None
+        # Notifica os interessados a cada trecho novo (no loop do agendador)
+        self.changed = asyncio.Condition()
+
+class LLMScheduler:
+    """
+    Despacho das chamadas ao LLM com coalescência, cotas e novas tentativas.
+
+    Funcionalidades:
+    - Une pedidos simultâneos do mesmo prompt (e do mesmo modelo) em uma única chamada
+    - Limita as chamadas simultâneas e respeita as cotas de requisições e tokens por minuto
+    - Repete erros transitórios com backoff exponencial e jitter (e o Retry-After da API)
+    - Oferece versões síncronas e assíncronas, com ou sem streaming
+    """
+
+    def __init__(
+        self,
+        requests_per_minute=LLM_REQUESTS_PER_MINUTE,
+        tokens_per_minute=LLM_TOKENS_PER_MINUTE,
+        max_concurrency=LLM_MAX_CONCURRENCY,
+        max_retries=LLM_MAX_RETRIES
+    ):
+        self.max_concurrency = max(1, max_concurrency)
+        self.max_retries = max_retries
+        self.request_limiter = RateLimiter(requests_per_minute)
+        self.token_limiter = RateLimiter(tokens_per_minute)
+        self.metrics = get_metrics()
+
+        # Event loop compartilhado por todos os agendadores: o cliente HTTP
+        # assíncrono do LLM reaproveita conexões apenas dentro de um mesmo loop
+        self.loop = get_registry().get_model("llm_scheduler_loop", _start_loop)
+
+        # Criados dentro do loop na primeira chamada
+        self._slots = None
+
+        # Chamadas em andamento por (modelo, prompt)
+        self._flights = {}
+
+    def invoke(self, llm, prompt, timings=None):
+        """
+        Gera a resposta completa de um prompt, bloqueando a thread.
+
+        Args:
+            llm (BaseChatModel): Modelo de chat
+            prompt (str): Prompt completo
+            timings (dict): Recebe wait_ms, llm_ms e coalesced (opcional)
+
+        Returns:
+            str: Resposta do LLM
+        """
+        return "".join(self.stream(llm, prompt, timings))
+
+    def stream(self, llm, prompt, timings=None):
+        """
+        Gera a resposta de um prompt aos poucos, bloqueando a thread a cada trecho.
+
+        Args:
+            llm (BaseChatModel): Modelo de chat
+            prompt (str): Prompt completo
+            timings (dict): Recebe wait_ms, llm_ms e coalesced (opcional)
+
+        Yields:
+            str: Trechos da resposta à medida que o LLM os gera
+        """
+        flight, coalesced = self._call(self._join(llm, prompt)).result()
+        try:
+            position = 0
+            while True:
+                chunks, done = self._call(self._next(flight, position)).result()
+                position += len(chunks)
+                yield from chunks
+                if done:
+                    break
+        finally:
+            self._call(self._leave(flight))
+        self._finish(flight, coalesced, timings)
+
+    async def ainvoke(self, llm, prompt, timings=None):
+        """
+        Versão assíncrona de invoke (pode ser usada em qualquer event loop).
+
+        Args:
+            llm (BaseChatModel): Modelo de chat
+            prompt (str): Prompt completo
+            timings (dict): Recebe wait_ms, llm_ms e coalesced (opcional)
+
+        Returns:
+            str: Resposta do LLM
+        """
+        return "".join([chunk async for chunk in self.astream(llm, prompt, timings)])
+
+    async def astream(self, llm, prompt, timings=None):
+        """
+        Versão assíncrona de stream (pode ser usada em qualquer event loop).
+
+        Args:
+            llm (BaseChatModel): Modelo de chat
+            prompt (str): Prompt completo
+            timings (dict): Recebe wait_ms, llm_ms e coalesced (opcional)
+
+        Yields:
+            str: Trechos da resposta à medida que o LLM os gera
+        """
+        flight, coalesced = await asyncio.wrap_future(self._call(self._join(llm, prompt)))
+        try:
+            position = 0
+            while True:
+                chunks, done = await asyncio.wrap_future(self._call(self._next(flight, position)))
+                position += len(chunks)
+                for chunk in chunks:
+                    yield chunk
+                if done:
+                    break
+        finally:
+            self._call(self._leave(flight))
+        self._finish(flight, coalesced, timings)
+
+    def _call(self, coroutine):
+        """
+        Agenda uma corrotina no loop do agendador.
+
+        Args:
+            coroutine (coroutine): Corrotina a executar
+
+        Returns:
+            concurrent.futures.Future: Resultado da corrotina
+        """
+        return asyncio.run_coroutine_threadsafe(coroutine, self.loop)
+
+    async def _join(self, llm, prompt):
+        """
+        Entra em uma chamada em andamento para o mesmo prompt ou inicia uma nova.
+
+        Args:
+            llm (BaseChatModel): Modelo de chat
+            prompt (str): Prompt completo
+
+        Returns:
+            tuple: (chamada, True se reaproveitou uma chamada em andamento)
+        """
+        key = (_model_key(llm), hashlib.sha256(prompt.encode("utf-8")).hexdigest())
+        flight = self._flights.get(key)
+        if flight is not None:
+            flight.subscribers += 1
+            self.metrics.increment("llm_calls", coalesced="true")
+            return flight, True
+
+        flight = _Flight()
+        self._flights[key] = flight
+        self.metrics.increment("llm_calls", coalesced="false")
+        asyncio.ensure_future(self._run(key, flight, llm, prompt))
+        return flight, False
+
+    async def _next(self, flight, position):
+        """
+        Aguarda trechos novos de uma chamada.
+
+        Args:
+            flight (_Flight): Chamada acompanhada
+            position (int): Trechos já entregues a este interessado
+
+        Returns:
+            tuple: (trechos novos, True se a chamada terminou)
+        """
+        async with flight.changed:
+            await flight.changed.wait_for(lambda: len(flight.chunks) > position or flight.done)
+        if len(flight.chunks) > position:
+            return flight.chunks[position:], False
+        if flight.error is not None:
+            raise flight.error
+        return [], True
+
+    async def _leave(self, flight):
+        """
+        Registra que um interessado deixou de acompanhar a chamada.
+
+        A chamada continua enquanto houver interessados; a última saída
+        antes do fim a cancela (ex.: o usuário fechou a página).
+
+        Args:
+            flight (_Flight): Chamada acompanhada
+        """
+        flight.subscribers -= 1
+        if flight.subscribers == 0 and not flight.done and flight.task is not None:
+            flight.task.cancel()
+
+    async def _run(self, key, flight, llm, prompt):
+        """
+        Executa a chamada ao LLM, com cotas e novas tentativas.
+
+        Uma nova tentativa só acontece antes do primeiro trecho: depois disso
+        os interessados já receberam parte da resposta.
+
+        Args:
+            key (tuple): Chave da chamada em andamento
+            flight (_Flight): Chamada a preencher
+            llm (BaseChatModel): Modelo de chat
+            prompt (str): Prompt completo
+        """
+        flight.task = asyncio.current_task()
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.max_concurrency)
+        started = time.perf_counter()
+        try:
+            for attempt in range(self.max_retries + 1):
+                waited = time.perf_counter()
+                # Aguarda as cotas antes de ocupar uma vaga: chamadas contidas
+                # pelo limite de taxa não seguram as vagas das demais
+                await self.request_limiter.acquire_async()
+                await self.token_limiter.acquire_async(estimate_tokens(prompt))
+                async with self._slots:
+                    flight.wait_seconds += time.perf_counter() - waited
+                    error = await self._stream_into(flight, llm, prompt)
+                if error is None:
+                    break
+
+                retry, delay = self._retry_delay(error, attempt)
+                if not retry:
+                    flight.error = error
+                    break
+                if flight.chunks:
+                    flight.error = LLMUnavailableError(f"O LLM interrompeu a resposta: {str(error)}")
+                    break
+                if attempt == self.max_retries:
+                    flight.error = LLMUnavailableError(
+                        f"LLM indisponível após {attempt + 1} tentativas "
+                        f"(limite de requisições ou falha do servidor): {str(error)}"
+                    )
+                    break
+                self.metrics.increment("llm_retries")
+                print(f"LLM indisponível (tentativa {attempt + 1}): {str(error)}; nova tentativa em {delay:.1f} s")
+                await asyncio.sleep(delay)
+        except asyncio.CancelledError:
+            flight.error = LLMUnavailableError("Chamada ao LLM cancelada")
+        finally:
+            flight.llm_seconds = time.perf_counter() - started - flight.wait_seconds
+            self.metrics.record("llm.wait", flight.wait_seconds)
+            self._flights.pop(key, None)
+            async with flight.changed:
+                flight.done = True
+                flight.changed.notify_all()
+
+    @staticmethod
+    async def _stream_into(flight, llm, prompt):
+        """
+        Faz uma tentativa de chamada, repassando cada trecho aos interessados.
+
+        Args:
+            flight (_Flight): Chamada a preencher
+            llm (BaseChatModel): Modelo de chat
+            prompt (str): Prompt completo
+
+        Returns:
+            Exception: Erro da tentativa, ou None se a resposta foi concluída
+        """
+        try:
+            async for chunk in llm.astream(prompt):
+                if chunk.content:
+                    async with flight.changed:
+                        flight.chunks.append(chunk.content)
+                        flight.changed.notify_all()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            return e
+        return None
+
+    @staticmethod
+    def _retry_delay(error, attempt):
+        """
+        Decide se um erro é transitório e quanto esperar antes de repetir.
+
+        Args:
+            error (Exception): Erro da chamada
+            attempt (int): Tentativa que falhou (a partir de 0)
+
+        Returns:
+            tuple: (True se deve repetir, espera em segundos)
+        """
+        response = getattr(error, "response", None)
+        status = getattr(error, "status_code", None) or getattr(response, "status_code", None)
+        transient = (
+            status in RETRY_STATUS
+            or isinstance(error, (TimeoutError, ConnectionError))
+            or any(name in type(error).__name__ for name in ("Timeout", "Connection", "RateLimit"))
+        )
+        delay = min(LLM_RETRY_MAX_SECONDS, LLM_RETRY_BASE_SECONDS * 2 ** attempt) * random.uniform(0.5, 1.5)
+
+        # Respeita o tempo indicado pela API, quando presente
+        headers = getattr(response, "headers", None) or {}
+        retry_after = headers.get("retry-after") if hasattr(headers, "get") else None
+        try:
+            delay = max(delay, min(LLM_RETRY_MAX_SECONDS, float(retry_after)))
+        except (TypeError, ValueError):
+            pass
+        return transient, delay
+
+    @staticmethod
+    def _finish(flight, coalesced, timings):
+        """
+        Preenche os tempos da chamada, se pedidos.
+
+        Args:
+            flight (_Flight): Chamada concluída
+            coalesced (bool): Se o pedido reaproveitou uma chamada em andamento
+            timings (dict): Dicionário a preencher, ou None
+        """
+        if timings is not None:
+            timings["wait_ms"] = round(flight.wait_seconds * 1000, 2)
+            timings["llm_ms"] = round(flight.llm_seconds * 1000, 2)
+            timings["coalesced"] = coalesced
+
+def _model_key(llm):
+    """
+    Identifica o modelo e seus parâmetros, para unir apenas chamadas equivalentes.
+
+    Args:
+        llm (BaseChatModel): Modelo de chat
+
+    Returns:
+        str: Identificador do modelo
+    """
+    try:
+        params = json.dumps(llm._identifying_params, sort_keys=True, default=str)
+    except Exception:
+        params = str(id(llm))
+    return f"{type(llm).__name__}:{params}"
+
+def _start_loop():
+    """
+    Inicia o event loop das chamadas ao LLM em uma thread daemon.
+
+    Returns:
+        asyncio.AbstractEventLoop: Loop em execução
+    """
+    loop = asyncio.new_event_loop()
+    threading.Thread(target=loop.run_forever, name="llm-scheduler", daemon=True).start()
+    return loop
+
+def get_llm_scheduler():
+    """
+    Retorna o agendador de chamadas ao LLM do processo.
+
+    Returns:
+        LLMScheduler: Agendador compartilhado entre sessões
+    """
+    return get_registry().get_model("llm_scheduler", LLMScheduler)
@@ -0,0 +1,264 @@
+"""
+Métricas e Tempos por Etapa
+
+Este módulo implementa a instrumentação do pipeline: spans que medem a
+duração de cada etapa (busca, montagem do prompt, chamada ao LLM, crawl,
+gravação de páginas...), contadores e o agrupamento dos spans de uma
+operação (trace), usado no painel de depuração do chat. Os spans são
+exportados em JSONL e agregados em histogramas, expostos em um endpoint
+HTTP no formato do Prometheus.
+"""
+
+import json
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+# Arquivo JSONL com um span por linha (vazio desativa a exportação)
+METRICS_JSONL_PATH = os.getenv("METRICS_JSONL_PATH", "data/metrics/spans.jsonl")
+
+# Porta do endpoint /metrics no formato Prometheus (padrão: 0 = desativado)
+METRICS_PORT = int(os.getenv("METRICS_PORT", "0"))
+
+# Limites dos buckets dos histogramas, em segundos
+HISTOGRAM_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+class Trace:
+    """
+    Spans de uma única operação (ex.: uma resposta do chat).
+
+    Funcionalidades:
+    - Acumula os spans registrados na thread enquanto o trace está ativo
+    - Resume a duração de cada etapa
+    """
+
+    def __init__(self):
+        self.id = uuid.uuid4().hex[:16]
+        self.spans = []
+
+    def summary(self):
+        """
+        Resume as etapas do trace, somando spans repetidos.
+
+        Returns:
+            list: Dicionários {"stage", "ms", "count"} na ordem da primeira ocorrência
+        """
+        stages = {}
+        for name, seconds in self.spans:
+            stage = stages.setdefault(name, {"stage": name, "ms": 0.0, "count": 0})
+            stage["ms"] += seconds * 1000
+            stage["count"] += 1
+        for stage in stages.values():
+            stage["ms"] = round(stage["ms"], 2)
+        return list(stages.values())
+
+class Metrics:
+    """
+    Registro de spans, histogramas e contadores do processo.
+
+    Funcionalidades:
+    - Mede etapas com spans (gerenciador de contexto) ou durações já medidas
+    - Exporta cada span em JSONL
+    - Agrega durações em histogramas e contadores para o Prometheus
+    - Agrupa os spans de uma operação em um trace
+    """
+
+    def __init__(self, jsonl_path=METRICS_JSONL_PATH):
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+        # (nome, rótulos) -> [contagens por bucket, soma, total]
+        self._histograms = {}
+        # (nome, rótulos) -> valor
+        self._counters = {}
+
+        self._jsonl = None
+        if jsonl_path:
+            Path(jsonl_path).parent.mkdir(parents=True, exist_ok=True)
+            self._jsonl = open(jsonl_path, "a", encoding="utf-8")
+
+    @contextmanager
+    def span(self, name, **labels):
+        """
+        Mede a duração do bloco como uma etapa.
+
+        Args:
+            name (str): Nome da etapa (ex.: "query.retrieval")
+            **labels: Rótulos adicionais (ex.: collection="Firecrawl")
+        """
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - started, **labels)
+
+    def record(self, name, seconds, **labels):
+        """
+        Registra a duração de uma etapa medida pelo chamador.
+
+        Args:
+            name (str): Nome da etapa
+            seconds (float): Duração em segundos
+            **labels: Rótulos adicionais
+        """
+        traces = getattr(self._local, "traces", None)
+        trace = traces[-1] if traces else None
+        if trace is not None:
+            trace.spans.append((name, seconds))
+
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = [[0] * len(HISTOGRAM_BUCKETS), 0.0, 0]
+            for i, bound in enumerate(HISTOGRAM_BUCKETS):
+                if seconds <= bound:
+                    histogram[0][i] += 1
+            histogram[1] += seconds
+            histogram[2] += 1
+
+            if self._jsonl is not None:
+                entry = {"ts": round(time.time(), 6), "span": name, "duration_ms": round(seconds * 1000, 3)}
+                if trace is not None:
+                    entry["trace"] = trace.id
+                entry.update(labels)
+                self._jsonl.write(json.dumps(entry, ensure_ascii=False) + "\n")
+                self._jsonl.flush()
+
+    def increment(self, name, amount=1, **labels):
+        """
+        Incrementa um contador.
+
+        Args:
+            name (str): Nome do contador (ex.: "scrape_pages")
+            amount (float): Valor a somar
+            **labels: Rótulos adicionais
+        """
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + amount
+
+    @contextmanager
+    def trace(self):
+        """
+        Agrupa os spans registrados nesta thread enquanto o bloco é executado.
+
+        Yields:
+            Trace: Trace com os spans da operação
+        """
+        trace = Trace()
+        traces = getattr(self._local, "traces", None)
+        if traces is None:
+            traces = self._local.traces = []
+        traces.append(trace)
+        try:
+            yield trace
+        finally:
+            traces.remove(trace)
+
+    def render_prometheus(self):
+        """
+        Gera as métricas no formato de exposição do Prometheus.
+
+        Returns:
+            str: Texto com histogramas e contadores
+        """
+        lines = [
+            "# HELP askthedocs_stage_duration_seconds Duração das etapas do pipeline",
+            "# TYPE askthedocs_stage_duration_seconds histogram"
+        ]
+        with self._lock:
+            for (name, labels), (buckets, total, count) in sorted(self._histograms.items()):
+                base = _format_labels((("stage", name),) + labels)
+                for bound, bucket_count in zip(HISTOGRAM_BUCKETS, buckets):
+                    bucket_labels = _format_labels((("stage", name),) + labels + (("le", str(bound)),))
+                    lines.append(f"askthedocs_stage_duration_seconds_bucket{bucket_labels} {bucket_count}")
+                inf_labels = _format_labels((("stage", name),) + labels + (("le", "+Inf"),))
+                lines.append(f"askthedocs_stage_duration_seconds_bucket{inf_labels} {count}")
+                lines.append(f"askthedocs_stage_duration_seconds_sum{base} {total}")
+                lines.append(f"askthedocs_stage_duration_seconds_count{base} {count}")
+
+            for name in sorted({name for name, _ in self._counters}):
+                lines.append(f"# TYPE askthedocs_{name}_total counter")
+                for (counter_name, labels), value in sorted(self._counters.items()):
+                    if counter_name == name:
+                        lines.append(f"askthedocs_{name}_total{_format_labels(labels)} {value}")
+        return "\n".join(lines) + "\n"
+
+def _format_labels(labels):
+    """
+    Formata rótulos no padrão do Prometheus.
+
+    Args:
+        labels (tuple): Pares (nome, valor)
+
+    Returns:
+        str: Rótulos entre chaves, ou vazio se não houver
+    """
+    if not labels:
+        return ""
+    escaped = (
+        f'{key}="{str(value).replace(chr(92), chr(92) * 2).replace(chr(34), chr(92) + chr(34))}"'
+        for key, value in labels
+    )
+    return "{" + ",".join(escaped) + "}"
+
+def start_metrics_server(metrics, port, host="0.0.0.0"):
+    """
+    Inicia o endpoint /metrics em uma thread de fundo.
+
+    Args:
+        metrics (Metrics): Registro de métricas exposto
+        port (int): Porta HTTP
+        host (str): Endereço de escuta
+
+    Returns:
+        ThreadingHTTPServer: Servidor iniciado
+    """
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, format, *args):
+            pass
+
+        def do_GET(self):
+            if self.path.split("?")[0] != "/metrics":
+                self.send_response(404)
+                self.end_headers()
+                return
+            payload = metrics.render_prometheus().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    threading.Thread(target=server.serve_forever, name="metrics-server", daemon=True).start()
+    print(f"Métricas disponíveis em http://{host}:{port}/metrics")
+    return server
+
+_metrics = None
+_metrics_lock = threading.Lock()
+
+def get_metrics():
+    """
+    Retorna o registro de métricas do processo, criando-o na primeira chamada.
+
+    Se METRICS_PORT estiver configurada, também inicia o endpoint /metrics.
+
+    Returns:
+        Metrics: Registro compartilhado por todos os serviços
+    """
+    global _metrics
+    with _metrics_lock:
+        if _metrics is None:
+            _metrics = Metrics()
+            if METRICS_PORT:
+                try:
+                    start_metrics_server(_metrics, METRICS_PORT)
+                except OSError as e:
+                    print(f"Erro ao iniciar o endpoint de métricas: {str(e)}")
+        return _metrics
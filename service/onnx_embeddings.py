@@ -0,0 +1,182 @@
+"""
+Embeddings com ONNX Runtime
+
+Este módulo implementa um backend de embeddings para CPU usando o modelo
+exportado para ONNX com pesos quantizados em int8 (tools/export_onnx.py).
+A inferência roda no ONNX Runtime com um número fixo de threads, sem
+carregar o PyTorch, e o pooling (média dos tokens e normalização) segue o
+do sentence-transformers. O modelo só é usado se a exportação validou seus
+vetores contra os do PyTorch dentro da tolerância configurada.
+"""
+
+import json
+import os
+import re
+from importlib.util import find_spec
+from pathlib import Path
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+# Backend dos embeddings: torch (sentence-transformers) ou onnx (padrão: torch)
+EMBEDDINGS_BACKEND = os.getenv("EMBEDDINGS_BACKEND", "torch").lower()
+
+# Diretório dos modelos exportados (padrão: data/models)
+ONNX_MODELS_PATH = os.getenv("ONNX_MODELS_PATH", "data/models")
+
+# Threads do ONNX Runtime por processo (padrão: 0 = uma por núcleo de CPU)
+ONNX_THREADS = int(os.getenv("ONNX_THREADS", "0"))
+
+# Similaridade de cosseno mínima entre os vetores ONNX e PyTorch (padrão: 0.99)
+ONNX_MIN_SIMILARITY = float(os.getenv("ONNX_MIN_SIMILARITY", "0.99"))
+
+# Textos por inferência (limita o padding e a memória por chamada)
+ONNX_BATCH_SIZE = 64
+
+# Arquivos do modelo exportado
+ONNX_MODEL_FILE = "model.int8.onnx"
+ONNX_TOKENIZER_FILE = "tokenizer.json"
+ONNX_CONFIG_FILE = "export.json"
+
+def onnx_model_dir(model_name):
+    """
+    Retorna o diretório do modelo ONNX exportado de um modelo de embeddings.
+
+    Args:
+        model_name (str): Nome do modelo sentence-transformers
+
+    Returns:
+        Path: Diretório do modelo exportado
+    """
+    return Path(ONNX_MODELS_PATH) / (re.sub(r"[^\w.-]+", "_", model_name) + "-onnx-int8")
+
+def onnx_model_ready(model_name):
+    """
+    Verifica se o backend ONNX pode ser usado para um modelo.
+
+    Exige o ONNX Runtime instalado e um modelo exportado cuja validação
+    contra o PyTorch passou na tolerância atual. Não carrega o modelo.
+
+    Args:
+        model_name (str): Nome do modelo sentence-transformers
+
+    Returns:
+        tuple: (True se pode ser usado, motivo quando não pode)
+    """
+    if find_spec("onnxruntime") is None or find_spec("tokenizers") is None:
+        return False, "onnxruntime e tokenizers não estão instalados"
+
+    config_file = onnx_model_dir(model_name) / ONNX_CONFIG_FILE
+    try:
+        with open(config_file, "r", encoding="utf-8") as f:
+            config = json.load(f)
+    except (OSError, ValueError):
+        return False, f"modelo não exportado (python tools/export_onnx.py {model_name})"
+
+    validation = config.get("validation") or {}
+    if config.get("model") != model_name or validation.get("min_similarity", 0) < ONNX_MIN_SIMILARITY:
+        return False, f"validação abaixo da tolerância ({validation.get('min_similarity')} < {ONNX_MIN_SIMILARITY})"
+    return True, None
+
+class OnnxEmbeddings(Embeddings):
+    """
+    Modelo de embeddings quantizado executado no ONNX Runtime.
+
+    Funcionalidades:
+    - Carrega o modelo int8 e o tokenizer exportados, sem PyTorch
+    - Usa um número fixo de threads (sem disputar núcleos com outros processos)
+    - Reproduz o pré-processamento e o pooling do sentence-transformers
+    - Implementa a interface de embeddings do LangChain
+    """
+
+    def __init__(self, model_dir, threads=ONNX_THREADS, batch_size=ONNX_BATCH_SIZE):
+        # Importados aqui: só carregam quando o backend ONNX é usado
+        import onnxruntime
+        from tokenizers import Tokenizer
+
+        model_dir = Path(model_dir)
+        with open(model_dir / ONNX_CONFIG_FILE, "r", encoding="utf-8") as f:
+            self.config = json.load(f)
+        self.batch_size = max(1, batch_size)
+
+        # Tokenizer com truncamento no comprimento do modelo e padding pelo maior texto do lote
+        self.tokenizer = Tokenizer.from_file(str(model_dir / ONNX_TOKENIZER_FILE))
+        self.tokenizer.enable_truncation(max_length=self.config["max_length"])
+        self.tokenizer.enable_padding(pad_id=self.config.get("pad_id", 0), pad_token=self.config.get("pad_token", "[PAD]"))
+
+        # Sessão com orçamento fixo de threads: paralelismo dentro de cada operação
+        options = onnxruntime.SessionOptions()
+        options.intra_op_num_threads = threads or os.cpu_count() or 1
+        options.inter_op_num_threads = 1
+        options.execution_mode = onnxruntime.ExecutionMode.ORT_SEQUENTIAL
+        options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self.session = onnxruntime.InferenceSession(
+            str(model_dir / ONNX_MODEL_FILE), options, providers=["CPUExecutionProvider"]
+        )
+        self.input_names = {item.name for item in self.session.get_inputs()}
+
+    def embed_documents(self, texts):
+        """
+        Calcula os embeddings de uma lista de textos.
+
+        Args:
+            texts (list): Textos a serem embedados
+
+        Returns:
+            list: Um vetor (lista de floats) por texto
+        """
+        return self.encode(texts).tolist()
+
+    def embed_query(self, text):
+        """
+        Calcula o embedding de uma pergunta.
+
+        Args:
+            text (str): Pergunta
+
+        Returns:
+            list: Vetor da pergunta
+        """
+        return self.encode([text])[0].tolist()
+
+    def encode(self, texts):
+        """
+        Calcula os embeddings de uma lista de textos em lotes.
+
+        Args:
+            texts (list): Textos a serem embedados
+
+        Returns:
+            np.ndarray: Matriz float32 com um vetor por texto
+        """
+        if not texts:
+            return np.zeros((0, self.config["dimension"]), dtype=np.float32)
+        # Mesmo pré-processamento do HuggingFaceEmbeddings, para vetores equivalentes
+        texts = [text.replace("\n", " ") for text in texts]
+        batches = [texts[start:start + self.batch_size] for start in range(0, len(texts), self.batch_size)]
+        return np.concatenate([self._encode_batch(batch) for batch in batches])
+
+    def _encode_batch(self, texts):
+        """
+        Executa o modelo em um lote e aplica o pooling.
+
+        Args:
+            texts (list): Textos do lote
+
+        Returns:
+            np.ndarray: Matriz float32 com um vetor por texto
+        """
+        encodings = self.tokenizer.encode_batch(texts)
+        inputs = {
+            "input_ids": np.array([e.ids for e in encodings], dtype=np.int64),
+            "attention_mask": np.array([e.attention_mask for e in encodings], dtype=np.int64),
+            "token_type_ids": np.array([e.type_ids for e in encodings], dtype=np.int64),
+        }
+        hidden = self.session.run(None, {name: value for name, value in inputs.items() if name in self.input_names})[0]
+
+        # Média dos tokens, ignorando o padding
+        mask = inputs["attention_mask"][:, :, None].astype(np.float32)
+        vectors = (hidden * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+        if self.config.get("normalize", True):
+            vectors /= np.clip(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12, None)
+        return vectors.astype(np.float32)
@@ -6,14 +6,93 @@ com geração de texto para responder perguntas sobre documentação.
 Utiliza embeddings para encontrar contexto relevante e um LLM para gerar respostas.
 """
 
+import asyncio
+import hashlib
 import os
-from langchain_community.document_loaders import DirectoryLoader, TextLoader
-from langchain_huggingface import HuggingFaceEmbeddings
+import time
+from concurrent.futures import ThreadPoolExecutor
+from langchain_core.documents import Document
 from langchain_community.vectorstores import FAISS
 from langchain.text_splitter import RecursiveCharacterTextSplitter
 from langchain_groq import ChatGroq
-from langchain.chains import RetrievalQA
 from langchain.prompts import PromptTemplate
+from dotenv import load_dotenv
+
+# Carrega o .env antes de ler as configurações abaixo
+load_dotenv()
+
+from service.answer_cache import AnswerCache
+from service.catalog import get_catalog
+from service.collection_store import VersionedCollection, open_collection, split_version
+from service.context import CONTEXT_CANDIDATES, ContextPacker, estimate_tokens
+from service.dedup import DEDUP_THRESHOLD, ChunkDeduplicator
+from service.embedding_cache import EmbeddingCache
+from service.embedding_pipeline import EmbeddingPipeline
+from service.index_store import IndexStore
+from service.llm_scheduler import get_llm_scheduler
+from service.metrics import get_metrics
+from service.onnx_embeddings import EMBEDDINGS_BACKEND, OnnxEmbeddings, onnx_model_dir, onnx_model_ready
+from service.registry import get_registry
+
+# Configurações do pipeline (podem ser sobrescritas via .env)
+EMBEDDINGS_MODEL = os.getenv("EMBEDDINGS_MODEL", "all-MiniLM-L6-v2")
+LLM_MODEL = os.getenv("LLM_MODEL", "openai/gpt-oss-20b")
+CHUNK_SIZE = int(os.getenv("CHUNK_SIZE", "1000"))
+CHUNK_OVERLAP = int(os.getenv("CHUNK_OVERLAP", "200"))
+SEARCH_K = int(os.getenv("SEARCH_K", "3"))
+
+# Endereço alternativo da API do LLM (padrão: a API do Groq; ex.: tools/fake_llm.py)
+LLM_API_URL = os.getenv("LLM_API_URL") or None
+
+# Busca híbrida: candidatos por índice e peso da busca vetorial frente à BM25
+SEARCH_FETCH_K = int(os.getenv("SEARCH_FETCH_K", "20"))
+HYBRID_ALPHA = float(os.getenv("HYBRID_ALPHA", "0.5"))
+
+# Buscas simultâneas em índices de coleções diferentes, somando todas as sessões (padrão: 8)
+SEARCH_WORKERS = int(os.getenv("SEARCH_WORKERS", "8"))
+
+# Pool compartilhado pelas buscas em várias coleções (FAISS e numpy liberam o GIL)
+_search_pool = ThreadPoolExecutor(max_workers=SEARCH_WORKERS, thread_name_prefix="search")
+
+def _select_embeddings_backend():
+    """
+    Escolhe o backend dos embeddings a partir de EMBEDDINGS_BACKEND.
+
+    O backend ONNX só é usado se o modelo exportado existir e tiver sido
+    validado contra o PyTorch; caso contrário, volta ao PyTorch.
+
+    Returns:
+        str: "torch" ou "onnx"
+    """
+    if EMBEDDINGS_BACKEND != "onnx":
+        return "torch"
+    ready, reason = onnx_model_ready(EMBEDDINGS_MODEL)
+    if not ready:
+        print(f"Backend ONNX indisponível ({reason}); usando PyTorch")
+        return "torch"
+    return "onnx"
+
+def _load_embeddings(backend="torch"):
+    """
+    Carrega o modelo de embeddings.
+
+    O import fica aqui para que o HuggingFace (e o PyTorch) só seja carregado
+    quando o modelo for de fato usado.
+
+    Args:
+        backend (str): "torch" (sentence-transformers) ou "onnx" (int8, ONNX Runtime)
+
+    Returns:
+        Embeddings: Modelo de embeddings
+    """
+    if backend == "onnx":
+        return OnnxEmbeddings(onnx_model_dir(EMBEDDINGS_MODEL))
+
+    from langchain_huggingface import HuggingFaceEmbeddings
+
+    return HuggingFaceEmbeddings(
+        model_name=EMBEDDINGS_MODEL  # Modelo leve e eficiente
+    )
 
 class RAGService:
     """
@@ -21,93 +100,573 @@ class RAGService:
     
     Funcionalidades:
     - Carrega documentos de uma coleção
-    - Cria embeddings usando HuggingFace
-    - Constrói índice vetorial com FAISS
+    - Cria embeddings usando HuggingFace (PyTorch ou ONNX int8 na CPU)
+    - Descarta chunks repetidos (menus, rodapés) antes do embedding
+    - Constrói índice vetorial com FAISS e índice lexical BM25 (persistidos em disco)
+    - Escolhe o tipo do índice de busca (plano, HNSW, IVF-PQ...) por coleção
+    - Combina busca vetorial e lexical (busca híbrida)
+    - Pesquisa várias coleções em paralelo para uma mesma pergunta
+    - Monta um contexto enxuto (chunks unidos, sem repetições) dentro de um orçamento de tokens
     - Responde perguntas usando contexto relevante
+    - Versões assíncronas das respostas para servidores HTTP
+    - Une perguntas idênticas simultâneas em uma única chamada ao LLM, com cotas e novas tentativas
+    - Mede o tempo de cada etapa da indexação e das respostas
     """
     
     def __init__(self):
+        # Registro compartilhado de modelos e índices entre sessões
+        self.registry = get_registry()
+
         # Modelo de embeddings para representação semântica dos documentos
-        self.embeddings = HuggingFaceEmbeddings(
-            model_name="all-MiniLM-L6-v2"  # Modelo leve e eficiente
+        # (uma única instância por processo; PyTorch ou ONNX int8)
+        self.embeddings_backend = self.registry.get_model("embeddings_backend", _select_embeddings_backend)
+        model_key = EMBEDDINGS_MODEL if self.embeddings_backend == "torch" else f"{EMBEDDINGS_MODEL}:{self.embeddings_backend}"
+        self.embeddings = self.registry.get_model(
+            f"embeddings:{model_key}", lambda: _load_embeddings(self.embeddings_backend)
+        )
+
+        # Cache de embeddings por conteúdo, compartilhado entre coleções
+        self.embedding_cache = self.registry.get_model("embedding_cache", EmbeddingCache)
+
+        # Pipeline de indexação: cache, lotes por tamanho e múltiplos processos
+        self.embedding_pipeline = EmbeddingPipeline(
+            self.embeddings, EMBEDDINGS_MODEL, self.embedding_cache, backend=self.embeddings_backend
         )
 
         # LLM para geração de respostas (Groq API)
         self.llm = ChatGroq(
             groq_api_key=os.getenv("GROQ_API_KEY"),
-            model_name="openai/gpt-oss-20b"  # Modelo otimizado para velocidade
+            model_name=LLM_MODEL,  # Modelo otimizado para velocidade
+            base_url=LLM_API_URL,
+            max_retries=0          # As novas tentativas ficam com o agendador
         )
 
+        # Despacho das chamadas ao LLM: coalescência, cotas e novas tentativas (compartilhado)
+        self.llm_scheduler = get_llm_scheduler()
+
         # Divisor de texto para criar chunks de tamanho adequado
         self.text_splitter = RecursiveCharacterTextSplitter(
-            chunk_size=1000,      # Tamanho máximo de cada chunk
-            chunk_overlap=200,    # Sobreposição entre chunks para contexto
+            chunk_size=CHUNK_SIZE,        # Tamanho máximo de cada chunk
+            chunk_overlap=CHUNK_OVERLAP,  # Sobreposição entre chunks para contexto
+            add_start_index=True,         # Posição na página (une chunks vizinhos no contexto)
         )
 
-        # Armazena o índice vetorial e a cadeia de perguntas-respostas
-        self.vectorstore = None
-        self.qa_chain = None
+        # Montagem do contexto: filtro de relevância, união de chunks e orçamento de tokens
+        self.context_packer = ContextPacker(max_overlap=CHUNK_OVERLAP)
+
+        # Índices FAISS persistidos por coleção
+        self.index_store = IndexStore()
+
+        # Spans de tempo por etapa e tempos da última resposta (painel de depuração)
+        self.metrics = get_metrics()
+        self.last_timings = []
+
+        # Detectores de chunks repetidos por coleção em indexação
+        self._deduplicators = {}
 
-    def load_collection(self, collection_name):
+        # Template para o prompt do LLM
+        template = """
+            Você é um assistente de documentação. Use o contexto fornecido para responder à pergunta do usuário.
+            Se você não souber a resposta, diga que não sabe.
+            Não tente inventar uma resposta. Se você não souber, diga que não sabe.
+
+            Contexto: {context}
+            
+            Pergunta: {question}
+        """
+
+        self.prompt = PromptTemplate(
+            template=template,
+            input_variables=["context", "question"]
+        )
+
+        # Cache semântico de respostas, compartilhado entre sessões
+        self.answer_cache = self.registry.get_model("answer_cache", AnswerCache)
+
+        # Coleções carregadas: nome -> (versão, índice de busca somente leitura)
+        self.indexes = {}
+
+        # Versão da documentação pesquisada em cada coleção carregada (None se não versionada)
+        self.collection_versions = {}
+
+        # Identificação das coleções carregadas e de suas versões (chave do cache de respostas)
+        self.collection_name = None
+        self.index_version = None
+
+        # Os três acima em uma única tupla (índices, nome, versão), trocada de uma
+        # vez: cada pergunta lê o conjunto uma só vez, mesmo com refresh simultâneo
+        self._state = ({}, None, None)
+
+    def load_collection(self, collection_name, index_type=None):
         """
         Carrega uma coleção de documentos e prepara o sistema RAG.
         
         Args:
             collection_name (str): Nome da coleção a ser carregada
+            index_type (str): Fixa o tipo do índice de busca da coleção
+                (flat, flat_fp16, hnsw, ivf_fp16, ivf_pq ou auto); por padrão
+                mantém o tipo já fixado ou escolhe pelo tamanho da coleção
             
         Returns:
             bool: True se carregou com sucesso, False caso contrário
         """
-        collection_path = f"data/collections/{collection_name}"
+        return self.load_collections([collection_name], index_type)
 
-        # Carrega todos os arquivos .md da coleção
-        loader = DirectoryLoader(
-            collection_path, 
-            glob="**.md", 
-            loader_cls=TextLoader, 
-            loader_kwargs={"encoding": "utf-8"}
-        )
+    def load_collections(self, collection_names, index_type=None):
+        """
+        Carrega várias coleções para serem pesquisadas juntas.
 
-        documents = loader.load()
+        Cada pergunta busca em todas as coleções em paralelo e o contexto
+        mais relevante entre elas é enviado ao LLM em uma única chamada.
 
-        if not documents:
-            return False
+        Args:
+            collection_names (list): Nomes das coleções (ex.: framework e plugins),
+                opcionalmente com a versão (ex.: "Firecrawl@v2"; sem versão, a atual)
+            index_type (str): Fixa o tipo do índice de busca das coleções (opcional)
 
-        # Divide os documentos em chunks menores para melhor processamento
-        texts = self.text_splitter.split_documents(documents)
+        Returns:
+            bool: True se todas carregaram com sucesso, False caso contrário
+        """
+        indexes = {}
+        versions = {}
+        for collection_name in dict.fromkeys(collection_names):
+            resolved = self._resolve_version(collection_name)
+            if resolved is None:
+                return False
+            name, version = resolved
 
-        # Cria o índice vetorial usando FAISS
-        self.vectorstore = FAISS.from_documents(texts, self.embeddings)
+            # Um novo tipo de índice invalida o índice de busca carregado
+            if index_type and self.index_store.set_index_type(name, index_type):
+                self.registry.evict(name)
 
-        # Template para o prompt do LLM
-        template = """
-            Você é um assistente de documentação. Use o contexto fornecido para responder à pergunta do usuário.
-            Se você não souber a resposta, diga que não sabe.
-            Não tente inventar uma resposta. Se você não souber, diga que não sabe.
+            # Durante uma ingestão em streaming, usa o índice parcial mais recente
+            if self.registry.is_ingesting(name):
+                index_version, index = self.registry.latest_index(name)
+                if index is not None and version is not None:
+                    index_version, index = self._version_index(name, version, index_version, index)
+            else:
+                index_version, index = self._get_index(name, version, index_type)
+            if index is None:
+                return False
+            indexes[collection_name] = (index_version, index)
+            versions[collection_name] = version
 
-            Contexto: {context}
-            
-            Pergunta: {question}
+        if not indexes:
+            return False
+        self._set_indexes(indexes)
+        self.collection_versions = versions
+        return True
+
+    def refresh(self):
         """
+        Passa a usar a versão mais recente do índice das coleções carregadas.
 
-        prompt = PromptTemplate(
-            template=template,
-            input_variables=["context", "question"]
-        )
+        Permite que uma coleção em ingestão fique pesquisável progressivamente.
 
-        # Cria a cadeia de perguntas-respostas
-        self.qa_chain = RetrievalQA.from_chain_type(
-            llm=self.llm,
-            chain_type="stuff",
-            retriever=self.vectorstore.as_retriever(search_kwargs={"k": 3}),  # Busca 3 chunks mais relevantes
-            chain_type_kwargs={"prompt": prompt}
-        )
+        Returns:
+            bool: True se algum índice foi trocado por uma versão mais nova
+        """
+        indexes = dict(self.indexes)
+        versions = dict(self.collection_versions)
+        for collection_name, (_, index) in self.indexes.items():
+            # Sem versão no nome, acompanha também a troca da versão atual da coleção
+            resolved = self._resolve_version(collection_name)
+            if resolved is None:
+                continue
+            name, version = resolved
+            index_version, latest = self.registry.latest_index(name)
+            if latest is None:
+                continue
+
+            # Fora de uma ingestão, um manifesto diferente do índice em memória indica que
+            # outro processo reindexou a coleção: recarrega em vez de reaproveitar o antigo
+            fingerprint = self.index_store.manifest_fingerprint(name)
+            if not self.registry.is_ingesting(name) and fingerprint not in (None, index_version):
+                index_version, latest = self._get_index(name, version)
+            elif version is None:
+                if latest is index:
+                    continue
+            elif latest is index.base and version == self.collection_versions.get(collection_name):
+                continue
+            else:
+                index_version, latest = self._version_index(name, version, index_version, latest)
 
+            # Sem visão para a versão (ainda não indexada), mantém o índice atual
+            if latest is None:
+                continue
+            indexes[collection_name] = (index_version, latest)
+            versions[collection_name] = version
+
+        if indexes == self.indexes:
+            return False
+        self._set_indexes(indexes)
+        self.collection_versions = versions
         return True
 
+    def _set_indexes(self, indexes):
+        """
+        Define as coleções carregadas e a chave usada no cache de respostas.
+
+        Args:
+            indexes (dict): Nome da coleção -> (versão, índice de busca)
+        """
+        self.indexes = indexes
+        names = list(indexes)
+        versions = [indexes[name][0] or "" for name in names]
+        self.collection_name = "+".join(names)
+        # Uma única coleção mantém a própria versão; várias combinam as versões
+        if len(names) == 1:
+            self.index_version = versions[0]
+        else:
+            self.index_version = hashlib.sha256("\0".join(versions).encode("utf-8")).hexdigest()
+        self._state = (indexes, self.collection_name, self.index_version)
+
+    def open_index(self, collection_name, manifest=None):
+        """
+        Abre o índice salvo de uma coleção para atualização.
+
+        O índice só é aproveitado se foi gerado com as configurações atuais;
+        caso contrário a coleção será reindexada do zero.
+
+        Args:
+            collection_name (str): Nome da coleção
+            manifest (dict): Manifesto já lido, se disponível
+
+        Returns:
+            tuple: (índice FAISS ou None, páginas indexadas segundo o manifesto)
+        """
+        manifest = manifest or self.index_store.read_manifest(collection_name)
+        if not manifest or manifest.get("settings") != self._index_settings():
+            return None, {}
+        vectorstore = self.index_store.load(collection_name, self.embeddings)
+        if vectorstore is None:
+            return None, {}
+        return vectorstore, manifest.get("pages", {})
+
+    def index_pages(self, collection_name, collection_path, vectorstore, indexed_pages, pages):
+        """
+        Atualiza um índice para refletir as páginas dadas, embedando apenas chunks novos.
+
+        Páginas com o mesmo hash de alguma já indexada (com o mesmo nome ou
+        não, como a mesma página em outra versão) reaproveitam seus chunks; as
+        demais são divididas novamente e apenas os chunks inéditos são embedados.
+        Chunks que são cópias exatas ou aproximadas de outros já indexados
+        (menus, rodapés) não são embedados: a página passa a referenciar o
+        chunk original. Chunks que não são mais referenciados por nenhuma
+        página são removidos.
+
+        Args:
+            collection_name (str): Nome da coleção
+            collection_path (str): Diretório da coleção
+            vectorstore (FAISS): Índice a ser atualizado, ou None para criar um novo
+            indexed_pages (dict): Páginas já presentes no índice (formato do manifesto)
+            pages (dict): Páginas que o índice deve refletir (IndexStore.scan_pages)
+
+        Returns:
+            tuple: (índice atualizado ou None, páginas indexadas, número de chunks novos)
+        """
+        indexed_ids = {cid for page in indexed_pages.values() for cid in page["chunks"]}
+        new_chunks = {}
+        manifest_pages = {}
+        dedup = self._get_deduplicator(collection_name, vectorstore)
+        duplicates = 0
+        split_time = dedup_time = 0.0
+
+        # Conteúdos já indexados com outro nome (ex.: a mesma página em outra versão)
+        indexed_hashes = {page["hash"]: page["chunks"] for page in indexed_pages.values()}
+
+        changed = []
+        for name, page in pages.items():
+            previous = indexed_pages.get(name)
+            if previous and previous["hash"] == page["hash"]:
+                manifest_pages[name] = dict(page, chunks=previous["chunks"])
+            elif page["hash"] in indexed_hashes:
+                manifest_pages[name] = dict(page, chunks=indexed_hashes[page["hash"]])
+            else:
+                changed.append(name)
+
+        # Páginas novas ou alteradas: lidas (e descomprimidas) em paralelo e divididas novamente em chunks
+        collection = open_collection(collection_path)
+        loop_started = time.perf_counter()
+        for name, content in collection.iter_read(changed):
+            started = time.perf_counter()
+            chunks = self.text_splitter.split_documents(
+                [Document(page_content=content, metadata={"source": collection.source(name)})]
+            )
+            split_time += time.perf_counter() - started
+
+            started = time.perf_counter()
+            chunk_ids = []
+            for chunk in chunks:
+                chunk_id = self.index_store.chunk_id(chunk.page_content)
+                if chunk_id not in indexed_ids and chunk_id not in new_chunks:
+                    # Cópia de um chunk já indexado: referencia o original
+                    canonical, exact_key, signature = dedup.find(chunk.page_content)
+                    if canonical is not None:
+                        duplicates += 1
+                        chunk_id = canonical
+                    else:
+                        dedup.add(chunk_id, exact_key, signature)
+                        new_chunks[chunk_id] = chunk
+                chunk_ids.append(chunk_id)
+            manifest_pages[name] = dict(pages[name], chunks=list(dict.fromkeys(chunk_ids)))
+            dedup_time += time.perf_counter() - started
+
+        # Mantém a ordem das páginas no manifesto
+        manifest_pages = {name: manifest_pages[name] for name in pages}
+
+        read_time = time.perf_counter() - loop_started - split_time - dedup_time
+        self.metrics.record("index.read", read_time, collection=collection_name)
+        self.metrics.record("index.split", split_time, collection=collection_name)
+        self.metrics.record("index.dedup", dedup_time, collection=collection_name)
+
+        referenced_ids = {cid for page in manifest_pages.values() for cid in page["chunks"]}
+        stale_ids = list(indexed_ids - referenced_ids)
+
+        if vectorstore is not None and stale_ids:
+            with self.metrics.span("index.delete", collection=collection_name):
+                vectorstore.delete(stale_ids)
+        dedup.remove(stale_ids)
+        with self.metrics.span("index.embed", collection=collection_name):
+            vectorstore = self._embed_chunks(vectorstore, new_chunks)
+
+        if new_chunks or stale_ids:
+            cache_stats = self.embedding_cache.stats()
+            print(
+                f"Índice {collection_name}: {len(new_chunks)} chunks novos, {len(stale_ids)} removidos, "
+                f"{duplicates} cópias descartadas "
+                f"(cache de embeddings: {cache_stats['hits']} acertos, {cache_stats['misses']} falhas)"
+            )
+        return vectorstore, manifest_pages, len(new_chunks)
+
+    def save_index(self, collection_name, vectorstore, indexed_pages, index_type=None):
+        """
+        Salva o índice de uma coleção (vetorial e BM25) com o manifesto das páginas indexadas.
+
+        Args:
+            collection_name (str): Nome da coleção
+            vectorstore (FAISS): Índice vetorial
+            indexed_pages (dict): Páginas indexadas (formato do manifesto)
+            index_type (str): Tipo do índice de busca a fixar (padrão: mantém o atual)
+
+        Returns:
+            str: Impressão digital do conteúdo salvo, ou None se o salvamento falhou
+        """
+        settings = self._index_settings()
+        fingerprint = self.index_store.compute_fingerprint(indexed_pages, settings)
+        manifest = {
+            "fingerprint": fingerprint,
+            "settings": settings,
+            "pages": indexed_pages
+        }
+        if index_type:
+            manifest["index_type"] = index_type
+        with self.metrics.span("index.save", collection=collection_name):
+            saved = self.index_store.save(collection_name, vectorstore, manifest, self._deduplicators.get(collection_name))
+        return fingerprint if saved else None
+
+    def _get_index(self, collection_name, version=None, index_type=None):
+        """
+        Retorna o índice compartilhado de uma coleção, atualizando-o se necessário.
+
+        Todas as versões de uma coleção versionada ficam em um único índice,
+        que compartilha os chunks iguais entre versões; cada versão é
+        pesquisada por uma visão restrita às suas páginas.
+
+        Args:
+            collection_name (str): Nome da coleção
+            version (str): Versão pesquisada, em coleções versionadas (opcional)
+            index_type (str): Tipo do índice de busca (opcional)
+
+        Returns:
+            tuple: (impressão digital, índice), ou (None, None) se não houver conteúdo
+        """
+        fingerprint, index = self._get_collection_index(collection_name, index_type)
+        if index is None or version is None:
+            return fingerprint, index
+        return self._version_index(collection_name, version, fingerprint, index)
+
+    def _get_collection_index(self, collection_name, index_type=None):
+        """
+        Retorna o índice de todas as páginas de uma coleção, atualizando-o se necessário.
+
+        Args:
+            collection_name (str): Nome da coleção
+            index_type (str): Tipo do índice de busca (opcional)
+
+        Returns:
+            tuple: (impressão digital, índice), ou (None, None) se não houver conteúdo
+        """
+        collection_path = f"data/collections/{collection_name}"
+
+        # Identifica o conteúdo atual da coleção e as configurações do índice
+        manifest = self.index_store.read_manifest(collection_name)
+        pages = self.index_store.scan_pages(collection_path, manifest)
+        if not pages:
+            return None, None
+        fingerprint = self.index_store.compute_fingerprint(pages, self._index_settings())
+
+        def load_index():
+            # Reaproveita o índice salvo se nada mudou desde a última indexação
+            if manifest and manifest.get("fingerprint") == fingerprint:
+                with self.metrics.span("index.load", collection=collection_name):
+                    index = self.index_store.load_search_index(collection_name, self.embeddings, index_type=index_type)
+                if index is not None:
+                    return index
+
+            # Caso contrário, atualiza incrementalmente (ou reconstrói) o índice
+            vectorstore, indexed_pages = self.open_index(collection_name, manifest)
+            vectorstore, indexed_pages, _ = self.index_pages(
+                collection_name, collection_path, vectorstore, indexed_pages, pages
+            )
+            if vectorstore is None or vectorstore.index.ntotal == 0:
+                return None
+            self.save_index(collection_name, vectorstore, indexed_pages, index_type)
+            with self.metrics.span("index.load", collection=collection_name):
+                return self.index_store.load_search_index(collection_name, self.embeddings, vectorstore, index_type)
+
+        # O índice é compartilhado entre sessões e carregado uma única vez por processo
+        return fingerprint, self.registry.get_index(collection_name, fingerprint, load_index)
+
+    def _version_index(self, collection_name, version, fingerprint, index):
+        """
+        Retorna a visão do índice de uma coleção restrita a uma versão.
+
+        A visão é criada uma vez por índice carregado e manifesto e guardada
+        no índice; um manifesto novo (outra indexação) gera uma nova visão.
+
+        Args:
+            collection_name (str): Nome da coleção
+            version (str): Versão da documentação
+            fingerprint (str): Impressão digital do índice da coleção
+            index (CollectionIndex): Índice de todas as versões
+
+        Returns:
+            tuple: (impressão digital da versão, visão), ou (None, None) se a versão não foi indexada
+        """
+        manifest_fingerprint = self.index_store.manifest_fingerprint(collection_name)
+        key = (manifest_fingerprint, version)
+        view = index.views.get(key)
+        if view is None:
+            collection = open_collection(f"data/collections/{collection_name}")
+            manifest = self.index_store.read_manifest(collection_name) or {}
+            pages = manifest.get("pages", {})
+            version_pages = {name: page for name, page in pages.items() if name.rpartition("/")[0] == version}
+            if not version_pages:
+                return None, None
+            hashes = {collection.source(name): page["hash"] for name, page in pages.items()}
+            # Guarda pela impressão digital do manifesto efetivamente lido
+            key = (manifest.get("fingerprint"), version)
+            view = index.views[key] = index.restrict(version_pages, collection.source, hashes)
+        if key[0] in (None, fingerprint):
+            return f"{fingerprint}:{version}", view
+        # Visão de um manifesto mais novo que o índice (troca em andamento)
+        return f"{fingerprint}:{key[0]}:{version}", view
+
+    def _resolve_version(self, collection_name):
+        """
+        Identifica a coleção e a versão pesquisada a partir do nome.
+
+        Sem versão no nome, coleções versionadas usam a versão atual do
+        catálogo. Coleções não versionadas só aceitam a própria versão.
+
+        Args:
+            collection_name (str): Nome da coleção, opcionalmente com a versão ("Firecrawl@v2")
+
+        Returns:
+            tuple: (nome da coleção, versão ou None se a coleção não é versionada),
+                ou None se a versão pedida não existe
+        """
+        name, version = split_version(collection_name)
+        collection = open_collection(f"data/collections/{name}")
+        current = (get_catalog().get(name) or {}).get("version")
+        if not isinstance(collection, VersionedCollection):
+            return (name, None) if version is None or version == current else None
+
+        versions = collection.versions()
+        if version is None:
+            version = current if current in versions else (versions[-1] if versions else None)
+        return (name, version) if version in versions else None
+
+    def _index_settings(self):
+        """
+        Retorna as configurações que, se alteradas, exigem reconstruir o índice.
+
+        Returns:
+            dict: Modelo de embeddings e parâmetros do divisor de texto
+        """
+        settings = {
+            "embeddings_model": EMBEDDINGS_MODEL,
+            "chunk_size": CHUNK_SIZE,
+            "chunk_overlap": CHUNK_OVERLAP,
+            "dedup_threshold": DEDUP_THRESHOLD,
+        }
+        # Vetores quantizados não se misturam aos do PyTorch no mesmo índice
+        # (o backend padrão fica de fora para manter os índices existentes válidos)
+        if self.embeddings_backend != "torch":
+            settings["embeddings_backend"] = self.embeddings_backend
+        return settings
+
+    def _get_deduplicator(self, collection_name, vectorstore):
+        """
+        Retorna o detector de chunks repetidos de uma coleção em indexação.
+
+        O detector acompanha o índice entre lotes; se não corresponder aos
+        chunks do índice, é carregado do disco ou reconstruído a partir dele.
+
+        Args:
+            collection_name (str): Nome da coleção
+            vectorstore (FAISS): Índice que será atualizado, ou None se novo
+
+        Returns:
+            ChunkDeduplicator: Detector com os chunks do índice
+        """
+        total = vectorstore.index.ntotal if vectorstore is not None else 0
+        dedup = self._deduplicators.get(collection_name)
+        if dedup is None or len(dedup) != total:
+            if vectorstore is None:
+                dedup = ChunkDeduplicator()
+            else:
+                dedup = self.index_store.load_dedup(collection_name)
+                if dedup is None or len(dedup) != total:
+                    dedup = ChunkDeduplicator.from_vectorstore(vectorstore)
+            self._deduplicators[collection_name] = dedup
+        return dedup
+
+    def _embed_chunks(self, vectorstore, chunks):
+        """
+        Embeda chunks e os adiciona ao índice à medida que cada lote fica pronto.
+
+        Args:
+            vectorstore (FAISS): Índice existente, ou None para criar um novo
+            chunks (dict): Identificador do chunk -> Document
+
+        Returns:
+            FAISS: Índice com os chunks adicionados (None se não havia índice nem chunks)
+        """
+        chunk_ids = list(chunks)
+        documents = list(chunks.values())
+        texts = [doc.page_content for doc in documents]
+
+        for positions, vectors in self.embedding_pipeline.iter_embeddings(texts):
+            text_embeddings = [(texts[i], vector) for i, vector in zip(positions, vectors)]
+            metadatas = [documents[i].metadata for i in positions]
+            ids = [chunk_ids[i] for i in positions]
+
+            if vectorstore is None:
+                vectorstore = FAISS.from_embeddings(text_embeddings, self.embeddings, metadatas=metadatas, ids=ids)
+            else:
+                vectorstore.add_embeddings(text_embeddings, metadatas=metadatas, ids=ids)
+
+        return vectorstore
+
     def ask_question(self, question):
         """
         Responde uma pergunta usando o sistema RAG.
+
+        Perguntas muito parecidas com outras já respondidas para a mesma
+        versão da coleção são atendidas pelo cache, sem chamar o LLM. O tempo
+        de cada etapa fica disponível em last_timings.
         
         Args:
             question (str): Pergunta do usuário
@@ -115,16 +674,244 @@ class RAGService:
         Returns:
             str: Resposta gerada pelo sistema
         """
-        if not self.qa_chain:
+        indexes, collection_name, index_version = self._state
+        if not indexes:
             return "Nenhuma coleção carregada"
         
+        with self.metrics.trace() as trace:
+            try:
+                with self.metrics.span("query.total"):
+                    embedding, cached = self._lookup_answer(question, collection_name, index_version)
+                    if cached is not None:
+                        return cached
+
+                    # Busca o contexto relevante e gera a resposta completa
+                    prompt = self._prepare_prompt(question, embedding, indexes)
+                    with self.metrics.span("query.llm"):
+                        answer = self.llm_scheduler.invoke(self.llm, prompt)
+                    with self.metrics.span("query.cache_store"):
+                        self.answer_cache.store(collection_name, index_version, question, embedding, answer)
+                    return answer
+            except Exception as e:
+                return f"Erro ao responder a pergunta: {str(e)}"
+            finally:
+                self.last_timings = trace.summary()
+
+    def stream_question(self, question):
+        """
+        Responde uma pergunta usando o sistema RAG, entregando a resposta aos poucos.
+
+        Respostas vindas do cache semântico são entregues de uma só vez. O
+        tempo de cada etapa fica disponível em last_timings ao final.
+
+        Args:
+            question (str): Pergunta do usuário
+
+        Yields:
+            str: Trechos da resposta à medida que o LLM os gera
+        """
+        indexes, collection_name, index_version = self._state
+        if not indexes:
+            yield "Nenhuma coleção carregada"
+            return
+
+        with self.metrics.trace() as trace:
+            try:
+                with self.metrics.span("query.total"):
+                    embedding, cached = self._lookup_answer(question, collection_name, index_version)
+                    if cached is not None:
+                        yield cached
+                        return
+
+                    prompt = self._prepare_prompt(question, embedding, indexes)
+                    parts = []
+                    # Inclui o tempo de exibição de cada trecho por quem consome o gerador
+                    with self.metrics.span("query.llm"):
+                        started = time.perf_counter()
+                        for chunk in self.llm_scheduler.stream(self.llm, prompt):
+                            if not parts:
+                                self.metrics.record("query.llm_first_token", time.perf_counter() - started)
+                            parts.append(chunk)
+                            yield chunk
+
+                    # Só guarda respostas completas (sem erro no meio do streaming)
+                    with self.metrics.span("query.cache_store"):
+                        self.answer_cache.store(collection_name, index_version, question, embedding, "".join(parts))
+            except Exception as e:
+                yield f"Erro ao responder a pergunta: {str(e)}"
+            finally:
+                self.last_timings = trace.summary()
+
+    async def aask_question(self, question, executor=None):
+        """
+        Versão assíncrona de ask_question.
+
+        Args:
+            question (str): Pergunta do usuário
+            executor (Executor): Pool onde rodam as etapas de CPU (padrão: pool do loop)
+
+        Returns:
+            str: Resposta gerada pelo sistema
+        """
+        return "".join([part async for part in self.astream_question(question, executor)])
+
+    async def astream_question(self, question, executor=None):
+        """
+        Versão assíncrona de stream_question.
+
+        As etapas que usam CPU (embedding da pergunta, cache e busca) rodam no
+        pool dado, e a chamada ao LLM é assíncrona, sem ocupar uma thread
+        enquanto aguarda a resposta.
+
+        Args:
+            question (str): Pergunta do usuário
+            executor (Executor): Pool onde rodam as etapas de CPU (padrão: pool do loop)
+
+        Yields:
+            str: Trechos da resposta à medida que o LLM os gera
+        """
+        # Fixa os índices e a chave do cache caso as coleções sejam atualizadas
+        # (refresh de outra requisição) durante a resposta
+        indexes, collection_name, index_version = self._state
+        if not indexes:
+            yield "Nenhuma coleção carregada"
+            return
+
+        loop = asyncio.get_running_loop()
         try:
-            # Usa a cadeia RAG para buscar contexto e gerar resposta
-            result = self.qa_chain.invoke({"query": question})
+            embedding, cached = await loop.run_in_executor(
+                executor, self._lookup_answer, question, collection_name, index_version
+            )
+            if cached is not None:
+                yield cached
+                return
+
+            prompt = await loop.run_in_executor(executor, self._prepare_prompt, question, embedding, indexes)
+            parts = []
+            with self.metrics.span("query.llm"):
+                async for chunk in self.llm_scheduler.astream(self.llm, prompt):
+                    parts.append(chunk)
+                    yield chunk
 
-            # Extrai a resposta do resultado
-            if isinstance(result, dict):
-                return result.get("result") or result.get("output_text") or str(result)
-            return result
+            await loop.run_in_executor(
+                executor, self.answer_cache.store,
+                collection_name, index_version, question, embedding, "".join(parts)
+            )
         except Exception as e:
-            return f"Erro ao responder a pergunta: {str(e)}"
\ No newline at end of file
+            yield f"Erro ao responder a pergunta: {str(e)}"
+
+    def _lookup_answer(self, question, collection_name, index_version):
+        """
+        Embeda a pergunta e procura uma resposta equivalente no cache semântico.
+
+        Args:
+            question (str): Pergunta do usuário
+            collection_name (str): Coleções consultadas (chave do cache)
+            index_version (str): Versão dos índices consultados (chave do cache)
+
+        Returns:
+            tuple: (embedding da pergunta, resposta em cache ou None)
+        """
+        with self.metrics.span("query.embed"):
+            embedding = self.embeddings.embed_query(question)
+        with self.metrics.span("query.cache_lookup"):
+            cached = self.answer_cache.lookup(collection_name, index_version, embedding)
+        self.metrics.increment("answers", cache="hit" if cached is not None else "miss")
+        return embedding, cached
+
+    def _prepare_prompt(self, question, embedding, indexes=None):
+        """
+        Busca o contexto relevante e monta o prompt do LLM.
+
+        Args:
+            question (str): Pergunta do usuário
+            embedding (list): Embedding da pergunta
+            indexes (dict): Coleções pesquisadas (padrão: as carregadas)
+
+        Returns:
+            str: Prompt completo
+        """
+        with self.metrics.span("query.retrieval"):
+            results = self._retrieve(question, embedding, indexes)
+        with self.metrics.span("query.context"):
+            documents = self.context_packer.pack(results)
+        with self.metrics.span("query.prompt"):
+            return self._build_prompt(question, documents)
+
+    def _retrieve(self, question, embedding, indexes=None):
+        """
+        Busca os chunks mais relevantes para uma pergunta (busca híbrida).
+
+        Com várias coleções carregadas, os índices são pesquisados em paralelo
+        e os resultados são combinados pela pontuação de relevância.
+
+        Args:
+            question (str): Pergunta do usuário
+            embedding (list): Embedding da pergunta
+            indexes (dict): Coleções pesquisadas (padrão: as carregadas)
+
+        Returns:
+            list: Pares (Document, relevância) candidatos ao contexto, do mais para o menos relevante
+        """
+        k = max(SEARCH_K, CONTEXT_CANDIDATES)
+
+        def search(item):
+            collection_name, index = item
+            with self.metrics.span("query.search", collection=collection_name):
+                return index.search(question, embedding, k, SEARCH_FETCH_K, HYBRID_ALPHA)
+
+        indexes = [(name, index) for name, (_, index) in (indexes or self.indexes).items()]
+        if len(indexes) == 1:
+            results = search(indexes[0])
+        else:
+            results = [item for found in _search_pool.map(search, indexes) for item in found]
+            results.sort(key=lambda item: item[1], reverse=True)
+        return results[:k]
+
+    def retrieve_batch(self, questions, embeddings):
+        """
+        Busca os chunks mais relevantes para várias perguntas de uma vez.
+
+        Cada índice recebe todas as perguntas em uma única busca k-NN
+        vetorizada; com várias coleções, os índices são pesquisados em paralelo.
+
+        Args:
+            questions (list): Perguntas
+            embeddings (list): Embeddings das perguntas, na mesma ordem
+
+        Returns:
+            list: Para cada pergunta, os pares (Document, relevância) candidatos ao contexto
+        """
+        k = max(SEARCH_K, CONTEXT_CANDIDATES)
+
+        def search(item):
+            collection_name, index = item
+            with self.metrics.span("query.search_batch", collection=collection_name):
+                return index.search_batch(questions, embeddings, k, SEARCH_FETCH_K, HYBRID_ALPHA)
+
+        indexes = [(name, index) for name, (_, index) in self.indexes.items()]
+        results = [[] for _ in questions]
+        for found in _search_pool.map(search, indexes):
+            for merged, items in zip(results, found):
+                merged.extend(items)
+
+        documents = []
+        for merged in results:
+            merged.sort(key=lambda item: item[1], reverse=True)
+            documents.append(merged[:k])
+        return documents
+
+    def _build_prompt(self, question, documents):
+        """
+        Monta o prompt do LLM com o contexto recuperado.
+
+        Args:
+            question (str): Pergunta do usuário
+            documents (list): Trechos do contexto (ContextPacker.pack)
+
+        Returns:
+            str: Prompt completo
+        """
+        context = "\n\n".join(doc.page_content for doc in documents)
+        self.metrics.increment("context_tokens", estimate_tokens(context))
+        return self.prompt.format(context=context, question=question)
@@ -0,0 +1,76 @@
+"""
+Limitador de Taxa
+
+Este módulo implementa um limitador de taxa do tipo token bucket, usado
+para respeitar os limites de requisições das APIs externas. Pode ser usado
+tanto por threads (acquire) quanto por corrotinas asyncio (acquire_async).
+"""
+
+import asyncio
+import threading
+import time
+
+class RateLimiter:
+    """
+    Limitador de taxa por token bucket.
+
+    Funcionalidades:
+    - Libera até `rate_per_minute` unidades por minuto, com rajadas de até `burst`
+      (padrão: a cota de um minuto inteiro, como as janelas das APIs)
+    - Reserva as unidades na ordem de chegada (quem chega depois espera mais)
+    - Compartilhável entre threads e corrotinas
+    """
+
+    def __init__(self, rate_per_minute, burst=None):
+        # Taxa em unidades por segundo (0 desativa o limite)
+        self.rate = rate_per_minute / 60.0
+        # Após um período ocioso, a cota do minuto fica disponível de uma vez
+        self.capacity = burst or max(1.0, float(rate_per_minute))
+        self._tokens = self.capacity
+        self._updated_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self, amount=1):
+        """
+        Reserva unidades e informa quanto tempo esperar antes de usá-las.
+
+        Args:
+            amount (float): Quantidade de unidades (ex.: 1 requisição, N tokens)
+
+        Returns:
+            float: Tempo de espera em segundos (0 se disponível imediatamente)
+        """
+        if self.rate <= 0:
+            return 0.0
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated_at) * self.rate)
+            self._updated_at = now
+
+            # O saldo pode ficar negativo: a dívida define a espera dos próximos
+            self._tokens -= amount
+            if self._tokens >= 0:
+                return 0.0
+            return -self._tokens / self.rate
+
+    def acquire(self, amount=1):
+        """
+        Aguarda (bloqueando a thread) até as unidades estarem disponíveis.
+
+        Args:
+            amount (float): Quantidade de unidades
+        """
+        wait = self.reserve(amount)
+        if wait > 0:
+            time.sleep(wait)
+
+    async def acquire_async(self, amount=1):
+        """
+        Aguarda (sem bloquear o event loop) até as unidades estarem disponíveis.
+
+        Args:
+            amount (float): Quantidade de unidades
+        """
+        wait = self.reserve(amount)
+        if wait > 0:
+            await asyncio.sleep(wait)
@@ -0,0 +1,236 @@
+"""
+Registro de Recursos Compartilhados
+
+Este módulo implementa um registro único por processo para os recursos
+pesados do sistema RAG. Todas as sessões do Streamlit compartilham a mesma
+instância do modelo de embeddings e o mesmo índice de busca (somente leitura)
+de cada coleção, com descarte LRU quando o orçamento de memória é excedido.
+"""
+
+import os
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+
+# Orçamento de memória para índices carregados (padrão: 1024 MB)
+INDEX_MEMORY_BUDGET_MB = int(os.getenv("INDEX_MEMORY_BUDGET_MB", "1024"))
+
+class ResourceRegistry:
+    """
+    Registro de modelos e índices compartilhados entre sessões.
+
+    Funcionalidades:
+    - Mantém uma única instância de cada modelo de embeddings
+    - Mantém um único índice carregado por coleção e versão de conteúdo
+    - Garante que cada recurso é carregado uma única vez, mesmo com acessos simultâneos
+    - Descarta os índices menos usados quando o orçamento de memória é excedido
+    """
+
+    def __init__(self, memory_budget_mb=INDEX_MEMORY_BUDGET_MB):
+        self.memory_budget = memory_budget_mb * 1024 * 1024
+
+        # Modelos de embeddings por nome
+        self._models = {}
+
+        # Índices por (coleção, impressão digital), em ordem de uso (LRU)
+        self._indexes = OrderedDict()
+        self._sizes = {}
+
+        # Coleções com ingestão em andamento (contador por coleção)
+        self._ingesting = {}
+
+        # Trava global para as estruturas e travas por chave para carregamentos
+        self._lock = threading.Lock()
+        self._key_locks = {}
+
+    def get_model(self, name, factory):
+        """
+        Retorna o modelo registrado com o nome dado, criando-o se necessário.
+
+        Args:
+            name (str): Identificador do modelo
+            factory (callable): Função sem argumentos que cria o modelo
+
+        Returns:
+            object: Instância compartilhada do modelo
+        """
+        with self._key_lock(("model", name)):
+            model = self._models.get(name)
+            if model is None:
+                model = factory()
+                with self._lock:
+                    self._models[name] = model
+            return model
+
+    def get_index(self, collection_name, fingerprint, loader):
+        """
+        Retorna o índice compartilhado de uma coleção, carregando-o se necessário.
+
+        O índice retornado é compartilhado entre sessões e não deve ser alterado.
+        Ao registrar uma nova versão da coleção, as versões anteriores são descartadas.
+
+        Args:
+            collection_name (str): Nome da coleção
+            fingerprint (str): Impressão digital do conteúdo indexado
+            loader (callable): Função sem argumentos que carrega ou constrói o índice
+
+        Returns:
+            CollectionIndex: Índice da coleção, ou None se o carregamento falhou
+        """
+        key = (collection_name, fingerprint)
+        with self._key_lock(("index", collection_name)):
+            with self._lock:
+                if key in self._indexes:
+                    self._indexes.move_to_end(key)
+                    return self._indexes[key]
+
+            index = loader()
+            if index is None:
+                return None
+
+            self.publish_index(collection_name, fingerprint, index)
+            return index
+
+    def publish_index(self, collection_name, fingerprint, index):
+        """
+        Registra uma nova versão do índice de uma coleção, substituindo as anteriores.
+
+        Args:
+            collection_name (str): Nome da coleção
+            fingerprint (str): Impressão digital do conteúdo indexado
+            index (CollectionIndex): Índice que não será mais alterado por quem o publicou
+        """
+        key = (collection_name, fingerprint)
+        with self._lock:
+            for old_key in [k for k in self._indexes if k[0] == collection_name]:
+                self._remove(old_key)
+            self._indexes[key] = index
+            self._sizes[key] = index.memory_size()
+            self._evict()
+
+    def latest_index(self, collection_name):
+        """
+        Retorna o índice registrado mais recentemente para uma coleção.
+
+        Args:
+            collection_name (str): Nome da coleção
+
+        Returns:
+            tuple: (impressão digital, índice), ou (None, None) se a coleção não estiver carregada
+        """
+        with self._lock:
+            for key in reversed(self._indexes):
+                if key[0] == collection_name:
+                    return key[1], self._indexes[key]
+        return None, None
+
+    @contextmanager
+    def ingesting(self, collection_name):
+        """
+        Marca uma coleção como em ingestão enquanto o bloco é executado.
+
+        Durante a ingestão as sessões usam o índice parcial publicado mais
+        recente, em vez de reindexar a coleção por conta própria.
+
+        Args:
+            collection_name (str): Nome da coleção
+        """
+        with self._lock:
+            self._ingesting[collection_name] = self._ingesting.get(collection_name, 0) + 1
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._ingesting[collection_name] -= 1
+                if not self._ingesting[collection_name]:
+                    del self._ingesting[collection_name]
+
+    def is_ingesting(self, collection_name):
+        """
+        Indica se uma coleção está sendo ingerida neste processo.
+
+        Args:
+            collection_name (str): Nome da coleção
+
+        Returns:
+            bool: True se há uma ingestão em andamento
+        """
+        with self._lock:
+            return collection_name in self._ingesting
+
+    def evict(self, collection_name):
+        """
+        Remove do registro todos os índices carregados de uma coleção.
+
+        Args:
+            collection_name (str): Nome da coleção
+        """
+        with self._lock:
+            for key in [k for k in self._indexes if k[0] == collection_name]:
+                self._remove(key)
+
+    def stats(self):
+        """
+        Retorna estatísticas de uso do registro.
+
+        Returns:
+            dict: Modelos e índices carregados e memória estimada em bytes
+        """
+        with self._lock:
+            return {
+                "models": list(self._models),
+                "indexes": [name for name, _ in self._indexes],
+                "memory_bytes": sum(self._sizes.values()),
+                "memory_budget_bytes": self.memory_budget
+            }
+
+    def _key_lock(self, key):
+        """
+        Retorna a trava dedicada a uma chave, criando-a se necessário.
+
+        Args:
+            key (tuple): Chave do recurso
+
+        Returns:
+            threading.Lock: Trava da chave
+        """
+        with self._lock:
+            return self._key_locks.setdefault(key, threading.Lock())
+
+    def _remove(self, key):
+        """
+        Remove um índice do registro (a trava global deve estar adquirida).
+
+        Args:
+            key (tuple): Chave do índice
+        """
+        self._indexes.pop(key, None)
+        self._sizes.pop(key, None)
+
+    def _evict(self):
+        """
+        Descarta os índices menos usados até caber no orçamento de memória.
+
+        O índice usado mais recentemente nunca é descartado. Sessões que ainda
+        referenciam um índice descartado continuam funcionando normalmente.
+        """
+        while len(self._indexes) > 1 and sum(self._sizes.values()) > self.memory_budget:
+            key, _ = self._indexes.popitem(last=False)
+            self._sizes.pop(key, None)
+            print(f"Índice descartado do registro: {key[0]}")
+
+_registry = None
+_registry_lock = threading.Lock()
+
+def get_registry():
+    """
+    Retorna o registro de recursos do processo, criando-o na primeira chamada.
+
+    Returns:
+        ResourceRegistry: Registro compartilhado por todas as sessões
+    """
+    global _registry
+    with _registry_lock:
+        if _registry is None:
+            _registry = ResourceRegistry()
+        return _registry
@@ -3,19 +3,24 @@ Serviço de Web Scraping
 
 Este módulo implementa o serviço de scraping que utiliza a API do Firecrawl
 para extrair conteúdo de websites e criar coleções de documentação.
-Suporta crawling assíncrono com polling de status.
+Suporta crawling assíncrono com polling adaptativo de status, entregando
+as páginas à medida que ficam prontas.
 """
 
 import os
-import time
 import json
-import requests
+import time
 from datetime import datetime, timezone
 from pathlib import Path
 from dotenv import load_dotenv
 
 load_dotenv()
 
+from service.catalog import get_catalog
+from service.collection_store import open_collection
+from service.firecrawl_client import get_firecrawl_client
+from service.metrics import get_metrics
+
 class ScrapingService:
     """
     Serviço de web scraping usando Firecrawl API.
@@ -23,8 +28,9 @@ class ScrapingService:
     Funcionalidades:
     - Crawling de websites completos
     - Extração de conteúdo em markdown
-    - Salvamento em coleções organizadas
+    - Salvamento em coleções organizadas (uma versão por crawl no formato versionado)
     - Suporte a crawling assíncrono
+    - Mede o tempo de cada etapa (crawl, gravação, indexação, metadados)
     """
     
     def __init__(self):
@@ -32,118 +38,49 @@ class ScrapingService:
         self.api_key = os.getenv("FIRECRAWL_API_KEY")
         self.api_url = os.getenv("FIRECRAWL_API_URL") or "https://api.firecrawl.dev"
 
-    def scrape_website(self, url, collection_name, version):
+        # Cliente assíncrono compartilhado (pool de conexões e limites globais)
+        self.client = get_firecrawl_client(self.api_url, self.api_key)
+
+        # Spans de tempo por etapa
+        self.metrics = get_metrics()
+
+    def scrape_website(self, url, collection_name, version, on_page=None):
         """
         Executa o scraping de um website e salva o conteúdo em uma coleção.
+
+        As páginas são gravadas à medida que o crawl as disponibiliza, sem
+        manter o resultado completo em memória.
         
         Args:
             url (str): URL do website a ser processado
             collection_name (str): Nome da coleção onde salvar o conteúdo
             version (str): Versão da documentação
+            on_page (callable): Chamada com (nome do arquivo, conteúdo) após gravar cada página
             
         Returns:
             dict: Resultado do scraping com status e número de arquivos salvos
         """
+        started = time.perf_counter()
+        registered = False
         try:
-            # Inicia o crawling via API Firecrawl
-            endpoint = f"{self.api_url.rstrip('/')}/v1/crawl"
-            headers = {
-                "Authorization": f"Bearer {self.api_key}",
-                "Content-Type": "application/json",
-            }
-            payload = {"url": url}
-            resp = requests.post(endpoint, json=payload, headers=headers, timeout=120)
-            resp.raise_for_status()
-            body = resp.json() if resp.content else {}
-
-            # Logs de debug para monitoramento
-            try:
-                print(f"Response status: {resp.status_code}")
-                if isinstance(body, dict):
-                    print(f"Response body keys: {list(body.keys())}")
-                else:
-                    print("Response body is not a dict")
-            except Exception:
-                pass
-
-            # Verifica se os dados já estão disponíveis ou se precisa fazer polling
-            scraped_data = body.get("data", []) if isinstance(body, dict) else []
-            job_id = body.get("id") if isinstance(body, dict) else None
-            
-            # Se não há dados imediatos, faz polling do job assíncrono
-            if not scraped_data and job_id:
-                status_endpoint = f"{self.api_url.rstrip('/')}/v1/crawl/{job_id}"
-                results_endpoint = f"{status_endpoint}/results"
-
-                max_attempts = 30
-                for attempt in range(1, max_attempts + 1):
-                    time.sleep(2)
-                    try:
-                        status_resp = requests.get(status_endpoint, headers=headers, timeout=30)
-                        status_resp.raise_for_status()
-                        status_body = status_resp.json() if status_resp.content else {}
-                        try:
-                            print(f"Polling {attempt}/{max_attempts} - keys: {list(status_body.keys()) if isinstance(status_body, dict) else 'NA'}")
-                        except Exception:
-                            pass
-
-                        if isinstance(status_body, dict):
-                            status = status_body.get("status") or status_body.get("state")
-                            data_in_status = status_body.get("data")
-                            if isinstance(data_in_status, list) and data_in_status:
-                                scraped_data = data_in_status
-                                break
-                            if status in ("completed", "success", "finished"):
-                                try:
-                                    res_resp = requests.get(results_endpoint, headers=headers, timeout=60)
-                                    res_resp.raise_for_status()
-                                    res_body = res_resp.json() if res_resp.content else {}
-                                    if isinstance(res_body, dict) and isinstance(res_body.get("data"), list):
-                                        scraped_data = res_body["data"]
-                                        break
-                                except Exception:
-                                    pass
-                            if status in ("failed", "error"):
-                                raise Exception(status_body.get("error") or "Crawl falhou")
-                    except requests.HTTPError as http_err:
-                        if http_err.response is not None and http_err.response.status_code == 404:
-                            try:
-                                res_resp = requests.get(results_endpoint, headers=headers, timeout=60)
-                                res_resp.raise_for_status()
-                                res_body = res_resp.json() if res_resp.content else {}
-                                if isinstance(res_body, dict) and isinstance(res_body.get("data"), list):
-                                    scraped_data = res_body["data"]
-                                    break
-                            except Exception:
-                                pass
-                        else:
-                            raise
-            try:
-                print(f"Scraped data length: {len(scraped_data) if isinstance(scraped_data, list) else 'N/A'}")
-                if isinstance(scraped_data, list) and scraped_data:
-                    first_page = scraped_data[0]
-                    if isinstance(first_page, dict):
-                        print(f"First page keys: {list(first_page.keys())}")
-            except Exception:
-                pass
+            # Uma coleção nova já aparece no catálogo durante o crawl (pesquisável aos poucos);
+            # se o crawl falhar, o registro é desfeito
+            if get_catalog().get(collection_name) is None:
+                self._update_global_index({"name": collection_name, "url": url, "version": version})
+                registered = True
 
             collection_path = f"data/collections/{collection_name}"
             os.makedirs(collection_path, exist_ok=True)
 
+            # Páginas em arquivos .md, no arquivo empacotado ou em uma versão da coleção (COLLECTION_FORMAT)
+            collection = open_collection(collection_path, version=version)
+
             saved_count = 0
-            for i, page in enumerate(scraped_data, 1):
-                markdown_content = None
-                if isinstance(page, dict):
-                    # Tenta diferentes caminhos para o conteúdo
-                    if page.get("markdown"):
-                        markdown_content = page["markdown"]
-                    elif page.get("content"):
-                        markdown_content = page["content"]
-                    elif isinstance(page.get("data"), dict):
-                        if page["data"].get("markdown"):
-                            markdown_content = page["data"]["markdown"]
-                        elif page["data"].get("content"):
-                            markdown_content = page["data"]["content"]
+            changed_count = 0
+            written_files = set()
+            write_time = callback_time = 0.0
+            for i, page in enumerate(self.iter_pages(url), 1):
+                markdown_content = self._extract_markdown(page)
                 if not markdown_content:
                     try:
                         keys_info = list(page.keys()) if isinstance(page, dict) else type(page)
@@ -152,19 +89,93 @@ class ScrapingService:
                         pass
                     continue
 
-                with open(f"{collection_path}/{i}.md", "w", encoding="utf-8") as f:
-                    f.write(markdown_content)
+                file_name = collection.page_name(f"{i}.md")
+                write_started = time.perf_counter()
+                if collection.write(file_name, markdown_content):
+                    changed_count += 1
+                write_time += time.perf_counter() - write_started
+                written_files.add(file_name)
                 saved_count += 1
 
+                if on_page:
+                    callback_started = time.perf_counter()
+                    on_page(file_name, markdown_content)
+                    callback_time += time.perf_counter() - callback_started
+
+            # O restante do laço é a espera pelas páginas do crawl
+            crawl_time = time.perf_counter() - started - write_time - callback_time
+            self.metrics.record("scrape.crawl", crawl_time, collection=collection_name)
+            self.metrics.record("scrape.write", write_time, collection=collection_name)
+            if on_page:
+                self.metrics.record("scrape.on_page", callback_time, collection=collection_name)
+            self.metrics.increment("scrape_pages", saved_count)
+
+            # Um crawl sem páginas (falha transitória da API) não apaga a coleção existente
+            if saved_count == 0:
+                collection.flush()
+                self._unregister(collection_name, registered)
+                return {"success": False, "error": "O crawl não retornou páginas; a coleção não foi alterada"}
+
+            # Remove páginas de crawls anteriores que não existem mais (só da versão ingerida)
+            stale_pages = [name for name in collection.names() if name not in written_files]
+            collection.remove(stale_pages)
+            changed_count += len(stale_pages)
+            collection.flush()
+
+            print(f"Páginas salvas: {saved_count} ({changed_count} novas, alteradas ou removidas)")
+
             # Salva metadados da coleção
-            self._save_collection_metadata(collection_name, url, version, saved_count)
+            with self.metrics.span("scrape.metadata", collection=collection_name):
+                self._save_collection_metadata(collection_name, url, version, saved_count)
             
-            return {"success": True, "files": saved_count}
+            return {"success": True, "files": saved_count, "changed": changed_count}
         
         except Exception as e:
             print(f"Erro ao processar a URL {url}: {str(e)}")
+            self._unregister(collection_name, registered)
             return {"success": False, "error": str(e)}
-    
+        finally:
+            self.metrics.record("scrape.total", time.perf_counter() - started, collection=collection_name)
+
+    def iter_pages(self, url):
+        """
+        Inicia o crawl de um website e entrega as páginas à medida que ficam prontas.
+
+        O crawl roda no cliente assíncrono compartilhado, que limita crawls
+        simultâneos e requisições por minuto para todo o processo.
+
+        Args:
+            url (str): URL do website a ser processado
+
+        Yields:
+            dict: Página retornada pela API Firecrawl
+        """
+        yield from self.client.iter_pages(url)
+
+    def _extract_markdown(self, page):
+        """
+        Extrai o conteúdo markdown de uma página retornada pela API.
+
+        Args:
+            page (dict): Página retornada pela API Firecrawl
+
+        Returns:
+            str: Conteúdo markdown, ou None se a página não tiver conteúdo
+        """
+        if not isinstance(page, dict):
+            return None
+        # Tenta diferentes caminhos para o conteúdo
+        if page.get("markdown"):
+            return page["markdown"]
+        if page.get("content"):
+            return page["content"]
+        if isinstance(page.get("data"), dict):
+            if page["data"].get("markdown"):
+                return page["data"]["markdown"]
+            if page["data"].get("content"):
+                return page["data"]["content"]
+        return None
+
     def _save_collection_metadata(self, collection_name, url, version, files_count):
         """
         Salva metadados da coleção e atualiza o índice global.
@@ -204,36 +215,29 @@ class ScrapingService:
         except Exception as e:
             print(f"Erro ao salvar metadados da coleção {collection_name}: {str(e)}")
     
+    def _unregister(self, collection_name, registered):
+        """
+        Remove do catálogo a coleção registrada no início de um crawl que falhou.
+
+        Args:
+            collection_name (str): Nome da coleção
+            registered (bool): Se a coleção foi registrada por este crawl
+        """
+        if not registered:
+            return
+        try:
+            get_catalog().delete(collection_name)
+        except Exception as e:
+            print(f"Erro ao atualizar índice global: {str(e)}")
+
     def _update_global_index(self, metadata):
         """
-        Atualiza o índice global de coleções.
+        Registra a coleção no catálogo global de coleções.
         
         Args:
             metadata (dict): Metadados da coleção
         """
         try:
-            index_file = Path("data/collections/index.json")
-            index_file.parent.mkdir(parents=True, exist_ok=True)
-            
-            # Carrega índice existente ou cria novo
-            if index_file.exists():
-                with open(index_file, "r", encoding="utf-8") as f:
-                    collections = json.load(f)
-            else:
-                collections = []
-            
-            # Remove entrada existente com mesmo nome (upsert)
-            collections = [c for c in collections if c.get("name") != metadata["name"]]
-            
-            # Adiciona nova entrada
-            collections.append(metadata)
-            
-            # Salva índice atualizado (escrita atômica)
-            temp_file = index_file.with_suffix(".json.tmp")
-            with open(temp_file, "w", encoding="utf-8") as f:
-                json.dump(collections, f, indent=2, ensure_ascii=False)
-            
-            temp_file.rename(index_file)
-            
+            get_catalog().upsert(metadata)
         except Exception as e:
-            print(f"Erro ao atualizar índice global: {str(e)}")
\ No newline at end of file
+            print(f"Erro ao atualizar índice global: {str(e)}")
@@ -0,0 +1,90 @@
+"""
+Aquecimento em Segundo Plano
+
+Este módulo prepara os recursos pesados do sistema RAG sem atrasar a
+abertura da aplicação: em uma thread de fundo, importa as dependências
+(langchain, FAISS, HuggingFace, Groq), carrega o modelo de embeddings no
+registro do processo e abre o índice das últimas coleções usadas no chat.
+A primeira pergunta encontra tudo pronto. Este módulo não importa nenhuma
+dependência pesada no nível do módulo.
+"""
+
+import json
+import os
+import threading
+import time
+from pathlib import Path
+
+# Aquece o modelo e o índice ao iniciar o servidor (padrão: true)
+WARMUP_ENABLED = os.getenv("WARMUP_ENABLED", "true").lower() in ("1", "true", "yes")
+
+# Últimas coleções carregadas no chat
+LAST_COLLECTIONS_FILE = Path("data/cache/last_collections.json")
+
+def remember_collections(collection_names):
+    """
+    Registra as coleções carregadas no chat, para aquecê-las no próximo início.
+
+    Args:
+        collection_names (list): Nomes das coleções
+    """
+    try:
+        LAST_COLLECTIONS_FILE.parent.mkdir(parents=True, exist_ok=True)
+        temp_file = LAST_COLLECTIONS_FILE.with_suffix(".json.tmp")
+        with open(temp_file, "w", encoding="utf-8") as f:
+            json.dump(list(collection_names), f, ensure_ascii=False)
+        os.replace(temp_file, LAST_COLLECTIONS_FILE)
+    except OSError as e:
+        print(f"Erro ao registrar as últimas coleções: {str(e)}")
+
+def last_collections():
+    """
+    Retorna as últimas coleções carregadas no chat que ainda existem.
+
+    Returns:
+        list: Nomes das coleções (vazio se não houver registro)
+    """
+    try:
+        with open(LAST_COLLECTIONS_FILE, "r", encoding="utf-8") as f:
+            names = json.load(f)
+    except (OSError, ValueError):
+        return []
+    return [name for name in names if Path(f"data/collections/{name}").is_dir()]
+
+def warm_up():
+    """
+    Carrega o modelo de embeddings e o índice das últimas coleções usadas.
+
+    Os recursos ficam no registro do processo, de onde as sessões do chat
+    os reaproveitam.
+    """
+    started = time.perf_counter()
+    try:
+        from service.rag import RAGService
+
+        rag_service = RAGService()
+        # A primeira inferência inicializa o modelo (pesos, threads, kernels)
+        rag_service.embeddings.embed_query("warm-up")
+
+        collections = last_collections()
+        if collections:
+            rag_service.load_collections(collections)
+        print(
+            f"Aquecimento concluído em {time.perf_counter() - started:.1f} s"
+            + (f" ({', '.join(collections)})" if collections else "")
+        )
+    except Exception as e:
+        print(f"Erro no aquecimento: {str(e)}")
+
+def start_warm_up():
+    """
+    Inicia o aquecimento em uma thread de fundo, se habilitado.
+
+    Returns:
+        threading.Thread: Thread do aquecimento, ou None se desativado
+    """
+    if not WARMUP_ENABLED:
+        return None
+    thread = threading.Thread(target=warm_up, name="warm-up", daemon=True)
+    thread.start()
+    return thread
@@ -0,0 +1,111 @@
+"""
+Perguntas em Lote pela Linha de Comando
+
+Este módulo responde um arquivo de perguntas sobre uma ou mais coleções e
+grava os resultados em JSONL, um por linha, à medida que ficam prontos
+(na ordem de conclusão; o campo "index" indica a posição da pergunta).
+Cada resultado traz a resposta, as fontes usadas e o tempo de cada etapa.
+
+O arquivo de perguntas pode ter uma pergunta por linha (.txt) ou objetos
+JSON com o campo "question" (.jsonl).
+
+Uso:
+    python tools/batch_qa.py Firecrawl --questions perguntas.txt --output respostas.jsonl
+    python tools/batch_qa.py Framework Plugins --questions avaliacao.jsonl --concurrency 16 --rpm 300
+"""
+
+import argparse
+import json
+import sys
+from pathlib import Path
+
+# Adiciona o diretório raiz ao path para importar os serviços
+root_dir = Path(__file__).parent.parent
+sys.path.insert(0, str(root_dir))
+
+from dotenv import load_dotenv
+
+# Carrega o .env antes de os serviços lerem as configurações
+load_dotenv()
+
+from service.batch_qa import (
+    BATCH_BLOCK_SIZE,
+    BATCH_CONCURRENCY,
+    LLM_REQUESTS_PER_MINUTE,
+    LLM_TOKENS_PER_MINUTE,
+    BatchQuestionAnswering,
+)
+from service.rag import RAGService
+
+def read_questions(path):
+    """
+    Lê as perguntas de um arquivo texto ou JSONL.
+
+    Args:
+        path (str): Caminho do arquivo
+
+    Returns:
+        list: Perguntas, na ordem do arquivo
+    """
+    questions = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            if path.endswith(".jsonl"):
+                questions.append(json.loads(line)["question"])
+            else:
+                questions.append(line)
+    return questions
+
+def main():
+    """
+    Ponto de entrada da linha de comando.
+    """
+    parser = argparse.ArgumentParser(description="Responde um arquivo de perguntas em lote")
+    parser.add_argument("collections", nargs="+", help="Coleções pesquisadas")
+    parser.add_argument("--questions", required=True, help="Arquivo de perguntas (.txt ou .jsonl)")
+    parser.add_argument("--output", default="-", help="Arquivo JSONL de saída (padrão: saída padrão)")
+    parser.add_argument("--concurrency", type=int, default=BATCH_CONCURRENCY, help="Chamadas simultâneas ao LLM")
+    parser.add_argument("--rpm", type=int, default=LLM_REQUESTS_PER_MINUTE, help="Requisições por minuto ao LLM (0 = sem limite)")
+    parser.add_argument("--tpm", type=int, default=LLM_TOKENS_PER_MINUTE, help="Tokens por minuto ao LLM (0 = sem limite)")
+    parser.add_argument("--block-size", type=int, default=BATCH_BLOCK_SIZE, help="Perguntas embedadas e pesquisadas de uma vez")
+    parser.add_argument("--no-cache", action="store_true", help="Não usa nem alimenta o cache de respostas")
+    args = parser.parse_args()
+
+    questions = read_questions(args.questions)
+    rag_service = RAGService()
+    if not rag_service.load_collections(args.collections):
+        print(f"Erro ao carregar as coleções: {', '.join(args.collections)}", file=sys.stderr)
+        return 1
+
+    batch = BatchQuestionAnswering(
+        rag_service,
+        concurrency=args.concurrency,
+        requests_per_minute=args.rpm,
+        tokens_per_minute=args.tpm,
+        block_size=args.block_size,
+        use_cache=not args.no_cache
+    )
+
+    output = sys.stdout if args.output == "-" else open(args.output, "w", encoding="utf-8")
+    try:
+        def on_result(item):
+            output.write(json.dumps(item, ensure_ascii=False) + "\n")
+            output.flush()
+
+        totals = batch.run(questions, on_result)
+    finally:
+        if output is not sys.stdout:
+            output.close()
+
+    print(
+        f"{totals['questions']} perguntas em {totals['seconds']} s "
+        f"({totals['cached']} do cache, {totals['errors']} erros)",
+        file=sys.stderr
+    )
+    return 1 if totals["errors"] else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
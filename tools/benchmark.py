@@ -0,0 +1,390 @@
+"""
+Benchmark Offline de Ingestão e Consulta
+
+Este módulo mede o desempenho do pipeline do AskTheDocs sem acesso à rede.
+Uma coleção markdown sintética é obtida de um servidor Firecrawl falso e
+cada etapa é cronometrada: crawl com ingestão em streaming, leitura das
+páginas, divisão em chunks, embedding, construção do índice, carregamento
+da coleção, busca e resposta completa (com um LLM falso). O resultado traz
+vazão, latências p50/p95/p99 e pico de memória (RSS), e pode ser salvo como
+baseline em JSON para comparar execuções futuras.
+
+Uso:
+    python tools/benchmark.py --pages 200 --queries 100 --save-baseline bench.json
+    python tools/benchmark.py --pages 200 --queries 100 --baseline bench.json
+
+Por padrão usa embeddings falsos (determinísticos); --embeddings model usa o
+modelo configurado em EMBEDDINGS_MODEL, que precisa estar no cache local.
+"""
+
+import argparse
+import json
+import os
+import platform
+import random
+import resource
+import shutil
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from functools import partial
+from pathlib import Path
+
+# Adiciona o diretório raiz ao path para importar os serviços
+root_dir = Path(__file__).parent.parent
+sys.path.insert(0, str(root_dir))
+sys.path.insert(0, str(Path(__file__).parent))
+
+from fake_firecrawl import WORDS, FakeFirecrawlServer, make_page
+
+# Etapas medidas por item (vazão) e por consulta (latência)
+THROUGHPUT_STAGES = ("crawl_ingest", "load", "split", "embed", "index_build", "load_collection")
+LATENCY_STAGES = ("retrieval", "answer")
+
+def peak_rss_mb():
+    """
+    Retorna o pico de memória residente do processo até agora.
+
+    Returns:
+        float: Pico de RSS em MB
+    """
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux informa em KB; macOS, em bytes
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+def percentile_ms(samples, q):
+    """
+    Calcula um percentil de uma lista de durações.
+
+    Args:
+        samples (list): Durações em segundos
+        q (float): Percentil (0 a 100)
+
+    Returns:
+        float: Percentil em milissegundos
+    """
+    ordered = sorted(samples)
+    position = (len(ordered) - 1) * q / 100
+    lower = int(position)
+    upper = min(lower + 1, len(ordered) - 1)
+    value = ordered[lower] + (ordered[upper] - ordered[lower]) * (position - lower)
+    return value * 1000
+
+def throughput_result(seconds, items):
+    """
+    Monta o resultado de uma etapa medida por vazão.
+
+    Args:
+        seconds (float): Duração total da etapa
+        items (int): Itens processados (páginas ou chunks)
+
+    Returns:
+        dict: Duração, itens, itens por segundo e pico de RSS
+    """
+    return {
+        "seconds": round(seconds, 4),
+        "items": items,
+        "throughput": round(items / seconds, 2) if seconds > 0 else None,
+        "peak_rss_mb": round(peak_rss_mb(), 1)
+    }
+
+def latency_result(samples):
+    """
+    Monta o resultado de uma etapa medida por latência.
+
+    Args:
+        samples (list): Duração de cada consulta em segundos
+
+    Returns:
+        dict: Consultas, vazão, p50/p95/p99 e pico de RSS
+    """
+    total = sum(samples)
+    return {
+        "seconds": round(total, 4),
+        "items": len(samples),
+        "throughput": round(len(samples) / total, 2) if total > 0 else None,
+        "p50_ms": round(percentile_ms(samples, 50), 3),
+        "p95_ms": round(percentile_ms(samples, 95), 3),
+        "p99_ms": round(percentile_ms(samples, 99), 3),
+        "peak_rss_mb": round(peak_rss_mb(), 1)
+    }
+
+def make_questions(count, seed=42):
+    """
+    Gera perguntas sintéticas com o vocabulário das páginas falsas.
+
+    Args:
+        count (int): Número de perguntas
+        seed (int): Semente do gerador
+
+    Returns:
+        list: Perguntas
+    """
+    rng = random.Random(seed)
+    return [
+        f"How do I {rng.choice(WORDS)} the {rng.choice(WORDS)} {rng.choice(WORDS)} with {rng.choice(WORDS)}? ({i})"
+        for i in range(count)
+    ]
+
+def run_benchmark(args):
+    """
+    Executa todas as etapas do benchmark em um diretório temporário.
+
+    Args:
+        args (argparse.Namespace): Opções da linha de comando
+
+    Returns:
+        dict: Configuração e resultados por etapa
+    """
+    # Configurações lidas na importação dos serviços: sem rede e sem limites artificiais
+    os.environ.setdefault("GROQ_API_KEY", "benchmark")
+    os.environ["FIRECRAWL_API_KEY"] = "benchmark"
+    os.environ["FIRECRAWL_REQUESTS_PER_MINUTE"] = "0"
+    os.environ["FIRECRAWL_POLL_MIN_INTERVAL"] = "0.05"
+
+    server = FakeFirecrawlServer(
+        pages=args.pages,
+        pages_per_poll=max(1, args.pages // 10),
+        page_size=50,
+        page_factory=partial(make_page, paragraphs=args.paragraphs)
+    )
+    os.environ["FIRECRAWL_API_URL"] = server.start()
+
+    from langchain_core.documents import Document
+    from langchain_core.language_models.fake_chat_models import FakeListChatModel
+    from langchain_community.vectorstores import FAISS
+    from service.bm25 import BM25Index
+    from service.collection_store import open_collection
+    from service.embedding_pipeline import EmbeddingPipeline
+    from service.ingest import StreamingIngest
+    from service.rag import EMBEDDINGS_MODEL, RAGService
+    from service.registry import get_registry
+
+    registry = get_registry()
+    if args.embeddings == "fake":
+        from langchain_core.embeddings import DeterministicFakeEmbedding
+        # Registrado antes do RAGService, que reaproveita o modelo do registro
+        registry.get_model("embeddings_backend", lambda: "torch")
+        registry.get_model(f"embeddings:{EMBEDDINGS_MODEL}", lambda: DeterministicFakeEmbedding(size=args.dimensions))
+
+    rag = RAGService()
+    rag.llm = FakeListChatModel(
+        responses=["Resposta sintética do benchmark."],
+        sleep=args.llm_latency_ms / 1000 if args.llm_latency_ms else None
+    )
+    # Respostas em cache não medem o caminho completo
+    rag.answer_cache.threshold = 2.0
+    if args.embeddings == "fake":
+        # Embeddings falsos não podem ser calculados pelos processos do pool
+        rag.embedding_pipeline.workers = 1
+
+    collection = "benchmark"
+    collection_path = Path("data/collections") / collection
+    results = {}
+
+    try:
+        # Crawl do servidor falso com indexação em streaming
+        print(f"Crawl + ingestão de {args.pages} páginas...")
+        started = time.perf_counter()
+        outcome = StreamingIngest(rag_service=rag).run(server.url + "/docs", collection, "1.0")
+        if not outcome.get("success"):
+            raise RuntimeError(f"Falha na ingestão: {outcome.get('error')}")
+        results["crawl_ingest"] = throughput_result(time.perf_counter() - started, outcome["files"])
+    finally:
+        server.stop()
+
+    # Leitura das páginas
+    started = time.perf_counter()
+    pages = open_collection(collection_path)
+    documents = [
+        Document(page_content=content, metadata={"source": pages.source(name)})
+        for name, content in pages.iter_read(pages.names())
+    ]
+    results["load"] = throughput_result(time.perf_counter() - started, len(documents))
+
+    # Divisão em chunks
+    started = time.perf_counter()
+    chunks = rag.text_splitter.split_documents(documents)
+    results["split"] = throughput_result(time.perf_counter() - started, len(chunks))
+
+    # Embedding (sem cache, para medir o modelo)
+    texts = [chunk.page_content for chunk in chunks]
+    pipeline = EmbeddingPipeline(
+        rag.embeddings, EMBEDDINGS_MODEL, cache=None,
+        workers=rag.embedding_pipeline.workers, backend=rag.embeddings_backend
+    )
+    started = time.perf_counter()
+    vectors = [None] * len(texts)
+    for positions, batch in pipeline.iter_embeddings(texts):
+        for position, vector in zip(positions, batch):
+            vectors[position] = vector
+    results["embed"] = throughput_result(time.perf_counter() - started, len(texts))
+
+    # Construção dos índices vetorial e lexical
+    started = time.perf_counter()
+    FAISS.from_embeddings(list(zip(texts, vectors)), rag.embeddings)
+    BM25Index.build([str(i) for i in range(len(texts))], texts)
+    results["index_build"] = throughput_result(time.perf_counter() - started, len(texts))
+
+    # Carregamento da coleção a partir do índice salvo
+    registry.evict(collection)
+    started = time.perf_counter()
+    if not rag.load_collection(collection):
+        raise RuntimeError("Falha ao carregar a coleção")
+    results["load_collection"] = throughput_result(time.perf_counter() - started, len(documents))
+
+    # Busca híbrida (embedding da pergunta + índices)
+    questions = make_questions(args.queries)
+    samples = []
+    for question in questions:
+        started = time.perf_counter()
+        rag._retrieve(question, rag.embeddings.embed_query(question))
+        samples.append(time.perf_counter() - started)
+    results["retrieval"] = latency_result(samples)
+
+    # Resposta completa com o LLM falso
+    samples = []
+    for question in questions:
+        started = time.perf_counter()
+        rag.ask_question(question)
+        samples.append(time.perf_counter() - started)
+    results["answer"] = latency_result(samples)
+
+    return {
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "config": {
+            "pages": args.pages,
+            "paragraphs": args.paragraphs,
+            "queries": args.queries,
+            "embeddings": args.embeddings if args.embeddings == "fake" else EMBEDDINGS_MODEL,
+            "dimensions": args.dimensions if args.embeddings == "fake" else None,
+            "embeddings_backend": None if args.embeddings == "fake" else rag.embeddings_backend,
+            "llm_latency_ms": args.llm_latency_ms,
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count()
+        },
+        "stages": results
+    }
+
+def print_report(report, baseline=None):
+    """
+    Exibe os resultados em tabela, com a variação em relação ao baseline.
+
+    Args:
+        report (dict): Resultado de run_benchmark
+        baseline (dict): Resultado salvo anteriormente (opcional)
+    """
+    print()
+    print(f"{'etapa':<16}{'itens':>8}{'itens/s':>12}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'RSS MB':>10}{'variação':>11}")
+    for stage, result in report["stages"].items():
+        change = ""
+        if baseline and stage in baseline.get("stages", {}):
+            delta = stage_change(stage, result, baseline["stages"][stage])
+            change = f"{delta:+.1%}" if delta is not None else ""
+        print(
+            f"{stage:<16}{result['items']:>8}{result['throughput'] or 0:>12.1f}"
+            f"{result.get('p50_ms', ''):>10}{result.get('p95_ms', ''):>10}{result.get('p99_ms', ''):>10}"
+            f"{result['peak_rss_mb']:>10}{change:>11}"
+        )
+
+def stage_change(stage, current, previous):
+    """
+    Calcula a piora relativa de uma etapa em relação ao baseline.
+
+    Etapas de latência comparam o p95; as demais comparam a vazão.
+
+    Args:
+        stage (str): Nome da etapa
+        current (dict): Resultado atual
+        previous (dict): Resultado do baseline
+
+    Returns:
+        float: Piora relativa (positiva = mais lento), ou None se incomparável
+    """
+    if stage in LATENCY_STAGES:
+        if not previous.get("p95_ms"):
+            return None
+        return current["p95_ms"] / previous["p95_ms"] - 1
+    if not current.get("throughput") or not previous.get("throughput"):
+        return None
+    return previous["throughput"] / current["throughput"] - 1
+
+def find_regressions(report, baseline, tolerance):
+    """
+    Lista as etapas que pioraram além da tolerância.
+
+    Args:
+        report (dict): Resultado atual
+        baseline (dict): Resultado salvo anteriormente
+        tolerance (float): Piora relativa aceita (ex.: 0.2 = 20%)
+
+    Returns:
+        list: Descrições das regressões
+    """
+    if baseline.get("config", {}).get("pages") != report["config"]["pages"]:
+        print("Aviso: o baseline foi gerado com outra configuração")
+
+    regressions = []
+    for stage, result in report["stages"].items():
+        previous = baseline.get("stages", {}).get(stage)
+        if previous is None:
+            continue
+        delta = stage_change(stage, result, previous)
+        if delta is not None and delta > tolerance:
+            regressions.append(f"{stage}: {delta:+.1%}")
+    return regressions
+
+def main():
+    """
+    Executa o benchmark pela linha de comando.
+    """
+    parser = argparse.ArgumentParser(description="Benchmark offline de ingestão e consulta do AskTheDocs")
+    parser.add_argument("--pages", type=int, default=200, help="Páginas da coleção sintética")
+    parser.add_argument("--paragraphs", type=int, default=6, help="Seções de conteúdo por página")
+    parser.add_argument("--queries", type=int, default=100, help="Perguntas para as etapas de latência")
+    parser.add_argument("--embeddings", choices=("fake", "model"), default="fake", help="Embeddings falsos ou o modelo real")
+    parser.add_argument("--dimensions", type=int, default=384, help="Dimensão dos embeddings falsos")
+    parser.add_argument("--llm-latency-ms", type=float, default=0, help="Latência simulada do LLM falso")
+    parser.add_argument("--output", help="Salva o resultado desta execução em JSON")
+    parser.add_argument("--save-baseline", help="Salva o resultado como baseline em JSON")
+    parser.add_argument("--baseline", help="Compara com um baseline salvo")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Piora aceita antes de falhar (padrão: 0.2)")
+    parser.add_argument("--keep", action="store_true", help="Mantém o diretório temporário de dados")
+    args = parser.parse_args()
+
+    # Os serviços usam caminhos relativos (data/...): roda em um diretório isolado
+    output_paths = [Path(path).resolve() for path in (args.output, args.save_baseline) if path]
+    baseline = None
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+
+    work_dir = tempfile.mkdtemp(prefix="askthedocs-bench-")
+    previous_dir = os.getcwd()
+    os.chdir(work_dir)
+    try:
+        report = run_benchmark(args)
+    finally:
+        os.chdir(previous_dir)
+        if args.keep:
+            print(f"Dados mantidos em {work_dir}")
+        else:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    print_report(report, baseline)
+    for path in output_paths:
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+        print(f"Resultado salvo em {path}")
+
+    if baseline:
+        regressions = find_regressions(report, baseline, args.tolerance)
+        if regressions:
+            print("Regressões acima da tolerância: " + ", ".join(regressions))
+            sys.exit(1)
+        print("Nenhuma regressão acima da tolerância")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,249 @@
+"""
+Exportação do Modelo de Embeddings para ONNX int8
+
+Este módulo exporta o modelo de embeddings (sentence-transformers) para
+ONNX, quantiza os pesos em int8 (quantização dinâmica do ONNX Runtime) e
+valida os vetores do modelo quantizado contra os do PyTorch. O modelo é
+salvo em data/models/ e passa a ser usado com EMBEDDINGS_BACKEND=onnx
+apenas se a menor similaridade de cosseno ficar acima da tolerância
+(ONNX_MIN_SIMILARITY). O relatório também compara a vazão de indexação e a
+latência de embedding de uma pergunta nos dois backends.
+
+Requer, apenas para exportar: torch, sentence-transformers, onnx e onnxruntime.
+
+Uso:
+    python tools/export_onnx.py
+    python tools/export_onnx.py all-MiniLM-L6-v2 --collection Firecrawl --threads 4
+"""
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+# Adiciona o diretório raiz ao path para importar os serviços
+root_dir = Path(__file__).parent.parent
+sys.path.insert(0, str(root_dir))
+
+from dotenv import load_dotenv
+
+# Carrega o .env antes de os serviços lerem as configurações
+load_dotenv()
+
+import numpy as np
+
+from service.onnx_embeddings import (
+    ONNX_CONFIG_FILE,
+    ONNX_MIN_SIMILARITY,
+    ONNX_MODEL_FILE,
+    ONNX_THREADS,
+    ONNX_TOKENIZER_FILE,
+    OnnxEmbeddings,
+    onnx_model_dir,
+)
+
+# Textos de validação usados quando nenhuma coleção é indicada
+SAMPLE_TEXTS = [
+    "How do I install the package?",
+    "Como configurar a chave da API?",
+    "The crawl endpoint returns a job id that can be polled for status.",
+    "Use o parâmetro limit para restringir o número de páginas do crawl.",
+    "Authentication is done with a bearer token in the Authorization header.",
+    "## Quickstart\n\nInstall the SDK with pip and create a client with your API key.",
+    "Erros 429 indicam que o limite de requisições por minuto foi atingido; tente novamente mais tarde.",
+    "def scrape(url, formats=None):\n    return client.scrape_url(url, params={'formats': formats})",
+    "FAISS",
+    "Pages are converted to clean markdown, removing navigation menus, footers and cookie banners "
+    "so that only the main content of each page is kept for indexing and retrieval.",
+]
+
+def read_texts(collection_name, limit):
+    """
+    Lê chunks de uma coleção para a validação.
+
+    Args:
+        collection_name (str): Nome da coleção
+        limit (int): Número máximo de chunks
+
+    Returns:
+        list: Textos dos chunks
+    """
+    from langchain.text_splitter import RecursiveCharacterTextSplitter
+    from service.collection_store import open_collection
+    from service.rag import CHUNK_OVERLAP, CHUNK_SIZE
+
+    splitter = RecursiveCharacterTextSplitter(chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP)
+    collection = open_collection(f"data/collections/{collection_name}")
+    texts = []
+    for _, content in collection.iter_read(collection.names()):
+        texts.extend(splitter.split_text(content))
+        if len(texts) >= limit:
+            break
+    return texts[:limit]
+
+def export_model(model, output_dir):
+    """
+    Exporta o transformer do modelo para ONNX e quantiza os pesos em int8.
+
+    Args:
+        model (SentenceTransformer): Modelo carregado no PyTorch
+        output_dir (Path): Diretório de saída
+
+    Returns:
+        dict: Configuração do modelo exportado (pooling, comprimento, tokenizer)
+    """
+    import torch
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+
+    transformer, pooling = model[0], model[1]
+    if not getattr(pooling, "pooling_mode_mean_tokens", False):
+        raise ValueError("Apenas modelos com pooling pela média dos tokens são suportados")
+    normalize = any(type(module).__name__ == "Normalize" for module in model)
+
+    tokenizer = transformer.tokenizer
+    auto_model = transformer.auto_model.eval()
+    input_names = [name for name in ("input_ids", "attention_mask", "token_type_ids") if name in tokenizer.model_input_names]
+
+    class Encoder(torch.nn.Module):
+        # Devolve apenas os estados dos tokens; o pooling fica no OnnxEmbeddings
+        def forward(self, *inputs):
+            return auto_model(**dict(zip(input_names, inputs))).last_hidden_state
+
+    sample = tokenizer(["exemplo de texto para exportação"], return_tensors="pt")
+    axes = {0: "batch", 1: "sequence"}
+    output_dir.mkdir(parents=True, exist_ok=True)
+    with tempfile.TemporaryDirectory() as temp_dir:
+        fp32_file = Path(temp_dir) / "model.onnx"
+        with torch.no_grad():
+            torch.onnx.export(
+                Encoder(),
+                tuple(sample[name] for name in input_names),
+                str(fp32_file),
+                input_names=input_names,
+                output_names=["last_hidden_state"],
+                dynamic_axes={**{name: axes for name in input_names}, "last_hidden_state": axes},
+                opset_version=17,
+                do_constant_folding=True,
+            )
+        quantize_dynamic(str(fp32_file), str(output_dir / ONNX_MODEL_FILE), weight_type=QuantType.QInt8, per_channel=True)
+
+    tokenizer.backend_tokenizer.save(str(output_dir / ONNX_TOKENIZER_FILE))
+    return {
+        "max_length": model.max_seq_length,
+        "dimension": model.get_sentence_embedding_dimension(),
+        "normalize": normalize,
+        "pad_id": tokenizer.pad_token_id or 0,
+        "pad_token": tokenizer.pad_token or "[PAD]",
+        "inputs": input_names,
+        "quantization": "dynamic int8 (per channel)",
+    }
+
+def compare(model, onnx_model, texts, threads, queries=50):
+    """
+    Compara os vetores e a velocidade dos dois backends.
+
+    Args:
+        model (SentenceTransformer): Modelo no PyTorch
+        onnx_model (OnnxEmbeddings): Modelo quantizado
+        texts (list): Textos de validação
+        threads (int): Threads de cada backend
+        queries (int): Perguntas usadas na medição de latência
+
+    Returns:
+        tuple: (validação, velocidade)
+    """
+    import torch
+
+    torch.set_num_threads(threads)
+    prepared = [text.replace("\n", " ") for text in texts]
+
+    started = time.perf_counter()
+    reference = np.asarray(model.encode(prepared, batch_size=64, show_progress_bar=False), dtype=np.float32)
+    torch_seconds = time.perf_counter() - started
+
+    started = time.perf_counter()
+    vectors = onnx_model.encode(texts)
+    onnx_seconds = time.perf_counter() - started
+
+    similarities = (reference * vectors).sum(axis=1) / (
+        np.linalg.norm(reference, axis=1) * np.linalg.norm(vectors, axis=1)
+    )
+
+    # Latência de uma pergunta isolada (mediana)
+    question = "Como configurar a chave da API?"
+    torch_latency, onnx_latency = [], []
+    for _ in range(queries):
+        started = time.perf_counter()
+        model.encode([question], show_progress_bar=False)
+        torch_latency.append(time.perf_counter() - started)
+        started = time.perf_counter()
+        onnx_model.embed_query(question)
+        onnx_latency.append(time.perf_counter() - started)
+
+    validation = {
+        "texts": len(texts),
+        "min_similarity": round(float(similarities.min()), 5),
+        "mean_similarity": round(float(similarities.mean()), 5),
+        "tolerance": ONNX_MIN_SIMILARITY,
+    }
+    speed = {
+        "threads": threads,
+        "torch_texts_per_second": round(len(texts) / torch_seconds, 1),
+        "onnx_texts_per_second": round(len(texts) / onnx_seconds, 1),
+        "torch_query_ms": round(statistics.median(torch_latency) * 1000, 2),
+        "onnx_query_ms": round(statistics.median(onnx_latency) * 1000, 2),
+    }
+    return validation, speed
+
+def main():
+    """
+    Ponto de entrada da linha de comando.
+    """
+    parser = argparse.ArgumentParser(description="Exporta o modelo de embeddings para ONNX int8 e o valida")
+    parser.add_argument("model", nargs="?", default=os.getenv("EMBEDDINGS_MODEL", "all-MiniLM-L6-v2"), help="Modelo sentence-transformers")
+    parser.add_argument("--collection", help="Valida com chunks desta coleção (padrão: textos de exemplo)")
+    parser.add_argument("--samples", type=int, default=512, help="Número máximo de chunks na validação")
+    parser.add_argument("--threads", type=int, default=ONNX_THREADS or os.cpu_count() or 1, help="Threads de cada backend na comparação")
+    args = parser.parse_args()
+
+    from sentence_transformers import SentenceTransformer
+
+    output_dir = onnx_model_dir(args.model)
+    print(f"Exportando {args.model} para {output_dir}...")
+    model = SentenceTransformer(args.model, device="cpu")
+    config = {"model": args.model, **export_model(model, output_dir)}
+    config["exported_at"] = datetime.now(timezone.utc).isoformat()
+
+    # Sem validação gravada, o modelo ainda não é usado pelo RAGService
+    config_file = output_dir / ONNX_CONFIG_FILE
+    with open(config_file, "w", encoding="utf-8") as f:
+        json.dump(config, f, indent=2, ensure_ascii=False)
+
+    texts = read_texts(args.collection, args.samples) if args.collection else SAMPLE_TEXTS
+    onnx_model = OnnxEmbeddings(output_dir, threads=args.threads)
+    config["validation"], config["speed"] = compare(model, onnx_model, texts, args.threads)
+    with open(config_file, "w", encoding="utf-8") as f:
+        json.dump(config, f, indent=2, ensure_ascii=False)
+
+    validation, speed = config["validation"], config["speed"]
+    print(
+        f"Similaridade com o PyTorch: mínima {validation['min_similarity']:.4f}, "
+        f"média {validation['mean_similarity']:.4f} ({validation['texts']} textos)"
+    )
+    print(
+        f"Indexação: {speed['torch_texts_per_second']} -> {speed['onnx_texts_per_second']} textos/s · "
+        f"pergunta: {speed['torch_query_ms']} -> {speed['onnx_query_ms']} ms ({speed['threads']} threads)"
+    )
+    if validation["min_similarity"] < ONNX_MIN_SIMILARITY:
+        print(f"Validação abaixo da tolerância ({ONNX_MIN_SIMILARITY}); o backend ONNX não será usado", file=sys.stderr)
+        return 1
+    print("Modelo validado. Use EMBEDDINGS_BACKEND=onnx para ativá-lo.")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,235 @@
+"""
+Servidor Firecrawl Falso
+
+Este módulo implementa um servidor HTTP local que imita os endpoints de
+crawl da API Firecrawl (v1). As páginas ficam prontas aos poucos, a cada
+consulta de status, e os resultados são paginados com "skip" e "next",
+permitindo testar o scraping e a ingestão em streaming sem acesso à rede.
+
+Uso:
+    python tools/fake_firecrawl.py --port 3002 --pages 200
+
+Depois, aponte o AskTheDocs para o servidor:
+    FIRECRAWL_API_URL=http://localhost:3002
+"""
+
+import argparse
+import json
+import random
+import threading
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+# Trechos repetidos em todas as páginas, como em sites de documentação reais
+NAV_BAR = "[Docs](/docs) | [API Reference](/api) | [Guides](/guides) | [Changelog](/changelog) | [Login](/login)"
+FOOTER = (
+    "---\n\n"
+    "Was this page helpful? [Yes](#) [No](#)\n\n"
+    "© 2025 Example Docs. All rights reserved. [Privacy](/privacy) | [Terms](/terms) | [Cookies](/cookies)"
+)
+
+WORDS = (
+    "crawl scrape index vector embedding query token request response api key endpoint "
+    "configure install deploy cluster worker queue cache batch stream page document "
+    "markdown parser retry timeout limit webhook status result error option parameter"
+).split()
+
+def make_page(number, paragraphs=6, seed=None):
+    """
+    Gera uma página markdown sintética com cabeçalho e rodapé repetidos.
+
+    Args:
+        number (int): Número da página (usado no título e na semente)
+        paragraphs (int): Quantidade de seções de conteúdo
+        seed (int): Semente do gerador (padrão: o próprio número da página)
+
+    Returns:
+        str: Conteúdo markdown da página
+    """
+    rng = random.Random(number if seed is None else seed)
+    sections = [NAV_BAR, f"# Página {number}: {rng.choice(WORDS).title()} {rng.choice(WORDS)}"]
+    for section in range(paragraphs):
+        sentences = [
+            " ".join(rng.choice(WORDS) for _ in range(rng.randint(8, 20))).capitalize() + "."
+            for _ in range(rng.randint(3, 7))
+        ]
+        sections.append(f"## Seção {section + 1}\n\n" + " ".join(sentences))
+        if rng.random() < 0.3:
+            sections.append(f"```python\nclient.{rng.choice(WORDS)}(\"{rng.choice(WORDS)}\", limit={rng.randint(1, 100)})\n```")
+    sections.append(FOOTER)
+    return "\n\n".join(sections)
+
+class FakeFirecrawlServer:
+    """
+    Servidor local que imita a API de crawl do Firecrawl.
+
+    Funcionalidades:
+    - POST /v1/crawl inicia um job e devolve seu id
+    - GET /v1/crawl/<id> devolve status e páginas prontas, paginadas com skip/next
+    - Cada consulta de status libera mais páginas, até completar o crawl
+    """
+
+    def __init__(self, pages=50, pages_per_poll=10, page_size=10, host="127.0.0.1", port=0, page_factory=make_page):
+        self.total_pages = pages
+        self.pages_per_poll = pages_per_poll
+        self.page_size = page_size
+        self.page_factory = page_factory
+
+        # Jobs ativos: id -> número de páginas já prontas
+        self.jobs = {}
+        self.requests_count = 0
+        self._lock = threading.Lock()
+
+        self._httpd = ThreadingHTTPServer((host, port), self._make_handler())
+        self._thread = None
+
+    @property
+    def url(self):
+        """
+        URL base do servidor (para FIRECRAWL_API_URL).
+
+        Returns:
+            str: URL no formato http://host:porta
+        """
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        """
+        Inicia o servidor em uma thread de fundo.
+
+        Returns:
+            str: URL base do servidor
+        """
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self.url
+
+    def stop(self):
+        """
+        Encerra o servidor.
+        """
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def _page(self, number):
+        """
+        Monta uma página no formato retornado pela API.
+
+        Args:
+            number (int): Número da página (a partir de 1)
+
+        Returns:
+            dict: Página com markdown e metadados
+        """
+        return {
+            "markdown": self.page_factory(number),
+            "metadata": {"sourceURL": f"https://docs.example.com/page/{number}", "statusCode": 200}
+        }
+
+    def _status(self, job_id, skip, advance):
+        """
+        Monta a resposta de status de um job.
+
+        Args:
+            job_id (str): Identificador do job
+            skip (int): Número de páginas a pular
+            advance (bool): Se deve liberar mais páginas nesta consulta
+
+        Returns:
+            dict: Corpo da resposta, ou None se o job não existir
+        """
+        with self._lock:
+            if job_id not in self.jobs:
+                return None
+            if advance:
+                self.jobs[job_id] = min(self.total_pages, self.jobs[job_id] + self.pages_per_poll)
+            ready = self.jobs[job_id]
+
+        end = min(ready, skip + self.page_size)
+        body = {
+            "success": True,
+            "status": "completed" if ready >= self.total_pages else "scraping",
+            "total": self.total_pages,
+            "completed": ready,
+            "data": [self._page(number) for number in range(skip + 1, end + 1)]
+        }
+        if end < ready:
+            body["next"] = f"{self.url}/v1/crawl/{job_id}?skip={end}&page=1"
+        return body
+
+    def _make_handler(self):
+        """
+        Cria a classe de handler HTTP ligada a este servidor.
+
+        Returns:
+            type: Subclasse de BaseHTTPRequestHandler
+        """
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, format, *args):
+                pass
+
+            def _send(self, status, body):
+                payload = json.dumps(body).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def do_POST(self):
+                with server._lock:
+                    server.requests_count += 1
+                if urlparse(self.path).path.rstrip("/") != "/v1/crawl":
+                    self._send(404, {"success": False, "error": "Not found"})
+                    return
+                length = int(self.headers.get("Content-Length") or 0)
+                self.rfile.read(length)
+                job_id = str(uuid.uuid4())
+                with server._lock:
+                    server.jobs[job_id] = 0
+                self._send(200, {"success": True, "id": job_id, "url": f"{server.url}/v1/crawl/{job_id}"})
+
+            def do_GET(self):
+                with server._lock:
+                    server.requests_count += 1
+                parsed = urlparse(self.path)
+                parts = parsed.path.strip("/").split("/")
+                if len(parts) != 3 or parts[:2] != ["v1", "crawl"]:
+                    self._send(404, {"success": False, "error": "Not found"})
+                    return
+                query = parse_qs(parsed.query)
+                skip = int(query.get("skip", ["0"])[0])
+                # Apenas a primeira página de cada consulta libera novas páginas
+                body = server._status(parts[2], skip, advance="page" not in query)
+                if body is None:
+                    self._send(404, {"success": False, "error": "Job not found"})
+                else:
+                    self._send(200, body)
+
+        return Handler
+
+def main():
+    """
+    Executa o servidor falso pela linha de comando.
+    """
+    parser = argparse.ArgumentParser(description="Servidor Firecrawl falso para testes locais")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=3002)
+    parser.add_argument("--pages", type=int, default=50, help="Total de páginas do crawl")
+    parser.add_argument("--pages-per-poll", type=int, default=10, help="Páginas liberadas a cada consulta")
+    parser.add_argument("--page-size", type=int, default=10, help="Páginas por resposta (paginação)")
+    args = parser.parse_args()
+
+    server = FakeFirecrawlServer(args.pages, args.pages_per_poll, args.page_size, args.host, args.port)
+    print(f"Firecrawl falso em {server.url} ({args.pages} páginas)")
+    try:
+        server._httpd.serve_forever()
+    except KeyboardInterrupt:
+        server.stop()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,231 @@
+"""
+Servidor LLM Falso
+
+Este módulo implementa um servidor HTTP local que imita o endpoint de chat
+da API Groq (formato OpenAI), com e sem streaming. A latência, o limite de
+requisições por minuto (respostas 429 com Retry-After) e a taxa de falhas
+(respostas 503) são configuráveis, permitindo testar o agendador do LLM,
+a união de chamadas repetidas e as novas tentativas sem acesso à rede.
+
+Uso:
+    python tools/fake_llm.py --port 8090 --latency 0.5 --requests-per-minute 30
+
+Depois, aponte o AskTheDocs para o servidor:
+    LLM_API_URL=http://localhost:8090
+"""
+
+import argparse
+import json
+import random
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse
+
+# Caminho do endpoint de chat (o cliente Groq acrescenta /openai/v1 à URL base)
+CHAT_PATH = "/openai/v1/chat/completions"
+
+# Palavras por trecho da resposta em streaming
+WORDS_PER_CHUNK = 3
+
+class FakeLLMServer:
+    """
+    Servidor local que imita a API de chat do Groq.
+
+    Funcionalidades:
+    - POST /openai/v1/chat/completions responde com um texto derivado do prompt
+    - Streaming em Server-Sent Events quando "stream" é verdadeiro
+    - Simula latência, limite de requisições por minuto (429) e falhas (503)
+    - Conta as requisições recebidas, para verificar a união de chamadas
+    """
+
+    def __init__(self, latency=0.2, requests_per_minute=0, failure_rate=0.0, host="127.0.0.1", port=0, seed=None):
+        self.latency = latency
+        self.requests_per_minute = requests_per_minute
+        self.failure_rate = failure_rate
+        self.requests_count = 0
+        self.completions_count = 0
+        self.rejected_count = 0
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+        # Horários das requisições aceitas no último minuto
+        self._accepted = []
+
+        self._httpd = ThreadingHTTPServer((host, port), self._make_handler())
+        self._thread = None
+
+    @property
+    def url(self):
+        """
+        URL base do servidor (para LLM_API_URL).
+
+        Returns:
+            str: URL no formato http://host:porta
+        """
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        """
+        Inicia o servidor em uma thread de fundo.
+
+        Returns:
+            str: URL base do servidor
+        """
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self.url
+
+    def stop(self):
+        """
+        Encerra o servidor.
+        """
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def _admit(self):
+        """
+        Decide se uma requisição é atendida, recusada pelo limite ou falha.
+
+        Returns:
+            tuple: (status HTTP, segundos do Retry-After ou None)
+        """
+        with self._lock:
+            self.requests_count += 1
+            now = time.monotonic()
+            self._accepted = [moment for moment in self._accepted if now - moment < 60]
+            if self.requests_per_minute and len(self._accepted) >= self.requests_per_minute:
+                self.rejected_count += 1
+                return 429, max(1, int(60 - (now - self._accepted[0])) + 1)
+            if self.failure_rate and self._random.random() < self.failure_rate:
+                self.rejected_count += 1
+                return 503, None
+            self._accepted.append(now)
+            self.completions_count += 1
+            return 200, None
+
+    @staticmethod
+    def _answer(messages):
+        """
+        Gera a resposta a partir da última mensagem do usuário.
+
+        Args:
+            messages (list): Mensagens no formato OpenAI
+
+        Returns:
+            str: Texto da resposta
+        """
+        prompt = next((m.get("content") or "" for m in reversed(messages) if m.get("role") == "user"), "")
+        words = prompt.split()
+        return f"Resposta simulada ({len(words)} palavras no prompt): " + " ".join(words[-12:])
+
+    def _make_handler(self):
+        """
+        Cria a classe de handler HTTP ligada a este servidor.
+
+        Returns:
+            type: Subclasse de BaseHTTPRequestHandler
+        """
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, format, *args):
+                pass
+
+            def _send(self, status, body, headers=None):
+                payload = json.dumps(body).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def _send_event(self, body):
+                payload = f"data: {body if isinstance(body, str) else json.dumps(body)}\n\n".encode("utf-8")
+                self.wfile.write(f"{len(payload):x}\r\n".encode("ascii") + payload + b"\r\n")
+                self.wfile.flush()
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length") or 0)
+                request = json.loads(self.rfile.read(length) or b"{}")
+                if urlparse(self.path).path.rstrip("/") != CHAT_PATH:
+                    self._send(404, {"error": {"message": "Not found"}})
+                    return
+
+                status, retry_after = server._admit()
+                if status == 429:
+                    self._send(429, {"error": {"message": "Rate limit reached", "type": "tokens"}},
+                               {"Retry-After": str(retry_after)})
+                    return
+                if status != 200:
+                    self._send(status, {"error": {"message": "Service unavailable"}})
+                    return
+
+                model = request.get("model", "fake")
+                answer = server._answer(request.get("messages") or [])
+                completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+                created = int(time.time())
+                usage = {"prompt_tokens": 0, "completion_tokens": len(answer.split()), "total_tokens": len(answer.split())}
+
+                if not request.get("stream"):
+                    time.sleep(server.latency)
+                    self._send(200, {
+                        "id": completion_id,
+                        "object": "chat.completion",
+                        "created": created,
+                        "model": model,
+                        "choices": [{"index": 0, "message": {"role": "assistant", "content": answer}, "finish_reason": "stop"}],
+                        "usage": usage,
+                    })
+                    return
+
+                # Streaming: a latência é dividida entre os trechos da resposta
+                words = answer.split(" ")
+                pieces = [" ".join(words[i:i + WORDS_PER_CHUNK]) + " " for i in range(0, len(words), WORDS_PER_CHUNK)]
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.send_header("Transfer-Encoding", "chunked")
+                self.end_headers()
+                chunk = {"id": completion_id, "object": "chat.completion.chunk", "created": created, "model": model}
+                try:
+                    self._send_event({**chunk, "choices": [{"index": 0, "delta": {"role": "assistant", "content": ""}, "finish_reason": None}]})
+                    for piece in pieces:
+                        time.sleep(server.latency / len(pieces))
+                        self._send_event({**chunk, "choices": [{"index": 0, "delta": {"content": piece}, "finish_reason": None}]})
+                    self._send_event({**chunk, "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}], "x_groq": {"usage": usage}})
+                    self._send_event("[DONE]")
+                    self.wfile.write(b"0\r\n\r\n")
+                    self.wfile.flush()
+                except (BrokenPipeError, ConnectionResetError):
+                    # O cliente cancelou a chamada no meio da resposta
+                    self.close_connection = True
+
+        return Handler
+
+def main():
+    """
+    Executa o servidor falso pela linha de comando.
+    """
+    parser = argparse.ArgumentParser(description="Servidor LLM falso (API de chat do Groq) para testes locais")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8090)
+    parser.add_argument("--latency", type=float, default=0.2, help="Segundos por resposta")
+    parser.add_argument("--requests-per-minute", type=int, default=0, help="Limite antes de responder 429 (0 desativa)")
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="Fração das requisições que falham com 503")
+    args = parser.parse_args()
+
+    server = FakeLLMServer(args.latency, args.requests_per_minute, args.failure_rate, args.host, args.port)
+    print(f"LLM falso em {server.url} (latência {args.latency} s)")
+    try:
+        server._httpd.serve_forever()
+    except KeyboardInterrupt:
+        server.stop()
+
+if __name__ == "__main__":
+    main()